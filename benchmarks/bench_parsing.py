@@ -0,0 +1,127 @@
+"""结果页解析与正文提取的微基准
+
+用法: python -m benchmarks.bench_parsing [--repeat N]
+
+对比旧实现（BeautifulSoup html.parser、apparent_encoding、两次解析的trafilatura提取）
+与当前实现在 benchmarks/fixtures 中的录制页面上的耗时，并校验两者的解析结果一致。
+"""
+import argparse
+import os
+import timeit
+
+import trafilatura
+from bs4 import BeautifulSoup
+from charset_normalizer import from_bytes
+
+from neunexus.core.crawler.html_utils import detect_encoding
+from neunexus.core.crawler.page_crawer import PageCrawler
+from neunexus.core.crawler.searchengine_crawer import (
+    BaiduSearchEngine,
+    BingSearchEngine,
+    DuckDuckGoSearchEngine,
+)
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# 旧实现使用的CSS选择器
+LEGACY_SELECTORS = {
+    "bing": ("li.b_algo", "h2", "a", "div.b_caption p"),
+    "baidu": ("div.result", "h3 a", "a", "div.c-abstract"),
+    "duckduckgo": ("div.result", "a.result__a", "a.result__a", "a.result__snippet"),
+}
+
+SERP_FIXTURES = {
+    "bing": ("serp_bing.html", BingSearchEngine),
+    "baidu": ("serp_baidu.html", BaiduSearchEngine),
+    "duckduckgo": ("serp_duckduckgo.html", DuckDuckGoSearchEngine),
+}
+
+ARTICLE_FIXTURES = ["article_en.html", "article_zh_gbk.html"]
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
+
+
+def legacy_parse_serp(engine, body):
+    """旧实现：BeautifulSoup html.parser + CSS选择器（不含链接解码）"""
+    result_sel, title_sel, link_sel, snippet_sel = LEGACY_SELECTORS[engine]
+    soup = BeautifulSoup(body.decode(detect_encoding(body)), "html.parser")
+    results = []
+    for result in soup.select(result_sel):
+        title_elem = result.select_one(title_sel)
+        link_elem = result.select_one(link_sel)
+        if not link_elem or not link_elem.get("href"):
+            continue
+        snippet_elem = result.select_one(snippet_sel)
+        results.append({
+            "title": title_elem.get_text().strip() if title_elem else "无标题",
+            "link": link_elem["href"],
+            "snippet": snippet_elem.get_text().strip() if snippet_elem else "无摘要",
+        })
+    return results
+
+
+def legacy_extract(html):
+    """旧实现：正文与元数据分别解析一次"""
+    extracted = trafilatura.extract(html, include_links=False, include_tables=True, output_format="markdown")
+    title = trafilatura.extract_metadata(html).as_dict()["title"]
+    return {"title": title, "content": extracted}
+
+
+def bench(fn, repeat):
+    """返回单次调用的最短耗时（毫秒）"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1000
+
+
+def report(name, legacy_ms, current_ms):
+    print(f"{name:<36} {legacy_ms:>10.3f} {current_ms:>10.3f} {legacy_ms / current_ms:>8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="解析与提取微基准")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'case':<36} {'legacy ms':>10} {'current ms':>10} {'speedup':>9}")
+
+    for engine, (fixture, engine_cls) in SERP_FIXTURES.items():
+        body = load_fixture(fixture)
+        search_engine = engine_cls()
+
+        legacy = legacy_parse_serp(engine, body)
+        current = search_engine._parse_results(search_engine._parse_html(body))
+        assert [r["title"] for r in legacy] == [r["title"] for r in current], f"{engine} 标题不一致"
+        assert [r["snippet"] for r in legacy] == [r["snippet"] for r in current], f"{engine} 摘要不一致"
+
+        report(
+            f"serp/{engine} ({len(current)} results)",
+            bench(lambda: legacy_parse_serp(engine, body), args.repeat),
+            bench(lambda: search_engine._parse_results(search_engine._parse_html(body)), args.repeat),
+        )
+
+    crawler = PageCrawler()
+    for fixture in ARTICLE_FIXTURES:
+        body = load_fixture(fixture)
+        html = body.decode(detect_encoding(body))
+
+        assert legacy_extract(html)["title"] == crawler._extract_main_content(html)["title"], f"{fixture} 标题不一致"
+
+        report(
+            f"encoding/{fixture}",
+            bench(lambda: from_bytes(body).best().encoding, args.repeat),
+            bench(lambda: detect_encoding(body), args.repeat),
+        )
+        report(
+            f"extract/{fixture}",
+            bench(lambda: legacy_extract(html), args.repeat),
+            bench(lambda: crawler._extract_main_content(html), args.repeat),
+        )
+
+
+if __name__ == "__main__":
+    main()
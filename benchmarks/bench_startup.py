@@ -0,0 +1,78 @@
+"""包导入耗时基准
+
+用法: python -m benchmarks.bench_startup [--repeat N] [--top K] [--budget-ms MS]
+
+在全新的解释器中以 -X importtime 导入各入口，取多次运行的最小值报告累计导入耗时，
+列出自身耗时最多的模块，并检查轻量入口没有导入重量级依赖。
+超出 --budget-ms 或导入了不该导入的依赖时以非零状态退出，可用于CI。
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 入口 -> 不应因此被导入的重量级依赖
+TARGETS = {
+    "neunexus": ("openai", "flask", "numpy", "requests", "lxml", "trafilatura", "html2text", "bs4"),
+    "neunexus.core.client": ("flask", "numpy", "lxml", "trafilatura", "html2text", "bs4"),
+    "neunexus.core.crawler": ("openai", "flask", "numpy", "requests", "lxml", "trafilatura", "html2text"),
+    "neunexus.core.crawler.page_crawer": ("openai", "flask", "numpy", "trafilatura", "html2text"),
+    "neunexus.api.app": ("numpy", "lxml", "trafilatura", "html2text", "bs4"),
+}
+
+
+def import_profile(module):
+    """在子进程中导入模块，返回 {模块名: (自身微秒, 累计微秒)}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr}")
+
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = (int(self_us), int(cumulative_us))
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="包导入耗时基准")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="列出自身耗时最多的模块数")
+    parser.add_argument("--budget-ms", type=float, default=None, help="neunexus 顶层导入的耗时上限")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'module':<52} {'import ms':>10} {'modules':>8}")
+
+    for target, forbidden in TARGETS.items():
+        profiles = [import_profile(target) for _ in range(args.repeat)]
+        best = min(profiles, key=lambda p: p[target][1])
+        total_ms = best[target][1] / 1000
+        print(f"{target:<52} {total_ms:>10.1f} {len(best):>8}")
+
+        heaviest = sorted(best.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+        for name, (self_us, _) in heaviest:
+            print(f"    {name:<48} {self_us / 1000:>10.1f}")
+
+        loaded = sorted(name for name in forbidden if name in best)
+        if loaded:
+            failed = True
+            print(f"    !! 导入了重量级依赖: {', '.join(loaded)}")
+
+        if target == "neunexus" and args.budget_ms is not None and total_ms > args.budget_ms:
+            failed = True
+            print(f"    !! 超出预算 {args.budget_ms} ms")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""基准测试用的合成数据
+
+- make_database: 含N个对话、每个对话M条消息的SQLite数据库（可带分叉对话）
+- random_embeddings: 行归一化的随机嵌入矩阵
+- synthetic_text / synthetic_corpus: 按主题生成的中英文混合文本
+- StubRetriever: 不访问网络的 Retriever，嵌入由词元哈希得到，共享词元越多的文本越相似
+- load_fixture: benchmarks/fixtures 中录制的结果页与文章HTML
+
+所有生成器都接受 seed，同样的参数总是生成同样的数据。
+"""
+import os
+import random
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from neunexus.core.bm25 import tokenize
+from neunexus.core.retriever import Retriever
+from neunexus.database import ConversationRepository, DatabaseManager, MessageRepository
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+SERP_FIXTURES = {
+    "bing": "serp_bing.html",
+    "baidu": "serp_baidu.html",
+    "duckduckgo": "serp_duckduckgo.html",
+}
+
+ARTICLE_FIXTURES = ["article_en.html", "article_zh_gbk.html"]
+
+# 每个主题一组词，同一主题的句子共享较多词元
+TOPICS = {
+    "database": ["数据库", "索引", "事务", "查询", "index", "transaction", "query", "sqlite", "journal", "page"],
+    "network": ["网络", "连接", "延迟", "带宽", "socket", "latency", "packet", "tcp", "proxy", "timeout"],
+    "ml": ["模型", "向量", "训练", "推理", "embedding", "tensor", "gradient", "token", "attention", "batch"],
+    "cooking": ["烹饪", "食材", "火候", "调味", "recipe", "oven", "flour", "garlic", "simmer", "salt"],
+    "travel": ["旅行", "机票", "酒店", "行程", "flight", "hotel", "museum", "train", "ticket", "map"],
+}
+
+FILLER = ["的", "我们", "需要", "可以", "the", "a", "of", "and", "with", "for", "when", "then"]
+
+
+def load_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
+
+
+def synthetic_sentence(rng: random.Random, topic: str, words: int = 12) -> str:
+    vocabulary = TOPICS[topic]
+    tokens = [rng.choice(vocabulary) if rng.random() < 0.6 else rng.choice(FILLER) for _ in range(words)]
+    return " ".join(tokens) + rng.choice(["。", ". ", "！", "?\n"])
+
+
+def synthetic_text(sentences: int, seed: int = 0, topic_run: int = 5) -> str:
+    """生成sentences句文本，每 topic_run 句左右换一个主题，便于语义分块得到稳定的块数"""
+    rng = random.Random(seed)
+    topics = list(TOPICS)
+    parts = []
+    topic = rng.choice(topics)
+    for i in range(sentences):
+        if i and i % topic_run == 0:
+            topic = rng.choice(topics)
+        parts.append(synthetic_sentence(rng, topic))
+    return "".join(parts)
+
+
+def synthetic_corpus(documents: int, sentences: int = 20, seed: int = 0) -> List[str]:
+    return [synthetic_text(sentences, seed=seed * 1_000_003 + i) for i in range(documents)]
+
+
+def random_embeddings(rows: int, dim: int = 1536, seed: int = 0) -> np.ndarray:
+    """行归一化的随机嵌入矩阵（float64，与 Retriever 内部的矩阵一致）"""
+    matrix = np.random.default_rng(seed).standard_normal((rows, dim))
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix
+
+
+class StubRetriever(Retriever):
+    """用确定性哈希嵌入代替阿里云嵌入接口的 Retriever
+
+    每个词元对应一个由 crc32 播种的随机向量，文本的嵌入是其词元向量之和，
+    因此共享词元的文本余弦相似度更高，分块与检索的行为与真实嵌入大体一致。
+    encode_calls / encoded_texts 统计嵌入请求次数与文本数，用于观察去重节省的请求。
+    """
+
+    def __init__(self, dim: int = 256, dedup_threshold: Optional[float] = 0.8, compaction_threshold: float = 0.3):
+        super().__init__(api_key="stub", dedup_threshold=dedup_threshold, compaction_threshold=compaction_threshold)
+        self.dim = dim
+        self.encode_calls = 0
+        self.encoded_texts = 0
+        self._token_vectors: Dict[str, np.ndarray] = {}
+
+    def _token_vector(self, token: str) -> np.ndarray:
+        vector = self._token_vectors.get(token)
+        if vector is None:
+            seed = zlib.crc32(token.encode("utf-8"))
+            vector = self._token_vectors[token] = np.random.default_rng(seed).standard_normal(self.dim)
+        return vector
+
+    def encode(self, sentences, timeout: Optional[float] = None) -> np.ndarray:
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        self.encode_calls += 1
+        self.encoded_texts += len(sentences)
+
+        embeddings = np.zeros((len(sentences), self.dim))
+        for i, sentence in enumerate(sentences):
+            for token in tokenize(sentence):
+                embeddings[i] += self._token_vector(token)
+        return embeddings
+
+    def load_random(self, rows: int, seed: int = 0, sentences_per_row: int = 2) -> "StubRetriever":
+        """直接写入 rows 个片段：文本为合成句子，嵌入为随机矩阵，不经过分块与嵌入"""
+        rng = random.Random(seed)
+        topics = list(TOPICS)
+        matrix = random_embeddings(rows, self.dim, seed)
+        for row in range(rows):
+            topic = rng.choice(topics)
+            text = "".join(synthetic_sentence(rng, topic) for _ in range(sentences_per_row))
+            self.commit_doc(f"doc-{row}", [(f"{row} {text}", None, matrix[row])])
+        return self
+
+
+def make_database(
+    path: str,
+    conversations: int,
+    messages: int,
+    forks: int = 0,
+    seed: int = 0
+) -> DatabaseManager:
+    """创建含 conversations 个对话、每个对话 messages 条消息的数据库
+
+    消息按 user/assistant 交替，直接批量写入以免生成数据本身成为瓶颈；
+    forks > 0 时再从随机对话的随机消息分叉出 forks 个对话（各追加两条消息）。
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    db = DatabaseManager(path)
+    rng = random.Random(seed)
+    topics = list(TOPICS)
+
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO conversations (title) VALUES (?)",
+            [(f"对话 {i}",) for i in range(conversations)]
+        )
+        conversation_ids = [row[0] for row in conn.execute("SELECT id FROM conversations ORDER BY id")]
+        next_id = (conn.execute("SELECT MAX(id) FROM messages").fetchone()[0] or 0) + 1
+
+        rows, heads = [], []
+        for conversation_id in conversation_ids:
+            topic = rng.choice(topics)
+            parent_id = None
+            for i in range(messages):
+                role = "user" if i % 2 == 0 else "assistant"
+                rows.append((next_id, conversation_id, parent_id, role, synthetic_sentence(rng, topic, words=20)))
+                parent_id = next_id
+                next_id += 1
+            heads.append((parent_id, conversation_id))
+
+        conn.executemany(
+            "INSERT INTO messages (id, conversation_id, parent_id, role, content) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        conn.executemany("UPDATE conversations SET head_message_id = ? WHERE id = ?", heads)
+
+    if forks and messages:
+        # 分叉走正常的仓库路径，保证与服务端写入的结构一致
+        conversation_repo, message_repo = ConversationRepository(db), MessageRepository(db)
+        first = rows[0][0]
+        for _ in range(forks):
+            source = rng.randrange(conversations)
+            message_id = first + source * messages + rng.randrange(messages)
+            fork = conversation_repo.fork(conversation_ids[source], message_id, f"分叉 {source}")
+            message_repo.create(fork.id, "user", "换一种说法")
+            message_repo.create(fork.id, "assistant", "好的")
+
+    return db
@@ -0,0 +1,270 @@
+"""离线微基准套件：数据库仓库、Retriever检索与分块、结果页解析与正文提取
+
+用法:
+    python -m benchmarks.suite run [--scale quick|default] [--group G ...] [--filter REGEX]
+                                   [--repeat N] [--output results.json]
+    python -m benchmarks.suite compare BASE.json HEAD.json [--threshold 0.1] [--metric min_ms]
+
+run 使用 benchmarks.datagen 生成的合成数据与 benchmarks/fixtures 中录制的页面，不访问网络
+（嵌入由 StubRetriever 的哈希嵌入代替），结果以JSON写入 --output 供之后比较。
+compare 对比两次结果，耗时增加超过 threshold 的用例记为回退，存在回退时以非零状态退出，可用于CI。
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from typing import Callable, Dict
+
+import numpy as np
+
+from benchmarks.datagen import (
+    ARTICLE_FIXTURES,
+    SERP_FIXTURES,
+    StubRetriever,
+    load_fixture,
+    make_database,
+    synthetic_corpus,
+    synthetic_text,
+)
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 数据规模：quick 用于本地快速验证，default 用于生成可比较的结果
+SCALES = {
+    "quick": {
+        "conversations": 50, "messages": 100, "forks": 10,
+        "index_rows": 1000, "dim": 256, "chunk_sentences": 100, "ingest_docs": 5,
+    },
+    "default": {
+        "conversations": 500, "messages": 200, "forks": 100,
+        "index_rows": 20000, "dim": 1536, "chunk_sentences": 400, "ingest_docs": 20,
+    },
+}
+
+
+def repository_cases(scale: dict, workdir: str) -> Dict[str, Callable]:
+    from neunexus.database import ConversationRepository, MessageRepository
+
+    db = make_database(
+        os.path.join(workdir, "bench.db"), scale["conversations"], scale["messages"], forks=scale["forks"]
+    )
+    conversations, messages = ConversationRepository(db), MessageRepository(db)
+    conversation_id = scale["conversations"] // 2
+    fork_id = scale["conversations"] + max(scale["forks"], 1)  # 最后一个分叉对话（无分叉时不存在，返回空）
+    head = conversations.get_by_id(conversation_id).head_message_id
+
+    return {
+        "repository/conversations.get_all": conversations.get_all,
+        "repository/conversations.get_all[activity]": lambda: conversations.get_all("activity"),
+        "repository/conversations.get_by_id": lambda: conversations.get_by_id(conversation_id),
+        "repository/conversations.fork": lambda: conversations.fork(conversation_id, head, "bench"),
+        "repository/messages.get_by_conversation": lambda: messages.get_by_conversation(conversation_id),
+        "repository/messages.get_recent[limit=50]": lambda: messages.get_recent_by_conversation(conversation_id, 50),
+        "repository/messages.get_recent[fork]": lambda: messages.get_recent_by_conversation(fork_id),
+        "repository/messages.get_by_id": lambda: messages.get_by_id(head),
+        "repository/messages.create": lambda: messages.create(conversation_id, "user", "bench"),
+    }
+
+
+def retriever_cases(scale: dict, workdir: str) -> Dict[str, Callable]:
+    retriever = StubRetriever(dim=scale["dim"], dedup_threshold=None).load_random(scale["index_rows"])
+    query = "数据库 索引 transaction query"
+    corpus = synthetic_corpus(scale["ingest_docs"], seed=1)
+
+    def ingest():
+        StubRetriever(dim=scale["dim"]).add_docs(corpus)
+
+    return {
+        "retriever/retrieve[vector]": lambda: retriever.retrieve(query, top_k=5, mode="vector"),
+        "retriever/retrieve[bm25]": lambda: retriever.retrieve(query, top_k=5, mode="bm25"),
+        "retriever/retrieve[hybrid-rrf]": lambda: retriever.retrieve(query, top_k=5, mode="hybrid"),
+        "retriever/retrieve[hybrid-weighted]": lambda: retriever.retrieve(query, top_k=5, mode="hybrid", fusion="weighted"),
+        "retriever/retrieve[vector-prefilter]": lambda: retriever.retrieve(query, top_k=5, prefilter_k=200),
+        f"retriever/add_docs[docs={scale['ingest_docs']}]": ingest,
+    }
+
+
+def chunking_cases(scale: dict, workdir: str) -> Dict[str, Callable]:
+    retriever = StubRetriever(dim=scale["dim"])
+    text = synthetic_text(scale["chunk_sentences"], seed=2)
+    sentences = [s for s in re.split(r"[。！？.!?\n]+", text) if s.strip()]
+    retriever.encode(sentences)  # 预热词元向量缓存，只测分块本身
+
+    return {
+        f"chunking/chunk[sentences={scale['chunk_sentences']}]": lambda: retriever.chunk(text),
+    }
+
+
+def serp_cases(scale: dict, workdir: str) -> Dict[str, Callable]:
+    from neunexus.core.crawler.searchengine_crawer import (
+        BaiduSearchEngine,
+        BingSearchEngine,
+        DuckDuckGoSearchEngine,
+    )
+
+    engines = {"bing": BingSearchEngine, "baidu": BaiduSearchEngine, "duckduckgo": DuckDuckGoSearchEngine}
+    cases = {}
+    for name, fixture in SERP_FIXTURES.items():
+        body = load_fixture(fixture)
+        engine = engines[name]()
+        tree = engine._parse_html(body)
+        cases[f"serp/{name}.parse_html"] = lambda engine=engine, body=body: engine._parse_html(body)
+        cases[f"serp/{name}.parse_results"] = lambda engine=engine, tree=tree: engine._parse_results(tree)
+    return cases
+
+
+def extract_cases(scale: dict, workdir: str) -> Dict[str, Callable]:
+    from neunexus.core.crawler.html_utils import detect_encoding
+    from neunexus.core.crawler.page_crawer import PageCrawler
+
+    crawler = PageCrawler()
+    cases = {}
+    for fixture in ARTICLE_FIXTURES:
+        body = load_fixture(fixture)
+        html = body.decode(detect_encoding(body))
+        cases[f"extract/{fixture}.detect_encoding"] = lambda body=body: detect_encoding(body)
+        cases[f"extract/{fixture}.main_content"] = lambda html=html: crawler._extract_main_content(html)
+    return cases
+
+
+GROUPS = {
+    "repository": repository_cases,
+    "retriever": retriever_cases,
+    "chunking": chunking_cases,
+    "serp": serp_cases,
+    "extract": extract_cases,
+}
+
+
+def measure(fn: Callable, repeat: int) -> dict:
+    """与 bench_parsing 相同：autorange 决定每轮调用次数，记录 repeat 轮的单次耗时（毫秒）"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    samples = [total / number * 1000 for total in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "min_ms": min(samples),
+        "median_ms": statistics.median(samples),
+        "mean_ms": statistics.fmean(samples),
+        "stdev_ms": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "rounds": repeat,
+        "number": number,
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "numpy": np.__version__,
+        "sqlite": sqlite3.sqlite_version,
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run(args) -> int:
+    scale = SCALES[args.scale]
+    pattern = re.compile(args.filter) if args.filter else None
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="neunexus-bench-")
+
+    print(f"{'case':<52} {'min ms':>10} {'median ms':>10} {'stdev':>8}")
+    try:
+        for group in args.group or list(GROUPS):
+            try:
+                cases = GROUPS[group](scale, workdir)
+            except ImportError as e:
+                # 解析与提取依赖 lxml / trafilatura 等可选依赖
+                print(f"跳过 {group}: {e}")
+                continue
+            for name, fn in cases.items():
+                if pattern and not pattern.search(name):
+                    continue
+                result = results[name] = measure(fn, args.repeat)
+                print(f"{name:<52} {result['min_ms']:>10.4f} {result['median_ms']:>10.4f} {result['stdev_ms']:>8.4f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "scale": args.scale, "params": scale, "results": results}, f, indent=2)
+        print(f"结果已写入 {args.output}")
+    return 0
+
+
+def compare(args) -> int:
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.head, encoding="utf-8") as f:
+        head = json.load(f)
+
+    if base.get("scale") != head.get("scale"):
+        print(f"警告: 数据规模不同（{base.get('scale')} / {head.get('scale')}），结果不可直接比较")
+
+    regressions = 0
+    print(f"{'case':<52} {'base ms':>10} {'head ms':>10} {'change':>8}  status")
+    for name in sorted(set(base["results"]) | set(head["results"])):
+        old, new = base["results"].get(name), head["results"].get(name)
+        if old is None or new is None:
+            print(f"{name:<52} {'-' if old is None else f'{old[args.metric]:.4f}':>10} "
+                  f"{'-' if new is None else f'{new[args.metric]:.4f}':>10} {'':>8}  {'new' if old is None else 'missing'}")
+            continue
+
+        before, after = old[args.metric], new[args.metric]
+        change = after / before - 1 if before else 0.0
+        # 变化小于两次测量的波动时不计为回退
+        noise = max(old.get("stdev_ms", 0.0), new.get("stdev_ms", 0.0))
+        if change > args.threshold and after - before > noise:
+            status = "REGRESSION"
+            regressions += 1
+        elif change < -args.threshold and before - after > noise:
+            status = "improved"
+        else:
+            status = "ok"
+        print(f"{name:<52} {before:>10.4f} {after:>10.4f} {change:>+8.1%}  {status}")
+
+    if regressions:
+        print(f"!! {regressions} 个用例回退超过 {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线微基准套件")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="运行基准并输出结果")
+    run_parser.add_argument("--scale", choices=list(SCALES), default="default")
+    run_parser.add_argument("--group", action="append", choices=list(GROUPS), help="只运行指定分组，可重复")
+    run_parser.add_argument("--filter", default=None, help="只运行名称匹配该正则的用例")
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--output", default=None, help="结果JSON文件路径")
+
+    compare_parser = commands.add_parser("compare", help="比较两次结果并标记回退")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="耗时增加超过该比例视为回退")
+    compare_parser.add_argument("--metric", choices=["min_ms", "median_ms", "mean_ms"], default="min_ms")
+
+    args = parser.parse_args()
+    sys.exit(run(args) if args.command == "run" else compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+from neunexus.core.ingest import BulkIngestor, iter_sources
+from neunexus.core.retriever import Retriever
+import argparse
+import itertools
+import json
+import sys
+
+
+def config_loader(config_path="./config.json"):
+    with open(config_path, "r") as f:
+        config = json.load(f)
+        return config["embedding_api_key"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="批量导入文档到检索索引")
+    parser.add_argument("inputs", nargs="*", help="文件、目录或URL")
+    parser.add_argument("--url-list", help="每行一个URL的文件，'-' 表示标准输入")
+    parser.add_argument("--index", default="./retriever.pkl", help="索引快照路径，存在时从中断处继续")
+    parser.add_argument("--config", default="./config.json")
+    parser.add_argument("--read-workers", type=int, default=4)
+    parser.add_argument("--extract-workers", type=int, default=None, help="正文提取进程数，默认为CPU核数")
+    parser.add_argument("--chunk-workers", type=int, default=4)
+    parser.add_argument("--embed-workers", type=int, default=2)
+    parser.add_argument("--embed-batch-size", type=int, default=25)
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--checkpoint-every", type=int, default=100)
+    parser.add_argument("--report-interval", type=float, default=10.0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    
+    inputs = iter(args.inputs)
+    if args.url_list:
+        url_file = sys.stdin if args.url_list == "-" else open(args.url_list, "r", encoding="utf-8")
+        inputs = itertools.chain(inputs, url_file)
+    
+    retriever = Retriever(api_key=config_loader(args.config))
+    ingestor = BulkIngestor(
+        retriever,
+        index_path=args.index,
+        read_workers=args.read_workers,
+        extract_workers=args.extract_workers,
+        chunk_workers=args.chunk_workers,
+        embed_workers=args.embed_workers,
+        embed_batch_size=args.embed_batch_size,
+        queue_size=args.queue_size,
+        checkpoint_every=args.checkpoint_every,
+        report_interval=args.report_interval
+    )
+    ingestor.run(iter_sources(inputs))
@@ -1,22 +1,43 @@
 __version__ = "0.1.0"
 __author__ = "ViperEkura"
 
-from neunexus.core.crawler import SearchEngineCrawler, PageCrawler
-from neunexus.core.client import DeepSeekClient
-from neunexus.core.retriever import Retriever
-from neunexus.api.app import NeuNexusApp
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = [
+if TYPE_CHECKING:
+    from neunexus.core.crawler import SearchEngineCrawler, PageCrawler
+    from neunexus.core.client import DeepSeekClient
+    from neunexus.core.retriever import Retriever
+    from neunexus.api.app import NeuNexusApp
+
+# 公开名称 -> 所在模块，首次访问时才导入（爬虫、检索、Flask等依赖较重）
+_LAZY_IMPORTS = {
     # crawler
-    "SearchEngineCrawler",
-    "PageCrawler",
+    "SearchEngineCrawler": "neunexus.core.crawler",
+    "PageCrawler": "neunexus.core.crawler",
     
     # deepseek_client
-    "DeepSeekClient",
+    "DeepSeekClient": "neunexus.core.client",
     
     # retriever
-    "Retriever",
+    "Retriever": "neunexus.core.retriever",
     
     # app
-    "NeuNexusApp",
-]
\ No newline at end of file
+    "NeuNexusApp": "neunexus.api.app",
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
+
+def __getattr__(name):
+    module = _LAZY_IMPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    # 缓存到模块字典，之后的访问不再经过 __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,7 +1,11 @@
 from neunexus.api.conversation_controller import ConversationController
 from neunexus.api.message_controller import MessageController
+from neunexus.api.batch_controller import BatchController
+from neunexus.api.stream_socket import StreamSocketController
 
 __all__ = [
     "ConversationController",
-    "MessageController"
+    "MessageController",
+    "BatchController",
+    "StreamSocketController"
 ]
\ No newline at end of file
@@ -0,0 +1,147 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Hashable, Optional
+
+
+class AdmissionRejected(Exception):
+    """请求未被接纳，reason 说明原因，retry_after 为建议的重试等待秒数"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """一次成功的接纳，必须且只会释放一次"""
+
+    def __init__(self, key: Hashable, admitted_at: float, waited: float):
+        self.key = key
+        self.admitted_at = admitted_at
+        self.waited = waited
+        self.released = False
+
+
+class StreamAdmission:
+    """流式生成的准入控制
+
+    - 全局最多 max_concurrent 个生成同时进行，超出的请求按先来先到进入等待队列
+    - 等待队列最多 max_queue 个请求，队列已满时立即拒绝，排队超过 queue_timeout 秒同样拒绝
+    - 同一对话最多 per_key 个生成（含排队中的），重复请求立即拒绝
+    限制在单个进程内生效，多工作进程部署时总上限为 工作进程数 * max_concurrent。
+    """
+
+    def __init__(self, max_concurrent: int = 32, max_queue: int = 64, queue_timeout: float = 5.0, per_key: int = 1):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.per_key = per_key
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiters: Deque[object] = deque()
+        self._keys: Dict[Hashable, int] = {}
+        # 生成耗时的指数滑动平均，用于估算 Retry-After
+        self._avg_hold = 0.0
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_busy": 0,
+            "rejected_timeout": 0,
+            "rejected_duplicate": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    def acquire(self, key: Hashable) -> AdmissionTicket:
+        """申请一个生成名额，必要时排队等待；无法接纳时抛出 AdmissionRejected"""
+        start = time.monotonic()
+        with self._cond:
+            if self._keys.get(key, 0) >= self.per_key:
+                self.stats["rejected_duplicate"] += 1
+                raise AdmissionRejected("conversation_busy", self._retry_after())
+
+            if self._active < self.max_concurrent and not self._waiters:
+                return self._admit(key, start)
+
+            if len(self._waiters) >= self.max_queue:
+                self.stats["rejected_busy"] += 1
+                raise AdmissionRejected("server_busy", self._retry_after())
+
+            waiter = object()
+            self._waiters.append(waiter)
+            self._keys[key] = self._keys.get(key, 0) + 1
+            self.stats["queued"] += 1
+            deadline = start + self.queue_timeout
+            try:
+                while not (self._waiters[0] is waiter and self._active < self.max_concurrent):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["rejected_timeout"] += 1
+                        raise AdmissionRejected("queue_timeout", self._retry_after())
+                    self._cond.wait(remaining)
+            except BaseException:
+                self._waiters.remove(waiter)
+                self._release_key(key)
+                # 队首离开后唤醒下一个等待者
+                self._cond.notify_all()
+                raise
+
+            self._waiters.popleft()
+            self._release_key(key)
+            ticket = self._admit(key, start)
+            self._cond.notify_all()
+            return ticket
+
+    def release(self, ticket: AdmissionTicket):
+        with self._cond:
+            if ticket.released:
+                return
+            ticket.released = True
+            self._active -= 1
+            self._release_key(ticket.key)
+            hold = time.monotonic() - ticket.admitted_at
+            self._avg_hold = hold if self._avg_hold == 0 else 0.9 * self._avg_hold + 0.1 * hold
+            self._cond.notify_all()
+
+    def _admit(self, key: Hashable, start: float) -> AdmissionTicket:
+        now = time.monotonic()
+        waited = now - start
+        self._active += 1
+        self._keys[key] = self._keys.get(key, 0) + 1
+        self.stats["admitted"] += 1
+        self.stats["wait_seconds_total"] += waited
+        self.stats["wait_seconds_max"] = max(self.stats["wait_seconds_max"], waited)
+        return AdmissionTicket(key, now, waited)
+
+    def _release_key(self, key: Hashable):
+        count = self._keys.get(key, 0) - 1
+        if count > 0:
+            self._keys[key] = count
+        else:
+            self._keys.pop(key, None)
+
+    def _retry_after(self) -> int:
+        """按平均生成耗时与排队长度估算多久后可能有空闲名额"""
+        if self._avg_hold == 0:
+            return 1
+        estimate = self._avg_hold * (len(self._waiters) + 1) / self.max_concurrent
+        return min(max(1, math.ceil(estimate)), 60)
+
+    def snapshot(self) -> Dict[str, object]:
+        """当前并发、队列深度与等待时间统计"""
+        with self._cond:
+            stats = dict(self.stats)
+            admitted = stats["admitted"]
+            stats.update({
+                "active": self._active,
+                "queue_depth": len(self._waiters),
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "queue_timeout": self.queue_timeout,
+                "wait_seconds_avg": stats["wait_seconds_total"] / admitted if admitted else 0.0,
+                "avg_stream_seconds": self._avg_hold,
+            })
+            return stats
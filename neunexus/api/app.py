@@ -1,28 +1,100 @@
-from flask import Flask
+import time
+from typing import TYPE_CHECKING
+
+from flask import Flask, Response, g, request
 from flask_cors import CORS
 from neunexus.database import DatabaseManager
-from neunexus.api import ConversationController, MessageController
-from neunexus.service import ConversationService, MessageService
+from neunexus.api import BatchController, ConversationController, MessageController, StreamSocketController
+from neunexus.api.admission import StreamAdmission
+from neunexus.service import BatchService, ConversationService, MessageService, PurgeService
 from neunexus.core.client import DeepSeekClient
+from neunexus.core import tracing
+from neunexus.core.metrics import HTTP_REQUEST_SECONDS, REGISTRY
+from neunexus.core.tracing import Tracer
+
+if TYPE_CHECKING:
+    # 联网检索依赖爬虫与numpy，仅用于类型标注
+    from neunexus.core.web_search import WebSearchPipeline
 
 
 class NeuNexusApp:
     def __init__(
         self, 
         db_manager: DatabaseManager,
-        client: DeepSeekClient
+        client: DeepSeekClient,
+        web_pipeline: 'WebSearchPipeline' = None,
+        admission: StreamAdmission = None,
+        tracer: Tracer = None,
+        purge_service: PurgeService = None
     ):
         self.app = Flask(__name__)
         CORS(self.app)
         
         conversation_service = ConversationService(db_manager)
-        message_service = MessageService(db_manager, client)
+        message_service = MessageService(db_manager, client, web_pipeline)
+        batch_service = BatchService(db_manager, conversation_service, message_service)
+        # 删除只做标记，由后台线程分批清除
+        self.purge_service = purge_service or PurgeService(db_manager)
+        self.purge_service.start()
         
-        conversation_controller = ConversationController(self.app, conversation_service)
-        message_controller = MessageController(self.app, message_service)
+        # SSE与WebSocket两种流式接口共用同一个准入控制
+        admission = admission or StreamAdmission()
+        conversation_controller = ConversationController(self.app, conversation_service, self.purge_service)
+        message_controller = MessageController(self.app, message_service, admission)
+        batch_controller = BatchController(self.app, batch_service)
+        stream_socket_controller = StreamSocketController(self.app, message_service, admission)
         
         conversation_controller.register_routes()
         message_controller.register_routes()
+        batch_controller.register_routes()
+        stream_socket_controller.register_routes()
+        self._register_metrics()
+        if tracer is not None:
+            self._register_tracing(tracer)
         
+    def _register_metrics(self):
+        """按端点记录请求耗时，并在 /metrics 以Prometheus文本格式导出（每个进程各自统计）"""
+        @self.app.before_request
+        def start_timer():
+            g.request_start = time.perf_counter()
+
+        @self.app.after_request
+        def record_latency(response):
+            start = g.pop('request_start', None)
+            if start is not None:
+                HTTP_REQUEST_SECONDS.observe(
+                    time.perf_counter() - start,
+                    endpoint=request.endpoint or 'unmatched',
+                    method=request.method,
+                    status=response.status_code
+                )
+            return response
+
+        @self.app.route('/metrics', methods=['GET'])
+        def metrics():
+            return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+    def _register_tracing(self, tracer: Tracer):
+        """按请求头或采样率开启跟踪；流式响应在响应关闭（生成结束）时才写出跟踪文件"""
+        @self.app.before_request
+        def start_trace():
+            g.trace = tracer.start(f"{request.method} {request.path}", request.headers)
+            tracing.attach(g.trace)
+
+        @self.app.after_request
+        def finish_trace(response):
+            trace = g.get('trace')
+            # 流式响应的生成器会重新绑定跟踪
+            tracing.attach(None)
+            if trace is None:
+                return response
+            response.headers['X-Trace-Id'] = trace.trace_id
+            args = {'endpoint': request.endpoint, 'status': response.status_code}
+            if response.is_streamed:
+                response.call_on_close(lambda: tracer.finish(trace, **args))
+            else:
+                tracer.finish(trace, **args)
+            return response
+
     def run(self, host=None, port=None, debug=True):
         self.app.run(host=host, port=port, debug=debug)
\ No newline at end of file
@@ -0,0 +1,444 @@
+import contextlib
+import json
+import logging
+import time
+from functools import wraps
+from typing import TYPE_CHECKING, Any, Callable
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from neunexus.api.admission import AdmissionRejected, AdmissionTicket, StreamAdmission
+from neunexus.core import tracing
+from neunexus.core.client import DeepSeekClient
+from neunexus.core.metrics import HTTP_ERRORS, HTTP_REQUEST_SECONDS, REGISTRY
+from neunexus.core.tracing import Tracer
+from neunexus.database import DatabaseManager
+from neunexus.service import BatchService, ConversationService, MessageService, PurgeService
+
+if TYPE_CHECKING:
+    from neunexus.core.web_search import WebSearchPipeline
+
+
+logger = logging.getLogger("neunexus.asgi")
+
+
+def handle_errors_async(func: Callable) -> Callable:
+    """handle_errors 的异步版本"""
+    @wraps(func)
+    async def wrapper(*args, **kwargs) -> Any:
+        try:
+            return await func(*args, **kwargs)
+        except Exception as e:
+            HTTP_ERRORS.inc(endpoint=func.__name__, type=type(e).__name__)
+            logger.error(f"Error in {func.__name__}: {str(e)}")
+            return JSONResponse({'error': 'Internal server error'}, status_code=500)
+    return wrapper
+
+
+async def _get_json(request: Request):
+    """读取JSON请求体，请求体为空或不是合法JSON时返回None（与Flask的get_json保持一致的400处理）"""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+class MetricsMiddleware:
+    """按端点记录请求耗时（到发出响应头为止），与Flask版本的指标一致"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # 路由匹配后 scope 中带有处理函数
+                endpoint = scope.get("endpoint")
+                HTTP_REQUEST_SECONDS.observe(
+                    time.perf_counter() - start,
+                    endpoint=getattr(endpoint, "__name__", "unmatched"),
+                    method=scope["method"],
+                    status=message["status"]
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class TracingMiddleware:
+    """按请求头或采样率开启跟踪，响应体全部发送后写出跟踪文件"""
+
+    def __init__(self, app, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        trace = self.tracer.start(f"{scope['method']} {scope['path']}", Headers(scope=scope))
+        if trace is None:
+            return await self.app(scope, receive, send)
+
+        status = {}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["status"] = message["status"]
+                MutableHeaders(scope=message).append("X-Trace-Id", trace.trace_id)
+            await send(message)
+
+        # 请求内派生的任务与 asyncio.to_thread 会复制当前上下文，从而继承跟踪
+        tracing.attach(trace)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            tracing.attach(None)
+            endpoint = scope.get("endpoint")
+            self.tracer.finish(trace, endpoint=getattr(endpoint, "__name__", None), **status)
+
+
+async def metrics(request: Request) -> Response:
+    return PlainTextResponse(REGISTRY.render(), media_type='text/plain; version=0.0.4')
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """流式响应结束时释放准入名额
+
+    生成器的 finally 负责正常结束与出错的情况；客户端在生成开始前断开时生成器不会执行，
+    由这里兜底释放（与Flask版本的 call_on_close 相同，release 可重复调用）。
+    """
+
+    def __init__(self, content, admission: StreamAdmission, ticket: AdmissionTicket, **kwargs):
+        super().__init__(content, **kwargs)
+        self.admission = admission
+        self.ticket = ticket
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.admission.release(self.ticket)
+
+
+class AsyncConversationController:
+    """ConversationController 的ASGI版本，路由与JSON格式保持一致，数据库操作在线程池中执行"""
+
+    def __init__(self, conversation_service: ConversationService, purge_service: PurgeService = None):
+        self.conversation_service = conversation_service
+        self.purge_service = purge_service
+
+    def routes(self) -> list:
+        routes = [
+            Route('/conversations', self.create_conversation, methods=['POST']),
+            Route('/conversations', self.get_all_conversations, methods=['GET']),
+            Route('/conversations/{conversation_id:int}', self.get_conversation_by_id, methods=['GET']),
+            Route('/conversations/{conversation_id:int}', self.delete_conversation, methods=['DELETE']),
+            Route('/conversations/{conversation_id:int}', self.update_conversation_by_id, methods=['PUT']),
+            Route('/conversations/{conversation_id:int}/fork', self.fork_conversation, methods=['POST']),
+        ]
+        if self.purge_service is not None:
+            # 后台清除已删除对话的进度
+            routes.append(Route('/purge/stats', self.get_purge_stats, methods=['GET']))
+        return routes
+
+    @handle_errors_async
+    async def create_conversation(self, request: Request) -> Response:
+        """创建新的对话"""
+        data = await _get_json(request)
+        if not data:
+            return JSONResponse({'message': 'No JSON data provided'}, status_code=400)
+
+        conversation = await run_in_threadpool(self.conversation_service.create_conversation, data.get('title'))
+        return JSONResponse({
+            'message': 'Conversation created successfully',
+            **conversation
+        }, status_code=201)
+
+    @handle_errors_async
+    async def fork_conversation(self, request: Request) -> Response:
+        """从对话中的某条消息分叉出新对话"""
+        data = await _get_json(request) or {}
+        conversation_id = request.path_params['conversation_id']
+        conversation = await run_in_threadpool(
+            self.conversation_service.fork_conversation, conversation_id, data.get('message_id'), data.get('title')
+        )
+        return JSONResponse({
+            'message': 'Conversation forked successfully',
+            **conversation
+        }, status_code=201)
+
+    @handle_errors_async
+    async def delete_conversation(self, request: Request) -> Response:
+        """删除对话"""
+        conversation_id = request.path_params['conversation_id']
+        success = await run_in_threadpool(self.conversation_service.delete_conversation, conversation_id)
+
+        if success:
+            if self.purge_service is not None:
+                self.purge_service.wake()
+            return JSONResponse({'message': 'Conversation deleted successfully'}, status_code=200)
+        else:
+            return JSONResponse({'message': 'Failed to delete conversation'}, status_code=500)
+
+    @handle_errors_async
+    async def get_purge_stats(self, request: Request) -> Response:
+        """获取后台清除的待处理量、已清除数量与数据库文件的页统计"""
+        stats = await run_in_threadpool(self.purge_service.snapshot)
+        return JSONResponse(stats, status_code=200)
+
+    @handle_errors_async
+    async def get_all_conversations(self, request: Request) -> Response:
+        """获取所有对话，?sort=activity 时按最近消息时间排序"""
+        sort = request.query_params.get('sort', 'created')
+        if sort not in self.conversation_service.SORT_OPTIONS:
+            return JSONResponse({'message': f'Unsupported sort: {sort}'}, status_code=400)
+
+        conversations = await run_in_threadpool(self.conversation_service.get_all_conversations, sort)
+        return JSONResponse(conversations, status_code=200)
+
+    @handle_errors_async
+    async def get_conversation_by_id(self, request: Request) -> Response:
+        """根据ID获取单个对话"""
+        conversation_id = request.path_params['conversation_id']
+        conversation = await run_in_threadpool(self.conversation_service.get_conversation_by_id, conversation_id)
+        return JSONResponse(conversation, status_code=200)
+
+    @handle_errors_async
+    async def update_conversation_by_id(self, request: Request) -> Response:
+        """更新对话标题"""
+        data = await _get_json(request)
+        if not data:
+            return JSONResponse({'message': 'No JSON data provided'}, status_code=400)
+
+        conversation_id = request.path_params['conversation_id']
+        updated_conversation = await run_in_threadpool(
+            self.conversation_service.update_conversation_by_id, conversation_id, data.get('title')
+        )
+        return JSONResponse({
+            'message': 'Conversation updated successfully',
+            **updated_conversation
+        }, status_code=200)
+
+
+class AsyncMessageController:
+    """MessageController 的ASGI版本，流式回复为原生异步SSE，等待模型输出时不占用线程"""
+
+    def __init__(self, message_service: MessageService, admission: StreamAdmission = None):
+        self.message_service = message_service
+        self.admission = admission or StreamAdmission()
+
+    def routes(self) -> list:
+        return [
+            Route('/conversations/{conversation_id:int}/messages/recent', self.get_recent_messages, methods=['GET']),
+            Route('/conversations/{conversation_id:int}/messages', self.create_message, methods=['POST']),
+            Route('/conversations/{conversation_id:int}/stream', self.stream_message, methods=['POST']),
+            Route('/streams/stats', self.get_stream_stats, methods=['GET']),
+            Route('/messages/{message_id:int}', self.get_message, methods=['GET']),
+            Route('/messages/{message_id:int}', self.delete_message, methods=['DELETE']),
+            Route('/conversations/{conversation_id:int}/messages', self.get_conversation_messages, methods=['GET']),
+            Route('/conversations/{conversation_id:int}/messages', self.delete_conversation_messages, methods=['DELETE']),
+        ]
+
+    @handle_errors_async
+    async def get_recent_messages(self, request: Request) -> Response:
+        """获取对话的最近消息"""
+        conversation_id = request.path_params['conversation_id']
+        try:
+            limit = int(request.query_params.get('limit', 500))
+        except ValueError:
+            limit = 500
+        messages = await run_in_threadpool(self.message_service.get_recent_messages, conversation_id, limit)
+        return JSONResponse(messages, status_code=200)
+
+    @handle_errors_async
+    async def create_message(self, request: Request) -> Response:
+        """创建新消息"""
+        data = await _get_json(request)
+        if not data:
+            return JSONResponse({'message': 'No JSON data provided'}, status_code=400)
+
+        conversation_id = request.path_params['conversation_id']
+        message = await run_in_threadpool(
+            self.message_service.create_message, conversation_id, data.get('role'), data.get('content')
+        )
+        return JSONResponse({
+            'message': 'Message created successfully',
+            **message
+        }, status_code=201)
+
+    @handle_errors_async
+    async def get_message(self, request: Request) -> Response:
+        """根据ID获取特定消息"""
+        message = await run_in_threadpool(self.message_service.get_message, request.path_params['message_id'])
+        return JSONResponse(message, status_code=200)
+
+    @handle_errors_async
+    async def stream_message(self, request: Request) -> Response:
+        """POST 流式处理消息(fetch 消费)"""
+        data = await _get_json(request)
+        if not data:
+            return JSONResponse({'message': 'No JSON data provided'}, status_code=400)
+
+        conversation_id = request.path_params['conversation_id']
+        content = data.get('content')
+        web = bool(data.get('web', False))
+
+        # 超出并发上限、排队超时或同一对话已有进行中的生成时立即返回429；排队等待在线程池中进行，不阻塞事件循环
+        try:
+            ticket = await run_in_threadpool(self.admission.acquire, conversation_id)
+        except AdmissionRejected as e:
+            return JSONResponse(
+                {'message': 'Too many concurrent streams', 'reason': e.reason},
+                status_code=429,
+                headers={'Retry-After': str(e.retry_after)}
+            )
+
+        tracing.instant('admission', waited=ticket.waited)
+
+        async def generate():
+            try:
+                async for chunk in self.message_service.astream_message(conversation_id, content, web=web):
+                    yield chunk
+            except Exception as e:
+                logger.error(f"Stream error: {str(e)}")
+                yield f"data: {json.dumps({'type': 'error', 'message': 'Stream processing failed'})}\n\n"
+            finally:
+                self.admission.release(ticket)
+
+        try:
+            return AdmittedStreamingResponse(
+                generate(),
+                self.admission,
+                ticket,
+                media_type='text/event-stream',
+                headers={'Cache-Control': 'no-cache'}
+            )
+        except BaseException:
+            self.admission.release(ticket)
+            raise
+
+    @handle_errors_async
+    async def get_stream_stats(self, request: Request) -> Response:
+        """获取流式生成的并发、队列深度与等待时间统计"""
+        return JSONResponse(self.admission.snapshot(), status_code=200)
+
+    @handle_errors_async
+    async def delete_message(self, request: Request) -> Response:
+        """删除特定消息"""
+        success = await run_in_threadpool(self.message_service.delete_message, request.path_params['message_id'])
+
+        if success:
+            return JSONResponse({'message': 'Message deleted successfully'}, status_code=200)
+        else:
+            return JSONResponse({'message': 'Failed to delete message'}, status_code=500)
+
+    @handle_errors_async
+    async def delete_conversation_messages(self, request: Request) -> Response:
+        """删除对话的所有消息"""
+        conversation_id = request.path_params['conversation_id']
+        success = await run_in_threadpool(self.message_service.delete_conversation_messages, conversation_id)
+
+        if success:
+            return JSONResponse({'message': 'All messages in conversation deleted successfully'}, status_code=200)
+        else:
+            return JSONResponse({'message': 'Failed to delete messages'}, status_code=500)
+
+    @handle_errors_async
+    async def get_conversation_messages(self, request: Request) -> Response:
+        """获取对话的所有消息"""
+        conversation_id = request.path_params['conversation_id']
+        messages = await run_in_threadpool(self.message_service.get_conversation_messages, conversation_id)
+        return JSONResponse(messages, status_code=200)
+
+
+class AsyncBatchController:
+    """BatchController 的ASGI版本，整个批次在线程池的同一个线程中执行（事务绑定在线程的连接上）"""
+
+    def __init__(self, batch_service: BatchService):
+        self.batch_service = batch_service
+
+    def routes(self) -> list:
+        return [Route('/batch', self.batch, methods=['POST'])]
+
+    @handle_errors_async
+    async def batch(self, request: Request) -> Response:
+        """按顺序执行子操作，各子操作的结果与错误分别返回"""
+        data = await _get_json(request)
+        if not data:
+            return JSONResponse({'message': 'No JSON data provided'}, status_code=400)
+
+        try:
+            ops = self.batch_service.validate(data.get('ops'))
+        except ValueError as e:
+            return JSONResponse({'message': str(e)}, status_code=400)
+
+        results = await run_in_threadpool(self.batch_service.execute, ops)
+        return JSONResponse({'results': results}, status_code=200)
+
+
+class NeuNexusASGIApp:
+    """NeuNexusApp 的ASGI版本
+
+    单进程内以协程承载连接，空闲与流式连接只占用一个协程而不是一个线程；
+    SQLite访问经 run_in_threadpool 在有界线程池中执行。
+    """
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        client: DeepSeekClient,
+        web_pipeline: 'WebSearchPipeline' = None,
+        tracer: Tracer = None,
+        purge_service: PurgeService = None,
+        admission: StreamAdmission = None
+    ):
+        conversation_service = ConversationService(db_manager)
+        message_service = MessageService(db_manager, client, web_pipeline)
+        batch_service = BatchService(db_manager, conversation_service, message_service)
+        self.purge_service = purge_service or PurgeService(db_manager)
+
+        conversation_controller = AsyncConversationController(conversation_service, self.purge_service)
+        message_controller = AsyncMessageController(message_service, admission)
+        batch_controller = AsyncBatchController(batch_service)
+
+        self.app = Starlette(
+            routes=conversation_controller.routes() + message_controller.routes() + batch_controller.routes() + [
+                Route('/metrics', metrics, methods=['GET'])
+            ],
+            middleware=[
+                Middleware(MetricsMiddleware),
+                *([Middleware(TracingMiddleware, tracer=tracer)] if tracer is not None else []),
+                Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])
+            ],
+            lifespan=self._lifespan
+        )
+
+    @contextlib.asynccontextmanager
+    async def _lifespan(self, app: Starlette):
+        """后台清除线程随服务启动与停止"""
+        self.purge_service.start()
+        try:
+            yield
+        finally:
+            self.purge_service.stop()
+
+    def run(self, host="0.0.0.0", port=5000, backlog=4096, timeout_keep_alive=30):
+        try:
+            import uvicorn
+        except ImportError:
+            raise ImportError("ASGI模式需要安装uvicorn: pip install uvicorn")
+
+        uvicorn.run(self.app, host=host, port=port, backlog=backlog, timeout_keep_alive=timeout_keep_alive)
@@ -2,6 +2,8 @@ from flask import Flask, jsonify
 from functools import wraps
 from typing import Any, Callable
 
+from neunexus.core.metrics import HTTP_ERRORS
+
 
 
 def handle_errors(func: Callable) -> Callable:
@@ -11,6 +13,7 @@ def handle_errors(func: Callable) -> Callable:
         try:
             return func(*args, **kwargs)
         except Exception as e:
+            HTTP_ERRORS.inc(endpoint=func.__name__, type=type(e).__name__)
             if args and hasattr(args[0], 'app') and isinstance(args[0].app, Flask):
                 args[0].app.logger.error(f"Error in {func.__name__}: {str(e)}")
             return jsonify({'error': 'Internal server error'}), 500
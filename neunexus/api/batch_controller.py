@@ -0,0 +1,36 @@
+from flask import Flask, Response, jsonify, request
+from neunexus.service import BatchService
+from neunexus.api.base import handle_errors
+
+
+class BatchController:
+    """批量请求控制器，一次请求执行多个子操作"""
+    
+    def __init__(self, app: Flask, batch_service: BatchService):
+        self.app = app
+        self.batch_service = batch_service
+        
+    def register_routes(self) -> Flask:
+        self.app.add_url_rule(
+            '/batch', 
+            'batch', 
+            self.batch, 
+            methods=['POST']
+        )
+        
+        return self.app
+    
+    @handle_errors
+    def batch(self) -> Response:
+        """按顺序执行子操作，各子操作的结果与错误分别返回"""
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({'message': 'No JSON data provided'}), 400
+        
+        try:
+            ops = self.batch_service.validate(data.get('ops'))
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        results = self.batch_service.execute(ops)
+        return jsonify({'results': results}), 200
@@ -1,14 +1,16 @@
+from typing import Optional
 from flask import Flask, Response, jsonify, request
-from neunexus.service import ConversationService
+from neunexus.service import ConversationService, PurgeService
 from neunexus.api.base import handle_errors
 
 
 
 
 class ConversationController:
-    def __init__(self, app: Flask, conversation_service: ConversationService):
+    def __init__(self, app: Flask, conversation_service: ConversationService, purge_service: Optional[PurgeService] = None):
         self.app = app
         self.conversation_service = conversation_service
+        self.purge_service = purge_service
         
     def register_routes(self) -> Flask:
         self.app.add_url_rule(
@@ -41,6 +43,20 @@ class ConversationController:
             self.update_conversation_by_id, 
             methods=['PUT']
         )
+        self.app.add_url_rule(
+            '/conversations/<int:conversation_id>/fork', 
+            'fork_conversation', 
+            self.fork_conversation, 
+            methods=['POST']
+        )
+        if self.purge_service is not None:
+            # 后台清除已删除对话的进度
+            self.app.add_url_rule(
+                '/purge/stats', 
+                'get_purge_stats', 
+                self.get_purge_stats, 
+                methods=['GET']
+            )
     
         return self.app
 
@@ -59,20 +75,44 @@ class ConversationController:
             **conversation
         }), 201
             
+    @handle_errors
+    def fork_conversation(self, conversation_id: int) -> Response:
+        """从对话中的某条消息分叉出新对话"""
+        data = request.get_json(silent=True) or {}
+        conversation = self.conversation_service.fork_conversation(
+            conversation_id, data.get('message_id'), data.get('title')
+        )
+        
+        return jsonify({
+            'message': 'Conversation forked successfully',
+            **conversation
+        }), 201
+            
     @handle_errors
     def delete_conversation(self, conversation_id: int) -> Response:
         """删除对话"""
         success = self.conversation_service.delete_conversation(conversation_id)
         
         if success:
+            if self.purge_service is not None:
+                self.purge_service.wake()
             return jsonify({'message': 'Conversation deleted successfully'}), 200
         else:
             return jsonify({'message': 'Failed to delete conversation'}), 500
 
+    @handle_errors
+    def get_purge_stats(self) -> Response:
+        """获取后台清除的待处理量、已清除数量与数据库文件的页统计"""
+        return jsonify(self.purge_service.snapshot()), 200
+
     @handle_errors
     def get_all_conversations(self) -> Response:
-        """获取所有对话"""
-        conversations = self.conversation_service.get_all_conversations()
+        """获取所有对话，?sort=activity 时按最近消息时间排序"""
+        sort = request.args.get('sort', 'created')
+        if sort not in self.conversation_service.SORT_OPTIONS:
+            return jsonify({'message': f'Unsupported sort: {sort}'}), 400
+        
+        conversations = self.conversation_service.get_all_conversations(sort)
         return jsonify(conversations), 200
 
     @handle_errors
@@ -1,16 +1,19 @@
 
 import json
-from flask import Flask, Response, jsonify, request, stream_with_context
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from neunexus.service import MessageService
+from neunexus.api.admission import AdmissionRejected, StreamAdmission
 from neunexus.api.base import handle_errors
+from neunexus.core import tracing
 
 
 class MessageController:
     """消息控制器，处理消息相关的HTTP请求"""
     
-    def __init__(self, app: Flask, message_service: MessageService):
+    def __init__(self, app: Flask, message_service: MessageService, admission: StreamAdmission = None):
         self.app = app
         self.message_service = message_service
+        self.admission = admission or StreamAdmission()
         
     def register_routes(self) -> Flask:
         """注册消息相关的路由"""
@@ -39,6 +42,14 @@ class MessageController:
             methods=['POST']
         )
         
+        # 流式生成的并发与排队统计
+        self.app.add_url_rule(
+            '/streams/stats',
+            'get_stream_stats',
+            self.get_stream_stats,
+            methods=['GET']
+        )
+        
         # 获取特定消息
         self.app.add_url_rule(
             '/messages/<int:message_id>', 
@@ -112,20 +123,48 @@ class MessageController:
             return jsonify({'message': 'No JSON data provided'}), 400
 
         content = data.get('content')
+        web = bool(data.get('web', False))
+        
+        # 超出并发上限、排队超时或同一对话已有进行中的生成时立即返回429
+        try:
+            ticket = self.admission.acquire(conversation_id)
+        except AdmissionRejected as e:
+            response = jsonify({'message': 'Too many concurrent streams', 'reason': e.reason})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
+        
+        tracing.instant('admission', waited=ticket.waited)
+        trace = g.get('trace')
         
         def generate():
+            tracing.attach(trace)
             try:
-                for chunk in self.message_service.stream_message(conversation_id, content):
+                for chunk in self.message_service.stream_message(conversation_id, content, web=web):
                     yield chunk
             except Exception as e:
                 self.app.logger.error(f"Stream error: {str(e)}")
                 yield f"data: {json.dumps({'type': 'error', 'message': 'Stream processing failed'})}\n\n"
+            finally:
+                tracing.attach(None)
+                self.admission.release(ticket)
 
-        return Response(
-            stream_with_context(generate()),
-            mimetype='text/event-stream',
-            headers={'Cache-Control': 'no-cache'}
-        )
+        try:
+            response = Response(
+                stream_with_context(generate()),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache'}
+            )
+        except BaseException:
+            self.admission.release(ticket)
+            raise
+        # 客户端在生成开始前断开时生成器不会执行，由响应关闭回调兜底释放名额
+        response.call_on_close(lambda: self.admission.release(ticket))
+        return response
+    
+    @handle_errors
+    def get_stream_stats(self) -> Response:
+        """获取流式生成的并发、队列深度与等待时间统计"""
+        return jsonify(self.admission.snapshot()), 200
     
     @handle_errors
     def delete_message(self, message_id: int) -> Response:
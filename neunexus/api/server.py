@@ -0,0 +1,72 @@
+import multiprocessing
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+from flask import Flask
+
+
+@dataclass
+class ServerConfig:
+    """生产环境服务配置（gunicorn）
+
+    worker_class 为 "gevent" 时每个工作进程用协程承载大量并发的SSE长连接，
+    不可用gevent时可改为 "gthread"，并发数为 workers * threads。
+    收到SIGTERM后工作进程停止接收新请求，最多等待 graceful_timeout 秒让进行中的流式回复结束。
+    """
+    host: str = "0.0.0.0"
+    port: int = 5000
+    workers: int = field(default_factory=lambda: multiprocessing.cpu_count() * 2 + 1)
+    worker_class: str = "gevent"
+    threads: int = 4
+    worker_connections: int = 1000
+    timeout: int = 120
+    graceful_timeout: int = 60
+    keepalive: int = 5
+    max_requests: int = 0
+    max_requests_jitter: int = 0
+    loglevel: str = "info"
+    accesslog: Optional[str] = "-"
+
+    def to_gunicorn(self) -> Dict[str, object]:
+        return {
+            "bind": f"{self.host}:{self.port}",
+            "workers": self.workers,
+            "worker_class": self.worker_class,
+            "threads": self.threads,
+            "worker_connections": self.worker_connections,
+            "timeout": self.timeout,
+            "graceful_timeout": self.graceful_timeout,
+            "keepalive": self.keepalive,
+            "max_requests": self.max_requests,
+            "max_requests_jitter": self.max_requests_jitter,
+            "loglevel": self.loglevel,
+            "accesslog": self.accesslog,
+            # 应用在各工作进程fork之后创建：数据库连接、线程池与gevent补丁都不会跨进程共享
+            "preload_app": False,
+        }
+
+
+def serve(app_factory: Callable[[], Flask], config: Optional[ServerConfig] = None, on_starting: Optional[Callable[[], None]] = None):
+    """使用gunicorn运行应用
+
+    app_factory 在每个工作进程中调用一次以创建Flask应用；
+    on_starting 在主进程fork工作进程之前调用一次，适合执行建表等只需做一次的初始化。
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise ImportError("生产模式需要安装gunicorn: pip install gunicorn gevent")
+
+    config = config or ServerConfig()
+
+    class NeuNexusServer(BaseApplication):
+        def load_config(self):
+            for key, value in config.to_gunicorn().items():
+                self.cfg.set(key, value)
+            if on_starting is not None:
+                self.cfg.set("on_starting", lambda _: on_starting())
+
+        def load(self):
+            return app_factory()
+
+    NeuNexusServer().run()
@@ -0,0 +1,280 @@
+import json
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from flask import Flask
+from neunexus.api.admission import AdmissionRejected, StreamAdmission
+from neunexus.service import MessageService
+
+
+class SocketConnection:
+    """一个WebSocket连接，多个流的生产线程共用，发送需要串行化"""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def send(self, frame: dict) -> bool:
+        if self.closed:
+            return False
+        data = json.dumps(frame, ensure_ascii=False)
+        try:
+            with self._lock:
+                self.ws.send(data)
+            return True
+        except Exception:
+            self.closed = True
+            return False
+
+
+class StreamSession:
+    """一次流式回复的状态
+
+    每个帧带有递增的 seq，已发送但未被确认的帧保留在缓冲中，断线重连后可从任意已确认位置之后重放。
+    未确认的帧达到 window 个时生产者暂停读取上游，直到客户端确认或取消。
+    """
+
+    def __init__(self, stream_id: str, conversation_id: int, window: int):
+        self.stream_id = stream_id
+        self.conversation_id = conversation_id
+        self.window = window
+        self.frames: Deque[dict] = deque()   # seq 大于 acked 的帧
+        self.next_seq = 1
+        self.acked = 0
+        self.cancelled = False
+        self.finished_at: Optional[float] = None
+        self.connection: Optional[SocketConnection] = None
+        self.detached_at: Optional[float] = None
+        self.cond = threading.Condition()
+
+    def publish(self, event: dict):
+        """记录并发送一个帧；连接断开时只缓存，等待重连后重放"""
+        with self.cond:
+            frame = {
+                **event,
+                'stream_id': self.stream_id,
+                'conversation_id': self.conversation_id,
+                'seq': self.next_seq
+            }
+            self.next_seq += 1
+            self.frames.append(frame)
+            if self.connection is not None and not self.connection.send(frame):
+                self._detach()
+
+    def wait_for_window(self, resume_ttl: float) -> bool:
+        """等待发送窗口有空位；被取消或断线超过resume_ttl秒未重连时返回False"""
+        with self.cond:
+            while not self.cancelled and self.next_seq - 1 - self.acked >= self.window:
+                if self.detached_at is not None and time.monotonic() - self.detached_at > resume_ttl:
+                    self.cancelled = True
+                    break
+                self.cond.wait(1.0)
+            return not self.cancelled
+
+    def ack(self, seq: int):
+        with self.cond:
+            if seq <= self.acked:
+                return
+            self.acked = min(seq, self.next_seq - 1)
+            while self.frames and self.frames[0]['seq'] <= self.acked:
+                self.frames.popleft()
+            self.cond.notify_all()
+
+    def cancel(self):
+        with self.cond:
+            self.cancelled = True
+            self.cond.notify_all()
+
+    def attach(self, connection: SocketConnection, after: int):
+        """绑定到（新的）连接并重放 seq 大于after的帧"""
+        with self.cond:
+            self.ack(after)
+            self.connection = connection
+            self.detached_at = None
+            for frame in self.frames:
+                if not connection.send(frame):
+                    self._detach()
+                    break
+            self.cond.notify_all()
+
+    def detach(self, connection: SocketConnection):
+        with self.cond:
+            if self.connection is connection:
+                self._detach()
+
+    def _detach(self):
+        self.connection = None
+        self.detached_at = time.monotonic()
+
+    def finish(self):
+        with self.cond:
+            self.finished_at = time.monotonic()
+            self.cond.notify_all()
+
+    def expired(self, resume_ttl: float) -> bool:
+        """已结束且客户端已确认全部帧，或结束后超过resume_ttl秒"""
+        with self.cond:
+            if self.finished_at is None:
+                return False
+            return not self.frames or time.monotonic() - self.finished_at > resume_ttl
+
+
+class StreamSocketController:
+    """WebSocket多路复用流式接口：一个连接上同时承载多个对话的流式回复
+
+    客户端消息（JSON文本帧）：
+    - {"type": "start", "stream_id", "conversation_id", "content", "web"}  开始一个流
+    - {"type": "cancel", "stream_id"}                                      取消流
+    - {"type": "resume", "stream_id", "after"}                             重连后从 seq 为after之后重放
+    - {"type": "ack", "stream_id", "seq"}                                  确认已处理到seq，释放发送窗口
+    - {"type": "ping"}
+    服务端帧与SSE事件相同（searching/sources/chunk/complete/error），另有 cancelled 与 pong，
+    每个帧附带 stream_id、conversation_id 与 seq。
+
+    依赖可选的 flask-sock；未安装时不注册该接口，客户端退回SSE接口。
+    流的状态保存在进程内，多工作进程部署时重连需要落到同一工作进程才能恢复。
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        message_service: MessageService,
+        admission: StreamAdmission = None,
+        window: int = 64,
+        resume_ttl: float = 60.0
+    ):
+        self.app = app
+        self.message_service = message_service
+        self.admission = admission or StreamAdmission()
+        self.window = window
+        self.resume_ttl = resume_ttl
+        self.sessions: Dict[str, StreamSession] = {}
+        self._lock = threading.Lock()
+
+    def register_routes(self) -> Flask:
+        try:
+            from flask_sock import Sock
+        except ImportError:
+            print("未安装flask-sock，WebSocket流式接口不可用（pip install flask-sock）")
+            return self.app
+
+        Sock(self.app).route('/ws')(self.stream_socket)
+        return self.app
+
+    def stream_socket(self, ws):
+        """处理一个WebSocket连接，直到客户端断开"""
+        connection = SocketConnection(ws)
+        attached = set()
+        try:
+            while not connection.closed:
+                raw = ws.receive()
+                if raw is None:
+                    continue
+                try:
+                    message = json.loads(raw)
+                except ValueError:
+                    connection.send({'type': 'error', 'reason': 'invalid_json'})
+                    continue
+                if isinstance(message, dict):
+                    self._dispatch(connection, message, attached)
+        finally:
+            connection.closed = True
+            for stream_id in attached:
+                session = self._get(stream_id)
+                if session is not None:
+                    session.detach(connection)
+
+    def _dispatch(self, connection: SocketConnection, message: dict, attached: set):
+        kind = message.get('type')
+        stream_id = message.get('stream_id')
+
+        if kind == 'ping':
+            connection.send({'type': 'pong'})
+            return
+
+        if not isinstance(stream_id, str) or not stream_id or len(stream_id) > 64:
+            connection.send({'type': 'error', 'reason': 'invalid_stream_id'})
+            return
+
+        if kind == 'start':
+            self._start(connection, message, stream_id, attached)
+            return
+
+        session = self._get(stream_id)
+        if session is None:
+            connection.send({'type': 'error', 'stream_id': stream_id, 'reason': 'unknown_stream'})
+        elif kind == 'cancel':
+            session.cancel()
+        elif kind == 'ack':
+            seq = message.get('seq')
+            if isinstance(seq, int):
+                session.ack(seq)
+        elif kind == 'resume':
+            after = message.get('after')
+            attached.add(stream_id)
+            session.attach(connection, after if isinstance(after, int) else 0)
+        else:
+            connection.send({'type': 'error', 'stream_id': stream_id, 'reason': 'unknown_type'})
+
+    def _start(self, connection: SocketConnection, message: dict, stream_id: str, attached: set):
+        conversation_id = message.get('conversation_id')
+        content = message.get('content')
+        if not isinstance(conversation_id, int) or not content or not isinstance(content, str):
+            connection.send({'type': 'error', 'stream_id': stream_id, 'reason': 'invalid_request'})
+            return
+
+        session = StreamSession(stream_id, conversation_id, self.window)
+        with self._lock:
+            self._sweep()
+            if stream_id in self.sessions:
+                connection.send({'type': 'error', 'stream_id': stream_id, 'reason': 'duplicate_stream'})
+                return
+            self.sessions[stream_id] = session
+
+        attached.add(stream_id)
+        session.attach(connection, 0)
+        threading.Thread(
+            target=self._produce,
+            args=(session, content, bool(message.get('web', False))),
+            daemon=True
+        ).start()
+
+    def _produce(self, session: StreamSession, content: str, web: bool):
+        """在独立线程中生成回复，按发送窗口与客户端确认节奏推进"""
+        try:
+            ticket = self.admission.acquire(session.conversation_id)
+        except AdmissionRejected as e:
+            session.publish({'type': 'error', 'reason': e.reason, 'retry_after': e.retry_after})
+            session.finish()
+            return
+
+        try:
+            events = self.message_service.stream_events(session.conversation_id, content, web=web)
+            try:
+                for event in events:
+                    if not session.wait_for_window(self.resume_ttl):
+                        break
+                    session.publish(event)
+            finally:
+                # 取消时关闭生成器，停止读取上游
+                events.close()
+            if session.cancelled:
+                session.publish({'type': 'cancelled'})
+        except Exception as e:
+            self.app.logger.error(f"Stream error: {str(e)}")
+            session.publish({'type': 'error', 'message': 'Stream processing failed'})
+        finally:
+            self.admission.release(ticket)
+            session.finish()
+
+    def _get(self, stream_id: str) -> Optional[StreamSession]:
+        with self._lock:
+            return self.sessions.get(stream_id)
+
+    def _sweep(self):
+        """清理已结束且不再需要重放的流（调用方持有 self._lock）"""
+        for stream_id in [sid for sid, session in self.sessions.items() if session.expired(self.resume_ttl)]:
+            del self.sessions[stream_id]
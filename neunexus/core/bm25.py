@@ -0,0 +1,119 @@
+import math
+import re
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+
+# 中日韩字符区间：汉字、假名、谚文
+_CJK_RANGES = (
+    "\u3040-\u30ff"
+    "\u3400-\u4dbf"
+    "\u4e00-\u9fff"
+    "\uac00-\ud7af"
+    "\uf900-\ufaff"
+)
+_TOKEN_PATTERN = re.compile(rf"[{_CJK_RANGES}]+|[^\W{_CJK_RANGES}]+", re.UNICODE)
+_CJK_PATTERN = re.compile(rf"[{_CJK_RANGES}]")
+
+
+def tokenize(text: str) -> List[str]:
+    """分词：空格分隔语言按词切分，中日韩文本按字二元组(bigram)切分"""
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text.lower()):
+        run = match.group()
+        if _CJK_PATTERN.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+class BM25Index:
+    """增量维护的倒排索引，使用BM25打分"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.doc_lengths: Dict[int, int] = {}
+        self.doc_terms: Dict[int, List[str]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, doc_id: int, text: str):
+        """将文档加入索引"""
+        if doc_id in self.doc_lengths:
+            return
+
+        tokens = tokenize(text)
+        term_freqs: Dict[str, int] = defaultdict(int)
+        for token in tokens:
+            term_freqs[token] += 1
+
+        for term, freq in term_freqs.items():
+            self.postings[term][doc_id] = freq
+
+        self.doc_lengths[doc_id] = len(tokens)
+        self.doc_terms[doc_id] = list(term_freqs)
+        self.total_length += len(tokens)
+
+    def remove(self, doc_id: int):
+        """从索引中移除文档"""
+        if doc_id not in self.doc_lengths:
+            return
+
+        for term in self.doc_terms.pop(doc_id):
+            postings = self.postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[term]
+
+        self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def remap(self, mapping: Dict[int, int]):
+        """按 旧ID -> 新ID 的映射重写文档ID，不在映射中的文档被丢弃"""
+        postings = defaultdict(dict)
+        for term, old_postings in self.postings.items():
+            for doc_id, freq in old_postings.items():
+                if doc_id in mapping:
+                    postings[term][mapping[doc_id]] = freq
+        self.postings = postings
+        self.doc_lengths = {mapping[d]: n for d, n in self.doc_lengths.items() if d in mapping}
+        self.doc_terms = {mapping[d]: t for d, t in self.doc_terms.items() if d in mapping}
+        self.total_length = sum(self.doc_lengths.values())
+
+    def idf(self, term: str) -> float:
+        """计算词项的逆文档频率"""
+        n = len(self.doc_lengths)
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def scores(self, query: str) -> Dict[int, float]:
+        """计算查询与所有命中文档的BM25分数，未命中的文档不出现在结果中"""
+        if not self.doc_lengths:
+            return {}
+
+        avg_length = self.total_length / len(self.doc_lengths) or 1.0
+        results: Dict[int, float] = defaultdict(float)
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+
+            idf = self.idf(term)
+            for doc_id, freq in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                results[doc_id] += idf * freq * (self.k1 + 1) / (freq + norm)
+
+        return results
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[int, float]]:
+        """返回BM25分数最高的top_k个文档"""
+        scores = self.scores(query)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
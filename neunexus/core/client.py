@@ -1,6 +1,40 @@
-from openai import OpenAI
-from typing import List, Tuple
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, OpenAI
+from typing import AsyncIterator, List, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+
+from neunexus.core import tracing
+from neunexus.core.metrics import (
+    LLM_ERRORS, LLM_REQUEST_SECONDS, LLM_TIME_TO_FIRST_TOKEN, LLM_TOKENS, LLM_TOKENS_PER_SECOND
+)
+
+
+class _StreamTimer:
+    """记录一次流式回复的首字耗时、输出速度与总耗时（以内容片段数近似token数）"""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.start = time.perf_counter()
+        self.first = None
+        self.chunks = 0
+
+    def chunk(self):
+        if self.first is None:
+            self.first = time.perf_counter()
+            LLM_TIME_TO_FIRST_TOKEN.observe(self.first - self.start, mode=self.mode)
+            tracing.instant("llm.first_token", ttft_ms=round((self.first - self.start) * 1000, 3))
+        self.chunks += 1
+
+    def error(self, e: BaseException):
+        LLM_ERRORS.inc(mode=self.mode, type=type(e).__name__)
+
+    def finish(self):
+        end = time.perf_counter()
+        LLM_REQUEST_SECONDS.observe(end - self.start, mode=self.mode)
+        LLM_TOKENS.inc(self.chunks, mode=self.mode)
+        if self.first is not None and self.chunks > 1 and end > self.first:
+            LLM_TOKENS_PER_SECOND.observe((self.chunks - 1) / (end - self.first), mode=self.mode)
+
 
 class DeepSeekClient:
     def __init__(
@@ -12,8 +46,27 @@ class DeepSeekClient:
     ):
         self.model = model
         self.init_prompt = init_prompt
+        self.api_key = api_key
+        self.base_url = base_url
         self.client = OpenAI(api_key=api_key, base_url=base_url)
-
+        self._async_client = None
+    
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """异步客户端，在首次使用时创建（需在事件循环中使用）"""
+        if self._async_client is None:
+            import httpx
+            
+            self._async_client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                # 单进程承载大量并发流式回复，放宽默认的1000连接上限
+                http_client=DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(max_connections=10000, max_keepalive_connections=200)
+                )
+            )
+        return self._async_client
+    
     def stream_chat(self, user_message: str, histories: List[Tuple]=None):
         if histories is None:
             histories = []
@@ -23,17 +76,68 @@ class DeepSeekClient:
             
         histories.append({"role": "user", "content": user_message})
         assistant_message = {"role": "assistant", "content": ""}
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=histories,
-            stream=True,
-        )
-
-        for chunk in response:
-            if chunk.choices[0].delta.content:
-                content = chunk.choices[0].delta.content
-                assistant_message["content"] += content
-                yield content, histories
+        timer = _StreamTimer("stream")
+        try:
+            with tracing.span("llm.request", model=self.model, messages=len(histories)):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=histories,
+                    stream=True,
+                )
+
+            for chunk in response:
+                if chunk.choices[0].delta.content:
+                    timer.chunk()
+                    content = chunk.choices[0].delta.content
+                    assistant_message["content"] += content
+                    yield content, histories
+        except Exception as e:
+            timer.error(e)
+            raise
+        finally:
+            timer.finish()
+                
+        histories.append(assistant_message)
+        
+        yield "\n", histories
+    
+    async def astream_chat(self, user_message: str, histories: List[Tuple]=None) -> AsyncIterator[Tuple[str, list]]:
+        """stream_chat 的异步版本，等待上游时不占用线程"""
+        if histories is None:
+            histories = []
+
+        if isinstance(histories, list) and len(histories) == 0:
+            histories = [{"role": "system", "content": self.init_prompt}]
+            
+        histories.append({"role": "user", "content": user_message})
+        assistant_message = {"role": "assistant", "content": ""}
+        timer = _StreamTimer("astream")
+        try:
+            with tracing.span("llm.request", model=self.model, messages=len(histories)):
+                response = await self.async_client.chat.completions.create(
+                    model=self.model,
+                    messages=histories,
+                    stream=True,
+                )
+        except Exception as e:
+            timer.error(e)
+            timer.finish()
+            raise
+
+        try:
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    timer.chunk()
+                    content = chunk.choices[0].delta.content
+                    assistant_message["content"] += content
+                    yield content, histories
+        except Exception as e:
+            timer.error(e)
+            raise
+        finally:
+            timer.finish()
+            # 客户端断开导致生成器被取消时，及时释放上游连接
+            await response.close()
                 
         histories.append(assistant_message)
         
@@ -48,11 +152,21 @@ class DeepSeekClient:
             
         histories.append({"role": "user", "content": user_message})
         
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=histories,
-            stream=False, 
-        )
+        start = time.perf_counter()
+        try:
+            with tracing.span("llm.generate", model=self.model, messages=len(histories)):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=histories,
+                    stream=False, 
+                )
+        except Exception as e:
+            LLM_ERRORS.inc(mode="generate", type=type(e).__name__)
+            raise
+        finally:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, mode="generate")
+        if getattr(response, "usage", None) is not None:
+            LLM_TOKENS.inc(response.usage.completion_tokens, mode="generate")
         
         assistant_message = {"role": "assistant", "content": response.choices[0].message.content}
         histories.append(assistant_message)
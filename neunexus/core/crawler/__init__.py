@@ -1,7 +1,29 @@
-from neunexus.core.crawler.searchengine_crawer import SearchEngineCrawler
-from neunexus.core.crawler.page_crawer import PageCrawler
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = [
-    "SearchEngineCrawler",
-    "PageCrawler"
-]
\ No newline at end of file
+if TYPE_CHECKING:
+    from neunexus.core.crawler.searchengine_crawer import SearchEngineCrawler
+    from neunexus.core.crawler.page_crawer import PageCrawler
+    from neunexus.core.crawler.site_crawler import SiteCrawler
+
+# 公开名称 -> 所在模块，首次访问时才导入
+_LAZY_IMPORTS = {
+    "SearchEngineCrawler": "neunexus.core.crawler.searchengine_crawer",
+    "PageCrawler": "neunexus.core.crawler.page_crawer",
+    "SiteCrawler": "neunexus.core.crawler.site_crawler",
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
+
+def __getattr__(name):
+    module = _LAZY_IMPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
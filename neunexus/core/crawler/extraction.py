@@ -0,0 +1,107 @@
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional
+
+from neunexus.core.crawler.html_utils import decode_html
+
+
+def extract_main_content(html_content):
+    """使用trafilatura智能提取正文内容并转换为Markdown格式
+
+    只解析一次HTML，标题与正文从同一棵解析树中提取，且只提取用到的标题元数据
+    """
+    # trafilatura导入较慢，只在实际提取时加载
+    import trafilatura
+    from trafilatura.metadata import extract_title
+
+    try:
+        tree = trafilatura.load_html(html_content)
+        title = extract_title(tree)
+
+        extracted = trafilatura.extract(
+            tree,
+            include_links=False,  # 不包含链接
+            include_tables=True,  # 包含表格
+            output_format="markdown"  # 直接输出markdown
+        )
+
+        return {
+            "title": title,
+            "content": extracted,
+            "word_count": len(extracted.split())
+        }
+
+    except Exception as e:
+        print(f"trafilatura提取失败 {e}")
+
+
+def _extract_worker(body, content_type, shm_name=None, size=0):
+    """工作进程入口：解码并提取正文。大页面通过共享内存传入，避免经管道传输整个正文"""
+    if shm_name is not None:
+        # 进程池的工作进程与主进程共用resource_tracker，共享内存由主进程在任务完成后释放
+        shm = shared_memory.SharedMemory(name=shm_name)
+        try:
+            body = bytes(shm.buf[:size])
+        finally:
+            shm.close()
+
+    return extract_main_content(decode_html(body, content_type))
+
+
+class ExtractionPool:
+    """基于进程池的正文提取阶段
+
+    trafilatura提取是CPU密集型且持有GIL，放到独立进程中执行后吞吐量可随CPU核数扩展。
+    同时在途的任务数受max_pending限制，超出时submit阻塞调用方，对抓取线程形成背压。
+    超过shm_threshold字节的正文经共享内存传递给工作进程。
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None, shm_threshold: int = 256 * 1024):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.max_workers * 2
+        self.shm_threshold = shm_threshold
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def submit(self, body: bytes, content_type: Optional[str] = None) -> Future:
+        """提交一个页面正文，在途任务已满时阻塞等待"""
+        self._slots.acquire()
+
+        shm = None
+        try:
+            if len(body) > self.shm_threshold:
+                shm = shared_memory.SharedMemory(create=True, size=len(body))
+                shm.buf[:len(body)] = body
+                future = self._executor.submit(_extract_worker, None, content_type, shm.name, len(body))
+            else:
+                future = self._executor.submit(_extract_worker, body, content_type)
+        except BaseException:
+            self._slots.release()
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            raise
+
+        def on_done(_):
+            self._slots.release()
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+        future.add_done_callback(on_done)
+        return future
+
+    def extract(self, body: bytes, content_type: Optional[str] = None):
+        """提交并等待提取结果"""
+        return self.submit(body, content_type).result()
+
+    def close(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
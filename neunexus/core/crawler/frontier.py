@@ -0,0 +1,161 @@
+import hashlib
+import math
+import os
+import sqlite3
+import struct
+import threading
+import time
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+
+from neunexus.core.crawler.url_utils import normalize_url
+
+
+class BloomFilter:
+    """定长位数组的布隆过滤器，内存占用只取决于容量与误判率"""
+
+    _HEADER = struct.Struct("<QQQ")
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001):
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._lock = threading.Lock()
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def add(self, item: str) -> bool:
+        """加入元素，元素（可能）已存在时返回False"""
+        positions = self._positions(item)
+        with self._lock:
+            added = False
+            for p in positions:
+                mask = 1 << (p & 7)
+                if not self._bits[p >> 3] & mask:
+                    self._bits[p >> 3] |= mask
+                    added = True
+            if added:
+                self.count += 1
+            return added
+
+    def save(self, path: str):
+        tmp_path = f"{path}.tmp"
+        with self._lock, open(tmp_path, "wb") as f:
+            f.write(self._HEADER.pack(self.num_bits, self.num_hashes, self.count))
+            f.write(self._bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BloomFilter":
+        with open(path, "rb") as f:
+            num_bits, num_hashes, count = cls._HEADER.unpack(f.read(cls._HEADER.size))
+            bloom = cls.__new__(cls)
+            bloom.num_bits = num_bits
+            bloom.num_hashes = num_hashes
+            bloom.count = count
+            bloom._bits = bytearray(f.read())
+            bloom._lock = threading.Lock()
+        return bloom
+
+
+class CrawlFrontier:
+    """基于SQLite的持久化优先级抓取队列
+
+    URL入队前先规范化，并用布隆过滤器判重（表主键兜底），进程重启后可继续抓取：
+    未完成的 in_progress 条目会重新排队，布隆过滤器从磁盘加载或由表重建。
+    priority 越小越先出队，相同优先级按入队顺序。
+    """
+
+    def __init__(self, path: str = "./frontier.db", capacity: int = 10_000_000, error_rate: float = 0.001):
+        self.path = path
+        self.bloom_path = f"{path}.bloom"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS frontier (
+                url TEXT PRIMARY KEY,
+                host TEXT NOT NULL,
+                priority REAL NOT NULL,
+                depth INTEGER NOT NULL,
+                state TEXT NOT NULL DEFAULT 'queued' CHECK(state IN ('queued', 'in_progress', 'done', 'failed')),
+                added_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_frontier_queue ON frontier (state, priority, added_at);
+        """)
+        self._conn.execute("UPDATE frontier SET state = 'queued' WHERE state = 'in_progress'")
+        self._conn.commit()
+
+        if os.path.exists(self.bloom_path):
+            self.seen = BloomFilter.load(self.bloom_path)
+        else:
+            self.seen = BloomFilter(capacity, error_rate)
+            for (url,) in self._conn.execute("SELECT url FROM frontier"):
+                self.seen.add(url)
+
+    def push(self, url: str, depth: int = 0, priority: Optional[float] = None, base: str = None) -> bool:
+        """规范化后入队，已见过的URL返回False"""
+        url = normalize_url(url, base)
+        if not self.seen.add(url):
+            return False
+
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO frontier (url, host, priority, depth, added_at) VALUES (?, ?, ?, ?, ?)",
+                (url, urlsplit(url).netloc, depth if priority is None else priority, depth, time.time())
+            )
+            self._conn.commit()
+            return cursor.rowcount > 0
+
+    def pop(self) -> Optional[Tuple[str, int]]:
+        """取出优先级最高的URL并标记为进行中，队列为空时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, depth FROM frontier WHERE state = 'queued' ORDER BY priority, added_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE frontier SET state = 'in_progress' WHERE url = ?", (row[0],))
+            self._conn.commit()
+            return row[0], row[1]
+
+    def mark_done(self, url: str, success: bool = True):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE frontier SET state = ? WHERE url = ?", ("done" if success else "failed", url)
+            )
+            self._conn.commit()
+
+    def size(self) -> int:
+        """待抓取的URL数"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM frontier WHERE state = 'queued'").fetchone()[0]
+
+    def counts(self) -> dict:
+        """各状态的URL数"""
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM frontier GROUP BY state").fetchall()
+        counts = {"queued": 0, "in_progress": 0, "done": 0, "failed": 0}
+        counts.update(dict(rows))
+        return counts
+
+    def seed_hosts(self) -> set:
+        """种子URL（深度为0）所在的主机"""
+        with self._lock:
+            return {host for (host,) in self._conn.execute("SELECT DISTINCT host FROM frontier WHERE depth = 0")}
+
+    def checkpoint(self):
+        """将布隆过滤器写入磁盘"""
+        self.seen.save(self.bloom_path)
+
+    def close(self):
+        self.checkpoint()
+        with self._lock:
+            self._conn.close()
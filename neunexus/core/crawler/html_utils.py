@@ -0,0 +1,67 @@
+import codecs
+import re
+from typing import Optional
+
+from charset_normalizer import from_bytes
+
+
+_HEADER_CHARSET = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.IGNORECASE)
+_META_CHARSET = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.IGNORECASE)
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+# 网页常把GBK/GB2312内容声明为更小的字符集，统一按超集GB18030解码
+_CHARSET_ALIASES = {
+    "gb2312": "gb18030",
+    "gbk": "gb18030",
+    "x-gbk": "gb18030",
+}
+
+
+def _lookup(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    name = _CHARSET_ALIASES.get(name.lower(), name.lower())
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def detect_encoding(body: bytes, content_type: Optional[str] = None) -> str:
+    """按 BOM -> Content-Type头 -> <meta>声明 -> UTF-8校验 的顺序确定编码，
+    都无法确定时才对前32KB做字符集探测，避免对整个正文运行探测"""
+    for bom, encoding in _BOMS:
+        if body.startswith(bom):
+            return encoding
+
+    if content_type:
+        match = _HEADER_CHARSET.search(content_type)
+        encoding = _lookup(match.group(1)) if match else None
+        if encoding:
+            return encoding
+
+    match = _META_CHARSET.search(body[:4096])
+    encoding = _lookup(match.group(1).decode("ascii", "ignore")) if match else None
+    if encoding:
+        return encoding
+
+    sample = body[:32768]
+    try:
+        sample.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        # 截断处恰好落在多字节字符中间时仍视为UTF-8
+        if e.start >= len(sample) - 3 and len(body) > len(sample):
+            return "utf-8"
+
+    best = from_bytes(sample).best()
+    return best.encoding if best else "utf-8"
+
+
+def decode_html(body: bytes, content_type: Optional[str] = None) -> str:
+    """将网页正文解码为字符串"""
+    return body.decode(detect_encoding(body, content_type), errors="replace")
@@ -0,0 +1,276 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+# 正文以解压后的形式缓存，这些与传输编码相关的头不再适用
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    digest: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+
+
+class HttpCache:
+    """基于SQLite的持久化HTTP缓存
+
+    响应正文经zlib压缩后与响应头一同保存，超过ttl的条目需要重新验证；
+    提取后的正文按响应内容摘要单独缓存。总大小超过max_bytes时按最近访问时间淘汰。
+    同一个实例可以被多个爬虫和线程共享。
+    """
+
+    def __init__(self, path: str = "./http_cache.db", ttl: float = 3600, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "stores": 0, "evictions": 0, "extracted_hits": 0}
+
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                digest TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at);
+            CREATE TABLE IF NOT EXISTS extracted (
+                digest TEXT PRIMARY KEY,
+                payload BLOB NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_extracted_accessed ON extracted (accessed_at);
+        """)
+        self._total_bytes = self._conn.execute(
+            "SELECT (SELECT COALESCE(SUM(size), 0) FROM responses) + (SELECT COALESCE(SUM(size), 0) FROM extracted)"
+        ).fetchone()[0]
+
+    @staticmethod
+    def make_key(method: str, url: str, body=None) -> str:
+        """由请求方法、URL和请求体生成缓存键"""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        digest = hashlib.sha1(body).hexdigest() if body else ""
+        return f"{method.upper()} {url} {digest}"
+
+    def record(self, name: str):
+        """累加统计计数"""
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    @property
+    def hit_rate(self) -> float:
+        """命中率（含重新验证后复用的条目）"""
+        served = self.stats["hits"] + self.stats["revalidated"]
+        total = served + self.stats["misses"]
+        return served / total if total else 0.0
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """读取缓存条目（不判断是否过期）"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+
+        return CacheEntry(
+            url=row["url"],
+            status=row["status"],
+            headers=json.loads(row["headers"]),
+            body=zlib.decompress(row["body"]),
+            digest=row["digest"],
+            etag=row["etag"],
+            last_modified=row["last_modified"],
+            stored_at=row["stored_at"]
+        )
+
+    def is_fresh(self, entry: CacheEntry, ttl: Optional[float] = None) -> bool:
+        return time.time() - entry.stored_at < (self.ttl if ttl is None else ttl)
+
+    def put(self, key: str, url: str, status: int, headers: Dict[str, str], body: bytes) -> str:
+        """写入缓存条目，返回正文摘要"""
+        headers = {k: v for k, v in headers.items() if k.lower() not in _DROPPED_HEADERS}
+        compressed = zlib.compress(body, 6)
+        digest = hashlib.sha1(body).hexdigest()
+        now = time.time()
+
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, url, status, headers, body, digest, etag, last_modified, stored_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, status, json.dumps(headers), compressed, digest,
+                 headers.get("ETag") or headers.get("etag"),
+                 headers.get("Last-Modified") or headers.get("last-modified"),
+                 now, now, len(compressed))
+            )
+            self._total_bytes += len(compressed) - (old["size"] if old else 0)
+            self.record("stores")
+            self._evict()
+            self._conn.commit()
+
+        return digest
+
+    def touch(self, key: str):
+        """重新验证成功后刷新条目的存储时间"""
+        with self._lock:
+            self._conn.execute("UPDATE responses SET stored_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+
+    def get_extracted(self, digest: str) -> Optional[dict]:
+        """读取按响应摘要缓存的正文提取结果"""
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM extracted WHERE digest = ?", (digest,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE extracted SET accessed_at = ? WHERE digest = ?", (time.time(), digest))
+            self._conn.commit()
+            self.record("extracted_hits")
+
+        return json.loads(zlib.decompress(row["payload"]))
+
+    def put_extracted(self, digest: str, payload: dict):
+        """缓存正文提取结果"""
+        compressed = zlib.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"), 6)
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM extracted WHERE digest = ?", (digest,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extracted (digest, payload, accessed_at, size) VALUES (?, ?, ?, ?)",
+                (digest, compressed, time.time(), len(compressed))
+            )
+            self._total_bytes += len(compressed) - (old["size"] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """按最近访问时间淘汰条目直到总大小不超过上限（调用方需持有锁）"""
+        while self._total_bytes > self.max_bytes:
+            row = self._conn.execute("""
+                SELECT 'responses' AS tbl, key AS id, size, accessed_at FROM responses
+                UNION ALL
+                SELECT 'extracted' AS tbl, digest AS id, size, accessed_at FROM extracted
+                ORDER BY accessed_at ASC LIMIT 1
+            """).fetchone()
+            if row is None:
+                self._total_bytes = 0
+                break
+
+            column = "key" if row["tbl"] == "responses" else "digest"
+            self._conn.execute(f"DELETE FROM {row['tbl']} WHERE {column} = ?", (row["id"],))
+            self._total_bytes -= row["size"]
+            self.record("evictions")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.execute("DELETE FROM extracted")
+            self._conn.commit()
+            self._total_bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachingAdapter(HTTPAdapter):
+    """带缓存的传输适配器，挂载到 requests.Session 上即可对爬虫透明地启用缓存
+
+    新鲜条目直接返回；过期条目携带 If-None-Match / If-Modified-Since 重新验证，收到304时复用缓存。
+    返回的响应带有 from_cache、cache_digest 与 cache_key 属性，流式请求未命中时 cache_key 非空。
+    """
+
+    def __init__(self, cache: HttpCache, cacheable_methods=("GET",), ttl: Optional[float] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+        self.cacheable_methods = {method.upper() for method in cacheable_methods}
+        self.ttl = ttl
+
+    def send(self, request, **kwargs):
+        if request.method.upper() not in self.cacheable_methods:
+            return super().send(request, **kwargs)
+
+        key = self.cache.make_key(request.method, request.url, request.body)
+        entry = self.cache.get(key)
+
+        if entry is not None and self.cache.is_fresh(entry, self.ttl):
+            self.cache.record("hits")
+            return self._build_cached_response(request, entry)
+
+        if entry is not None:
+            if entry.etag:
+                request.headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                request.headers["If-Modified-Since"] = entry.last_modified
+
+        response = super().send(request, **kwargs)
+
+        if entry is not None and response.status_code == 304:
+            response.close()
+            self.cache.touch(key)
+            self.cache.record("revalidated")
+            return self._build_cached_response(request, entry)
+
+        self.cache.record("misses")
+        response.from_cache = False
+        response.cache_digest = None
+        response.cache_key = None
+
+        cache_control = response.headers.get("Cache-Control", "").lower()
+        if response.status_code == 200 and "no-store" not in cache_control:
+            if kwargs.get("stream"):
+                # 流式请求不在此处读取正文，由调用方读完后通过 cache.put(cache_key, ...) 写入
+                response.cache_key = key
+            else:
+                response.cache_digest = self.cache.put(
+                    key, request.url, response.status_code, dict(response.headers), response.content
+                )
+
+        return response
+
+    def _build_cached_response(self, request, entry: CacheEntry) -> requests.Response:
+        response = requests.Response()
+        response.status_code = entry.status
+        response.headers = CaseInsensitiveDict(entry.headers)
+        response._content = entry.body
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.reason = "OK"
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.connection = self
+        response.from_cache = True
+        response.cache_digest = entry.digest
+        response.cache_key = None
+        return response
@@ -1,58 +1,269 @@
-import random
+import queue
+import threading
 import time
-import html2text
 import requests
-import trafilatura
+
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from neunexus.core.crawler.extraction import extract_main_content
+from neunexus.core.crawler.html_utils import decode_html
+from neunexus.core.crawler.http_cache import CachingAdapter
+from neunexus.core.crawler.politeness import HostThrottle
+from neunexus.core import tracing
+from neunexus.core.metrics import CRAWLER_BYTES, CRAWLER_ERRORS, CRAWLER_FETCH_SECONDS
+
+
+class DownloadRejected(Exception):
+    """响应在读取正文之前或读取过程中被放弃"""
 
 
 class PageCrawler:
-    def __init__(self, user_agent=None, delay=1.0, timeout=10):
+    ALLOWED_CONTENT_TYPES = {"text/html", "application/xhtml+xml"}
+    
+    def __init__(
+        self, 
+        user_agent=None, 
+        delay=1.0, 
+        timeout=10, 
+        max_workers=8, 
+        max_connections_per_host=2,
+        cache=None,
+        extraction_pool=None,
+        max_bytes=5 * 1024 * 1024,
+        download_deadline=30
+    ):
         self.user_agent = user_agent or (
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
             "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         )
         self.delay = delay
         self.timeout = timeout
+        self.max_workers = max_workers
+        self.throttle = HostThrottle(delay, max_connections_per_host)
+        self.cache = cache
+        self.extraction_pool = extraction_pool
+        self.max_bytes = max_bytes
+        self.download_deadline = download_deadline
+        self.stats = {
+            "downloads": 0,
+            "bytes_downloaded": 0,
+            "download_seconds": 0.0,
+            "rejected_content_type": 0,
+            "rejected_too_large": 0,
+            "truncated": 0,
+            "deadline_exceeded": 0,
+            "bytes_saved": 0,
+            "seconds_saved": 0.0,
+        }
+        self._stats_lock = threading.Lock()
+        
         self.session = requests.Session()
         self.session.headers.update({'User-Agent': self.user_agent})
+        if cache is not None:
+            adapter = CachingAdapter(cache, pool_connections=max_workers, pool_maxsize=max_workers)
+        else:
+            adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._html_converter = None
 
-        self.html_converter = html2text.HTML2Text()
-        self.html_converter.ignore_links = True         # 忽略超链接
-        self.html_converter.ignore_images = False       # 保留图片
-        self.html_converter.ignore_emphasis = False     # 保留强调格式
-        self.html_converter.body_width = 0              # 不换行
+    @property
+    def html_converter(self):
+        """HTML转Markdown的转换器，首次使用时才导入html2text"""
+        if self._html_converter is None:
+            import html2text
+
+            converter = html2text.HTML2Text()
+            converter.ignore_links = True         # 忽略超链接
+            converter.ignore_images = False       # 保留图片
+            converter.ignore_emphasis = False     # 保留强调格式
+            converter.body_width = 0              # 不换行
+            self._html_converter = converter
+        return self._html_converter
 
     def fetch_page_content(self, url):
         """抓取指定网页内容并转换为Markdown格式"""
+        _, result, _ = self._timed_fetch(url)
+        return result
+    
+    def fetch_many(self, urls, max_workers=None, deadline=None):
+        """并发抓取多个网页，按完成顺序逐个产出 (url, 内容, 耗时统计)
+        
+        urls 可以是逐步产出URL的迭代器（例如仍在进行的搜索），由后台线程读取，每得到一个URL立即开始抓取。
+        全局并发由线程池大小限制，同一主机的并发连接数与请求间隔由 self.throttle 控制。
+        耗时统计包含 wait（礼貌等待）、fetch（下载）、extract（正文提取）、total 四项，单位为秒，
+        以及 bytes（读取的正文字节数）。
+        指定deadline（秒）时，超时后停止产出，尚未完成的页面被放弃。
+        """
+        executor = ThreadPoolExecutor(max_workers=max_workers or self.max_workers)
+        fetch = tracing.wrap(self._timed_fetch)
+        finished = queue.Queue()  # 已完成的future；读完所有URL后放入已提交的总数
+        stop = threading.Event()
+        
+        def feed():
+            submitted = 0
+            seen = set()
+            try:
+                for url in urls:
+                    if stop.is_set():
+                        break
+                    if url in seen:
+                        continue
+                    seen.add(url)
+                    executor.submit(fetch, url).add_done_callback(finished.put)
+                    submitted += 1
+            except RuntimeError:
+                pass  # 调用方已停止迭代，线程池已关闭
+            except Exception as e:
+                print(f"读取待抓取的URL出错: {e}")
+            finally:
+                close = getattr(urls, "close", None)
+                if close is not None:
+                    close()
+                finished.put(submitted)
+        
+        threading.Thread(target=tracing.wrap(feed), name="fetch-feed", daemon=True).start()
+        end = None if deadline is None else time.monotonic() + deadline
         try:
-            time.sleep(self.delay * random.uniform(0.5, 1.5))
-            response = self.session.get(url, timeout=self.timeout)
-            response.raise_for_status()
-            response.encoding = response.apparent_encoding 
-
-            return self._extract_main_content(response.text)
+            total, received = None, 0
+            while total is None or received < total:
+                timeout = None if end is None else end - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    break
+                try:
+                    item = finished.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if isinstance(item, int):
+                    total = item
+                    continue
+                received += 1
+                if not item.cancelled():
+                    yield item.result()
+        finally:
+            # 调用方提前停止迭代时，停止读取URL并取消尚未开始的抓取
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def fetch_html(self, url):
+        """抓取单个网页，返回 (HTML文本, 重定向后的URL, 提取结果)，出错时抛出异常
+        
+        供需要原始HTML的调用方（如整站抓取时提取链接）使用，同样遵守主机节流并复用提取缓存。
+        """
+        with self.throttle.acquire(url):
+            body, response, digest = self._download(url)
+        content_type = response.headers.get("Content-Type")
+        return decode_html(body, content_type), response.url, self._extract(body, content_type, digest)
+    
+    def _timed_fetch(self, url):
+        """抓取并提取单个网页，返回 (url, 内容, 耗时统计)"""
+        with tracing.span("crawler.fetch", url=url) as span:
+            timing = {"wait": 0.0, "fetch": 0.0, "extract": 0.0, "total": 0.0, "bytes": 0}
+            start = time.monotonic()
+            try:
+                with self.throttle.acquire(url) as waited:
+                    timing["wait"] = waited
+                    fetch_start = time.monotonic()
+                    body, response, digest = self._download(url)
+                    timing["fetch"] = time.monotonic() - fetch_start
+                    timing["bytes"] = len(body)
+            
+                extract_start = time.monotonic()
+                result = self._extract(body, response.headers.get("Content-Type"), digest)
+                timing["extract"] = time.monotonic() - extract_start
                 
-        except Exception as e:
-            print(f"抓取页面 {url} 出错: {e}")
-            return {"error": str(e)}
-
-    def _extract_main_content(self, html_content):
-        """使用trafilatura智能提取正文内容并转换为Markdown格式"""
-        try:
-            extracted = trafilatura.extract(
-                html_content,
-                include_links=False,  # 不包含链接
-                include_tables=True,  # 包含表格
-                output_format="markdown"  # 直接输出markdown
-            )
+            except Exception as e:
+                CRAWLER_ERRORS.inc(kind="page", type=type(e).__name__)
+                print(f"抓取页面 {url} 出错: {e}")
+                result = {"error": str(e)}
+        
+            timing["total"] = time.monotonic() - start
+            span.set(**timing)
+        return url, result, timing
+    
+    def _extract(self, body, content_type, digest):
+        """提取正文；响应内容未变化时直接复用缓存的提取结果，跳过解析"""
+        result = self.cache.get_extracted(digest) if (self.cache and digest) else None
+        if result is None:
+            if self.extraction_pool is not None:
+                # 提取在工作进程中进行，本线程等待期间不占用GIL
+                result = self.extraction_pool.extract(body, content_type)
+            else:
+                result = self._extract_main_content(decode_html(body, content_type))
+            if self.cache and digest and result:
+                self.cache.put_extracted(digest, result)
+        return result
+    
+    def _download(self, url):
+        """流式下载网页正文，返回 (正文, 响应, 正文摘要)
+        
+        先根据响应头拒绝非HTML或声明长度超过max_bytes的响应，
+        再分块读取，读满max_bytes即截断，总耗时超过download_deadline则放弃。
+        """
+        start = time.monotonic()
+        with self.session.get(url, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            
+            if getattr(response, "from_cache", False):
+                return response.content, response, response.cache_digest
+            
+            mime = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            try:
+                declared = int(response.headers.get("Content-Length") or 0)
+            except ValueError:
+                declared = 0
             
-            title = trafilatura.extract_metadata(html_content).as_dict()["title"]
+            if mime and mime not in self.ALLOWED_CONTENT_TYPES:
+                self._record_saving("rejected_content_type", declared)
+                raise DownloadRejected(f"不支持的内容类型: {mime}")
+            if declared > self.max_bytes:
+                self._record_saving("rejected_too_large", declared)
+                raise DownloadRejected(f"内容过大: {declared} 字节")
             
-            return {
-                "title": title,
-                "content": extracted,
-                "word_count": len(extracted.split())
-            }
-    
-        except Exception as e:
-            print(f"trafilatura提取失败 {e}")    
\ No newline at end of file
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= self.max_bytes:
+                    break
+                if time.monotonic() - start > self.download_deadline:
+                    self._record_download(size, time.monotonic() - start)
+                    self._record_saving("deadline_exceeded", max(declared - size, 0))
+                    raise DownloadRejected(f"下载超过 {self.download_deadline} 秒")
+            
+            body = b"".join(chunks)
+            truncated = size >= self.max_bytes and (declared == 0 or declared > self.max_bytes)
+            self._record_download(len(body), time.monotonic() - start)
+            if truncated:
+                body = body[:self.max_bytes]
+                self._record_saving("truncated", max(declared - self.max_bytes, 0))
+        
+        digest = None
+        cache_key = getattr(response, "cache_key", None)
+        if self.cache is not None and cache_key and not truncated:
+            digest = self.cache.put(cache_key, url, response.status_code, dict(response.headers), body)
+        
+        return body, response, digest
+    
+    def _record_download(self, size, seconds):
+        CRAWLER_FETCH_SECONDS.observe(seconds, kind="page")
+        CRAWLER_BYTES.inc(size, kind="page")
+        with self._stats_lock:
+            self.stats["downloads"] += 1
+            self.stats["bytes_downloaded"] += size
+            self.stats["download_seconds"] += seconds
+    
+    def _record_saving(self, reason, bytes_saved):
+        """记录一次提前放弃，按历史平均下载速度估算节省的时间"""
+        with self._stats_lock:
+            self.stats[reason] += 1
+            self.stats["bytes_saved"] += bytes_saved
+            if self.stats["download_seconds"] > 0:
+                rate = self.stats["bytes_downloaded"] / self.stats["download_seconds"]
+                if rate > 0:
+                    self.stats["seconds_saved"] += bytes_saved / rate
+    
+    def _extract_main_content(self, html_content):
+        """使用trafilatura智能提取正文内容并转换为Markdown格式"""
+        return extract_main_content(html_content)
@@ -0,0 +1,62 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+from urllib.parse import urlparse
+
+
+class _HostState:
+    def __init__(self, max_connections: int):
+        self.semaphore = threading.BoundedSemaphore(max_connections)
+        self.lock = threading.Lock()
+        self.next_allowed = 0.0
+
+
+class HostThrottle:
+    """按主机的礼貌抓取控制：限制每个主机的并发连接数，并保证同一主机相邻请求的间隔"""
+
+    def __init__(self, delay: float = 1.0, max_connections_per_host: int = 2):
+        self.delay = delay
+        self.max_connections_per_host = max_connections_per_host
+        self._hosts: Dict[str, _HostState] = {}
+        self._delays: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        return urlparse(url).netloc.lower()
+
+    def set_delay(self, host: str, delay: float):
+        """为指定主机设置请求间隔（如robots.txt中的Crawl-delay）"""
+        with self._lock:
+            self._delays[host.lower()] = delay
+
+    def _state(self, host: str) -> _HostState:
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = _HostState(self.max_connections_per_host)
+            return state
+
+    @contextmanager
+    def acquire(self, url: str) -> Iterator[float]:
+        """占用目标主机的一个连接名额，必要时等待到允许的发送时间，产出等待的秒数"""
+        host = self.host_of(url)
+        state = self._state(host)
+        delay = self._delays.get(host, self.delay)
+
+        start = time.monotonic()
+        state.semaphore.acquire()
+        try:
+            # 预约发送时间：同一主机的请求按 delay * [0.5, 1.5) 的间隔依次排开
+            with state.lock:
+                now = time.monotonic()
+                send_at = max(now, state.next_allowed)
+                state.next_allowed = send_at + delay * random.uniform(0.5, 1.5)
+
+            if send_at > now:
+                time.sleep(send_at - now)
+            yield time.monotonic() - start
+        finally:
+            state.semaphore.release()
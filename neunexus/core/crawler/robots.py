@@ -0,0 +1,93 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+
+class RobotsCache:
+    """按主机缓存解析后的robots.txt
+
+    每个主机只下载一次robots.txt，ttl秒后重新获取。
+    401/403 视为禁止抓取整个站点，其他4xx视为不限制；下载失败或5xx时暂时不限制，
+    并只缓存 error_ttl 秒以便尽快重试。
+    """
+
+    def __init__(
+        self,
+        session: Optional[requests.Session] = None,
+        user_agent: str = "*",
+        ttl: float = 24 * 3600,
+        error_ttl: float = 600,
+        timeout: float = 10
+    ):
+        self.session = session or requests.Session()
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.timeout = timeout
+        self._parsers: Dict[str, Tuple[RobotFileParser, float]] = {}
+        self._host_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _host_lock(self, origin: str) -> threading.Lock:
+        with self._lock:
+            lock = self._host_locks.get(origin)
+            if lock is None:
+                lock = self._host_locks[origin] = threading.Lock()
+            return lock
+
+    def _fetch(self, origin: str) -> Tuple[RobotFileParser, float]:
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            response = self.session.get(parser.url, timeout=self.timeout)
+        except Exception as e:
+            print(f"获取 {parser.url} 出错: {e}")
+            parser.allow_all = True
+            return parser, self.error_ttl
+
+        if response.status_code in (401, 403):
+            parser.disallow_all = True
+        elif 400 <= response.status_code < 500:
+            parser.allow_all = True
+        elif response.status_code >= 500:
+            parser.allow_all = True
+            return parser, self.error_ttl
+        else:
+            parser.parse(response.text.splitlines())
+        return parser, self.ttl
+
+    def get(self, url: str) -> RobotFileParser:
+        """返回URL所在主机的robots解析器，过期或未缓存时下载"""
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+
+        cached = self._parsers.get(origin)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+
+        # 同一主机只由一个线程下载
+        with self._host_lock(origin):
+            cached = self._parsers.get(origin)
+            if cached and cached[1] > time.monotonic():
+                return cached[0]
+            parser, ttl = self._fetch(origin)
+            parser.modified()
+            self._parsers[origin] = (parser, time.monotonic() + ttl)
+            return parser
+
+    def can_fetch(self, url: str) -> bool:
+        return self.get(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url: str) -> Optional[float]:
+        """robots.txt中为当前User-Agent声明的抓取间隔（秒），未声明时返回None"""
+        parser = self.get(url)
+        delay = parser.crawl_delay(self.user_agent)
+        if delay is None:
+            rate = parser.request_rate(self.user_agent)
+            if rate and rate.requests:
+                return rate.seconds / rate.requests
+            return None
+        return float(delay)
@@ -1,18 +1,39 @@
 import base64
 import requests
+import threading
 import time
 import random
+import unicodedata
 
 from abc import ABC, abstractmethod
-from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlparse, parse_qs
+from neunexus.core.crawler.html_utils import detect_encoding
+from neunexus.core.crawler.http_cache import CachingAdapter
+from neunexus.core.crawler.result_cache import SingleFlight, TTLCache
+from neunexus.core.crawler.url_utils import url_key
+from neunexus.core import tracing
+from neunexus.core.metrics import CRAWLER_BYTES, CRAWLER_ERRORS, CRAWLER_FETCH_SECONDS
+
+
+def _has_class(tag, cls):
+    """生成按class匹配元素的XPath片段"""
+    return f"{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')]"
 
 
 class SearchEngine(ABC):
     
     """搜索引擎抽象基类"""
     
-    def __init__(self, user_agent=None, delay=1.0, timeout=10):
+    # 每个结果页的结果数，用于计算翻页参数与结果在全部结果中的名次
+    results_per_page = 10
+    
+    # 子类以类属性提供结果页的XPath（result/title/link/snippet/next_page_xpath），
+    # 用 etree.XPath 在类定义时编译一次，解析时直接调用而不是每次重新编译表达式
+    
+    def __init__(self, user_agent=None, delay=1.0, timeout=10, cache=None, pool_maxsize=10):
         self.user_agent = user_agent or (
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
             "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
@@ -21,6 +42,33 @@ class SearchEngine(ABC):
         self.timeout = timeout
         self.session = requests.Session()
         self._setup_session_headers()
+        
+        # 每个引擎只访问少数几个主机，连接池按并发搜索数放大以复用长连接
+        if cache is not None:
+            # DuckDuckGo 使用 POST 提交查询，同样按请求体缓存
+            adapter = CachingAdapter(
+                cache, cacheable_methods=("GET", "POST"), 
+                pool_connections=4, pool_maxsize=pool_maxsize
+            )
+        else:
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.hooks["response"].append(self._record_response)
+    
+    @staticmethod
+    def _record_response(response, *args, **kwargs):
+        """记录搜索结果页的下载耗时与大小，命中本地缓存的响应不计入"""
+        if getattr(response, "from_cache", False):
+            tracing.instant("search.cache_hit", url=response.url)
+            return response
+        CRAWLER_FETCH_SECONDS.observe(response.elapsed.total_seconds(), kind="search")
+        CRAWLER_BYTES.inc(len(response.content), kind="search")
+        trace = tracing.current()
+        if trace is not None:
+            end = time.perf_counter()
+            trace.add("search.fetch", end - response.elapsed.total_seconds(), end, {"url": response.url, "bytes": len(response.content)})
+        return response
     
 
     def search(self, query, num_results=10, lang="en"):
@@ -59,9 +107,20 @@ class SearchEngine(ABC):
         pass
     
     @abstractmethod
-    def _parse_results(self, soup: BeautifulSoup):
+    def _parse_results(self, tree: lxml_html.HtmlElement):
         pass
     
+    @staticmethod
+    def _parse_html(body: bytes, content_type=None) -> lxml_html.HtmlElement:
+        """使用lxml解析结果页，编码按响应头与<meta>声明确定"""
+        parser = lxml_html.HTMLParser(encoding=detect_encoding(body, content_type))
+        return lxml_html.document_fromstring(body, parser=parser)
+    
+    @staticmethod
+    def _first(elem, xpath: etree.XPath):
+        matches = xpath(elem)
+        return matches[0] if matches else None
+    
     def set_proxy(self, proxy):
         """设置代理服务器"""
         self.session.proxies = {
@@ -84,21 +143,22 @@ class BingSearchEngine(SearchEngine):
         'ko': 'ko', 
     }
 
-    def __init__(self, user_agent=None, delay=1.0, timeout=10):
-        super().__init__(user_agent, delay, timeout)
+    result_xpath = etree.XPath(f"//{_has_class('li', 'b_algo')}")
+    title_xpath = etree.XPath(".//h2")
+    link_xpath = etree.XPath(".//a")
+    snippet_xpath = etree.XPath(f".//{_has_class('div', 'b_caption')}//p")
+    next_page_xpath = etree.XPath(f"//{_has_class('a', 'sb_pagN')}")
+    
+    def __init__(self, user_agent=None, delay=1.0, timeout=10, cache=None, pool_maxsize=10):
+        super().__init__(user_agent, delay, timeout, cache, pool_maxsize)
         self.url = "https://www.bing.com/search"
         self.param = "q"
-        self.result_selector = "li.b_algo"
-        self.title_selector = "h2"
-        self.link_selector = "a"
-        self.snippet_selector = "div.b_caption p"
-        self.next_page_selector = "a.sb_pagN"
     
     def _fetch_search_page(self, query, page, lang):
         params = {self.param: query}
         
         if page > 0:
-            params["first"] = page * 10 + 1
+            params["first"] = page * self.results_per_page + 1
 
         if lang:
             params["setlang"] = BingSearchEngine.BING_LANGUAGE_MAPPING.get(lang, lang)
@@ -107,27 +167,28 @@ class BingSearchEngine(SearchEngine):
             response = self.session.get(self.url, params=params, timeout=self.timeout)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            return self._parse_results(soup)
+            tree = self._parse_html(response.content, response.headers.get("Content-Type"))
+            return self._parse_results(tree)
             
         except Exception as e:
+            CRAWLER_ERRORS.inc(kind="search", type=type(e).__name__)
             print(f"Bing解析出错: {e}")
             return []
     
-    def _parse_results(self, soup: BeautifulSoup):
+    def _parse_results(self, tree: lxml_html.HtmlElement):
         results = []
-        search_results = soup.select(self.result_selector)
+        search_results = self.result_xpath(tree)
         
         for result in search_results:
             try:
-                title_elem = result.select_one(self.title_selector)
-                title = title_elem.get_text().strip() if title_elem else "无标题"
+                title_elem = self._first(result, self.title_xpath)
+                title = title_elem.text_content().strip() if title_elem is not None else "无标题"
                 
-                link_elem = result.select_one(self.link_selector)
-                if not link_elem or not link_elem.get('href'):
+                link_elem = self._first(result, self.link_xpath)
+                if link_elem is None or not link_elem.get('href'):
                     continue
                     
-                link = link_elem['href']
+                link = link_elem.get('href')
                 
                 if "ck/a" in link:
                     query = urlparse(link).query
@@ -147,8 +208,8 @@ class BingSearchEngine(SearchEngine):
                         link = base64.b64decode(encoded_url).decode('utf-8')
 
                 
-                snippet_elem = result.select_one(self.snippet_selector)
-                snippet = snippet_elem.get_text().strip() if snippet_elem else "无摘要"
+                snippet_elem = self._first(result, self.snippet_xpath)
+                snippet = snippet_elem.text_content().strip() if snippet_elem is not None else "无摘要"
                 
                 results.append({
                     'title': title,
@@ -166,21 +227,22 @@ class BingSearchEngine(SearchEngine):
 class BaiduSearchEngine(SearchEngine):
     """百度搜索引擎实现"""
     
-    def __init__(self, user_agent=None, delay=1.0, timeout=10):
-        super().__init__(user_agent, delay, timeout)
+    result_xpath = etree.XPath(f"//{_has_class('div', 'result')}")
+    title_xpath = etree.XPath(".//h3//a")
+    link_xpath = etree.XPath(".//a")
+    snippet_xpath = etree.XPath(f".//{_has_class('div', 'c-abstract')}")
+    next_page_xpath = etree.XPath(f"//{_has_class('a', 'n')}")
+    
+    def __init__(self, user_agent=None, delay=1.0, timeout=10, cache=None, pool_maxsize=10):
+        super().__init__(user_agent, delay, timeout, cache, pool_maxsize)
         self.url = "https://www.baidu.com/s"
         self.param = "wd"
-        self.result_selector = "div.result"
-        self.title_selector = "h3 a"
-        self.link_selector = "a"
-        self.snippet_selector = "div.c-abstract"
-        self.next_page_selector = "a.n"
     
     def _fetch_search_page(self, query, page, lang):
         params = {self.param: query}
         
         if page > 0:
-            params["pn"] = page * 10
+            params["pn"] = page * self.results_per_page
 
         if lang:
             params["lr"] = f"lang_{lang}"
@@ -190,34 +252,35 @@ class BaiduSearchEngine(SearchEngine):
             response = self.session.get(self.url, params=params, timeout=self.timeout)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            return self._parse_results(soup)
+            tree = self._parse_html(response.content, response.headers.get("Content-Type"))
+            return self._parse_results(tree)
             
         except Exception as e:
+            CRAWLER_ERRORS.inc(kind="search", type=type(e).__name__)
             print(f"百度解析出错: {e}")
             return []
     
-    def _parse_results(self, soup: BeautifulSoup):
+    def _parse_results(self, tree: lxml_html.HtmlElement):
         results = []
-        search_results = soup.select(self.result_selector)
+        search_results = self.result_xpath(tree)
         
         for result in search_results:
             try:
-                title_elem = result.select_one(self.title_selector)
-                title = title_elem.get_text().strip() if title_elem else "无标题"
+                title_elem = self._first(result, self.title_xpath)
+                title = title_elem.text_content().strip() if title_elem is not None else "无标题"
                 
-                link_elem = result.select_one(self.link_selector)
-                if not link_elem or not link_elem.get('href'):
+                link_elem = self._first(result, self.link_xpath)
+                if link_elem is None or not link_elem.get('href'):
                     continue
                     
-                link = link_elem['href']
+                link = link_elem.get('href')
                 
                 if link.startswith('/'):
                     base_url = urlparse(self.url).netloc
                     link = f"https://{base_url}{link}"
                 
-                snippet_elem = result.select_one(self.snippet_selector)
-                snippet = snippet_elem.get_text().strip() if snippet_elem else "无摘要"
+                snippet_elem = self._first(result, self.snippet_xpath)
+                snippet = snippet_elem.text_content().strip() if snippet_elem is not None else "无摘要"
                 
                 results.append({
                     'title': title,
@@ -235,15 +298,18 @@ class BaiduSearchEngine(SearchEngine):
 class DuckDuckGoSearchEngine(SearchEngine):
     """DuckDuckGo搜索引擎实现"""
     
-    def __init__(self, user_agent=None, delay=1.0, timeout=10):
-        super().__init__(user_agent, delay, timeout)
+    results_per_page = 30
+    
+    result_xpath = etree.XPath(f"//{_has_class('div', 'result')}")
+    title_xpath = etree.XPath(f".//{_has_class('a', 'result__a')}")
+    link_xpath = etree.XPath(f".//{_has_class('a', 'result__a')}")
+    snippet_xpath = etree.XPath(f".//{_has_class('a', 'result__snippet')}")
+    next_page_xpath = etree.XPath(f"//{_has_class('div', 'nav-link')}//form")
+    
+    def __init__(self, user_agent=None, delay=1.0, timeout=10, cache=None, pool_maxsize=10):
+        super().__init__(user_agent, delay, timeout, cache, pool_maxsize)
         self.url = "https://html.duckduckgo.com/html/"
         self.param = "q"
-        self.result_selector = "div.result"
-        self.title_selector = "a.result__a"
-        self.link_selector = "a.result__a"
-        self.snippet_selector = "a.result__snippet"
-        self.next_page_selector = "div.nav-link form"
     
     
     def _fetch_search_page(self, query, page, lang):
@@ -253,36 +319,37 @@ class DuckDuckGoSearchEngine(SearchEngine):
         }
         
         if page > 0:
-            params['s'] = str(page * 30)
+            params['s'] = str(page * self.results_per_page)
         
         try:
             response = self.session.post(self.url, data=params, timeout=self.timeout)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            return self._parse_results(soup)
+            tree = self._parse_html(response.content, response.headers.get("Content-Type"))
+            return self._parse_results(tree)
             
         except Exception as e:
+            CRAWLER_ERRORS.inc(kind="search", type=type(e).__name__)
             print(f"DuckDuckGo解析出错: {e}")
             return []
     
-    def _parse_results(self, soup: BeautifulSoup):
+    def _parse_results(self, tree: lxml_html.HtmlElement):
         results = []
-        search_results = soup.select(self.result_selector)
+        search_results = self.result_xpath(tree)
         
         for result in search_results:
             try:
-                title_elem = result.select_one(self.title_selector)
-                title = title_elem.get_text().strip() if title_elem else "无标题"
+                title_elem = self._first(result, self.title_xpath)
+                title = title_elem.text_content().strip() if title_elem is not None else "无标题"
                 
-                link_elem = result.select_one(self.link_selector)
-                if not link_elem or not link_elem.get('href'):
+                link_elem = self._first(result, self.link_xpath)
+                if link_elem is None or not link_elem.get('href'):
                     continue
                     
-                link = link_elem['href']
+                link = link_elem.get('href')
                 
-                snippet_elem = result.select_one(self.snippet_selector)
-                snippet = snippet_elem.get_text().strip() if snippet_elem else "无摘要"
+                snippet_elem = self._first(result, self.snippet_xpath)
+                snippet = snippet_elem.text_content().strip() if snippet_elem is not None else "无摘要"
                 
                 results.append({
                     'title': title,
@@ -301,7 +368,9 @@ class SearchEngineFactory:
     """搜索引擎工厂类"""
     
     @staticmethod
-    def create_engine(engine_type, user_agent=None, delay=1.0, timeout=10) -> SearchEngine:
+    def create_engine(
+        engine_type, user_agent=None, delay=1.0, timeout=10, cache=None, pool_maxsize=10
+    ) -> SearchEngine:
         engines = {
             "bing": BingSearchEngine,
             "baidu": BaiduSearchEngine,
@@ -311,20 +380,127 @@ class SearchEngineFactory:
         if engine_type not in engines:
             raise ValueError(f"不支持的搜索引擎: {engine_type}。支持的引擎: {list(engines.keys())}")
         
-        return engines[engine_type](user_agent, delay, timeout)
+        return engines[engine_type](user_agent, delay, timeout, cache, pool_maxsize)
 
 
 class SearchEngineCrawler:
-    """搜索引擎爬虫主类（外观模式）"""
+    """搜索引擎爬虫主类（外观模式）
     
-    def __init__(self, user_agent=None, delay=1.0, timeout=10):
+    引擎实例按类型创建一次后长期复用（保持连接池与keep-alive），
+    搜索结果按 (引擎, 规范化查询, 语言, 结果数) 缓存result_ttl秒，并发的相同搜索只请求一次上游。
+    """
+    
+    def __init__(self, user_agent=None, delay=1.0, timeout=10, cache=None, result_ttl=300, pool_maxsize=10):
         self.user_agent = user_agent
         self.delay = delay
         self.timeout = timeout
+        self.cache = cache
+        self.pool_maxsize = pool_maxsize
+        self.results = TTLCache(ttl=result_ttl)
+        self._engines = {}
+        self._engines_lock = threading.Lock()
+        self._inflight = SingleFlight()
+        self._executor = None
+    
+    def get_engine(self, engine="bing") -> SearchEngine:
+        """获取（必要时创建）可复用的引擎实例"""
+        with self._engines_lock:
+            search_engine = self._engines.get(engine)
+            if search_engine is None:
+                search_engine = SearchEngineFactory.create_engine(
+                    engine, self.user_agent, self.delay, self.timeout, self.cache, self.pool_maxsize
+                )
+                self._engines[engine] = search_engine
+            return search_engine
+    
+    @staticmethod
+    def normalize_query(query):
+        """规范化查询：Unicode NFKC、小写、合并空白"""
+        return " ".join(unicodedata.normalize("NFKC", query).lower().split())
     
     def search(self, query, engine="bing", num_results=10, lang="zh"):
         """执行搜索并返回结果"""
-        search_engine = SearchEngineFactory.create_engine(
-            engine, self.user_agent, self.delay, self.timeout
-        )
-        return search_engine.search(query, num_results, lang)
\ No newline at end of file
+        key = (engine, self.normalize_query(query), lang, num_results)
+        # 缓存与合并请求的结果由多个调用方共享，每次返回各自的副本，调用方修改结果不会影响缓存
+        cached = self.results.get(key)
+        if cached is not None:
+            return [dict(result) for result in cached]
+        
+        def fetch():
+            with tracing.span("search", engine=engine, query=query):
+                results = self.get_engine(engine).search(query, num_results, lang)
+            # 空结果通常意味着上游出错，不缓存
+            if results:
+                self.results.set(key, results)
+            return results
+        
+        return [dict(result) for result in self._inflight.do(key, fetch)]
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._engines_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.pool_maxsize)
+            return self._executor
+    
+    def federated_pages(self, query, engines=("bing", "baidu", "duckduckgo"), lang="zh", pages=1, deadline=5.0):
+        """并发查询多个引擎的多个结果页，按完成顺序逐页产出 (engine, page, results)
+        
+        超过deadline秒即停止；调用方提前停止迭代时，尚未开始的请求被取消，
+        已在进行中的请求在后台结束后被丢弃。
+        """
+        executor = self._get_executor()
+        futures = {
+            executor.submit(tracing.wrap(self.get_engine(engine)._fetch_search_page), query, page, lang): (engine, page)
+            for page in range(pages)
+            for engine in engines
+        }
+        
+        try:
+            for future in as_completed(futures, timeout=deadline):
+                engine, page = futures[future]
+                try:
+                    page_results = future.result()
+                except Exception as e:
+                    print(f"{engine} 第{page + 1}页搜索出错: {e}")
+                    continue
+                yield engine, page, page_results
+        except TimeoutError:
+            pass
+        finally:
+            for future in futures:
+                future.cancel()
+    
+    def federated_search(
+        self, 
+        query, 
+        engines=("bing", "baidu", "duckduckgo"), 
+        num_results=10, 
+        lang="zh", 
+        pages=1, 
+        deadline=5.0
+    ):
+        """并发查询多个引擎的多个结果页，URL规范化去重并按倒数排名融合排序
+        
+        收集到num_results个不同结果或超过deadline秒即返回（见 federated_pages）。
+        每个结果附带 engines（命中的引擎）与 score 字段。
+        """
+        merged = {}
+        results = self.federated_pages(query, engines, lang, pages, deadline)
+        try:
+            for engine, page, page_results in results:
+                # 名次按引擎的固定每页结果数计算，结果较少的后续页不会排到前面的页之前
+                offset = page * self.get_engine(engine).results_per_page
+                for rank, result in enumerate(page_results):
+                    position = offset + rank
+                    entry = merged.setdefault(url_key(result["link"]), {**result, "engines": [], "score": 0.0})
+                    entry["score"] += 1.0 / (60 + position + 1)
+                    if engine not in entry["engines"]:
+                        entry["engines"].append(engine)
+                
+                if len(merged) >= num_results:
+                    break
+        finally:
+            results.close()
+        
+        ranked = sorted(merged.values(), key=lambda entry: entry["score"], reverse=True)
+        return ranked[:num_results]
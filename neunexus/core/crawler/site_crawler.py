@@ -0,0 +1,191 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import lxml.html
+
+from neunexus.core.crawler.frontier import CrawlFrontier
+from neunexus.core.crawler.page_crawer import PageCrawler
+from neunexus.core.crawler.robots import RobotsCache
+from neunexus.core.crawler.url_utils import normalize_url
+
+
+# 不会是HTML页面的链接后缀，入队前直接过滤
+_SKIP_EXTENSIONS = (
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".ico", ".bmp",
+    ".css", ".js", ".json", ".xml", ".rss",
+    ".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx",
+    ".zip", ".rar", ".7z", ".tar", ".gz", ".exe", ".apk", ".dmg",
+    ".mp3", ".mp4", ".avi", ".mov", ".wav", ".flv",
+)
+
+
+def extract_links(html: str, base_url: str) -> List[str]:
+    """提取页面中的http(s)链接并规范化，尊重<base href>"""
+    try:
+        tree = lxml.html.fromstring(html)
+    except Exception:
+        return []
+
+    base = tree.xpath("string(//base/@href)").strip() or base_url
+    links = []
+    for href in tree.xpath("//a[@href]/@href"):
+        href = href.strip()
+        if not href or href.startswith(("#", "javascript:", "mailto:", "tel:")):
+            continue
+        try:
+            url = normalize_url(href, normalize_url(base, base_url))
+        except ValueError:
+            continue
+        if url.startswith(("http://", "https://")) and not urlsplit(url).path.lower().endswith(_SKIP_EXTENSIONS):
+            links.append(url)
+    return list(dict.fromkeys(links))
+
+
+class SiteCrawler:
+    """整站抓取：从种子URL出发按深度优先级抓取，页面中的链接回流到持久化队列
+
+    - 队列与已见集合由 CrawlFrontier 持久化，中断后用同一路径重建即可继续
+    - 每个主机的robots.txt由 RobotsCache 缓存，Crawl-delay 写入 PageCrawler 的主机节流
+    - 默认只跟随种子所在主机的链接，可通过 allowed_hosts 放宽
+    """
+
+    def __init__(
+        self,
+        page_crawler: Optional[PageCrawler] = None,
+        frontier: Optional[CrawlFrontier] = None,
+        frontier_path: str = "./frontier.db",
+        robots: Optional[RobotsCache] = None,
+        allowed_hosts: Optional[Iterable[str]] = None,
+        max_depth: int = 3,
+        respect_robots: bool = True,
+        checkpoint_interval: int = 100
+    ):
+        self.page_crawler = page_crawler or PageCrawler()
+        self.frontier = frontier or CrawlFrontier(frontier_path)
+        self.robots = robots or RobotsCache(
+            self.page_crawler.session, self.page_crawler.user_agent, timeout=self.page_crawler.timeout
+        )
+        self.allowed_hosts = {host.lower() for host in allowed_hosts} if allowed_hosts else set()
+        self.max_depth = max_depth
+        self.respect_robots = respect_robots
+        self.checkpoint_interval = checkpoint_interval
+        self.stats = {
+            "pages_crawled": 0,
+            "pages_failed": 0,
+            "robots_blocked": 0,
+            "links_found": 0,
+            "links_queued": 0,
+        }
+        self._stats_lock = threading.Lock()
+        self._delay_hosts = set()
+        self._started = None
+
+    def add_seeds(self, urls: Iterable[str]):
+        """加入种子URL，并放行种子所在主机"""
+        for url in urls:
+            url = normalize_url(url)
+            self.allowed_hosts.add(urlsplit(url).netloc)
+            self.frontier.push(url, depth=0)
+
+    def crawl(self, seeds: Iterable[str] = (), max_pages: Optional[int] = None, max_workers: Optional[int] = None) -> Iterator[Tuple[str, dict]]:
+        """抓取直到队列为空或达到max_pages，按完成顺序逐个产出 (url, 内容)"""
+        self.add_seeds(seeds)
+        # 继续上次的抓取时，放行之前种子所在的主机
+        self.allowed_hosts.update(self.frontier.seed_hosts())
+        self._started = time.monotonic()
+        max_workers = max_workers or self.page_crawler.max_workers
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        pending = {}
+        dispatched = 0
+
+        try:
+            while True:
+                while len(pending) < max_workers and (max_pages is None or dispatched < max_pages):
+                    item = self.frontier.pop()
+                    if item is None:
+                        break
+                    url, depth = item
+                    pending[executor.submit(self._crawl_one, url, depth)] = url
+                    dispatched += 1
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = pending.pop(future)
+                    result = future.result()
+                    if result is not None:
+                        yield url, result
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            # 未完成的URL保持 in_progress，下次打开队列时重新排队
+            self.frontier.checkpoint()
+
+    def _crawl_one(self, url: str, depth: int) -> Optional[dict]:
+        """抓取单个页面并将链接入队，被robots禁止时返回None"""
+        if self.respect_robots and not self._allowed_by_robots(url):
+            self.frontier.mark_done(url, success=False)
+            self._record("robots_blocked")
+            return None
+
+        try:
+            html, final_url, result = self.page_crawler.fetch_html(url)
+            result = result or {}
+        except Exception as e:
+            print(f"抓取页面 {url} 出错: {e}")
+            self.frontier.mark_done(url, success=False)
+            self._record("pages_failed")
+            return {"error": str(e)}
+
+        if depth < self.max_depth:
+            links = [link for link in extract_links(html, final_url) if self._in_scope(link)]
+            queued = sum(self.frontier.push(link, depth=depth + 1) for link in links)
+            self._record("links_found", len(links))
+            self._record("links_queued", queued)
+
+        self.frontier.mark_done(url)
+        crawled = self._record("pages_crawled")
+        if self.checkpoint_interval and crawled % self.checkpoint_interval == 0:
+            self.frontier.checkpoint()
+        return result
+
+    def _allowed_by_robots(self, url: str) -> bool:
+        host = urlsplit(url).netloc
+        # robots.txt 按主机缓存，这里的查询只在首次访问主机时下载
+        delay = self.robots.crawl_delay(url)
+        with self._stats_lock:
+            if host not in self._delay_hosts:
+                self._delay_hosts.add(host)
+                if delay is not None:
+                    self.page_crawler.throttle.set_delay(host, max(delay, self.page_crawler.delay))
+        return self.robots.can_fetch(url)
+
+    def _in_scope(self, url: str) -> bool:
+        return urlsplit(url).netloc in self.allowed_hosts
+
+    def _record(self, name: str, amount: int = 1) -> int:
+        with self._stats_lock:
+            self.stats[name] += amount
+            return self.stats[name]
+
+    def crawl_stats(self) -> dict:
+        """抓取速率与队列规模"""
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        with self._stats_lock:
+            stats = dict(self.stats)
+        counts = self.frontier.counts()
+        stats.update({
+            "elapsed": elapsed,
+            "pages_per_second": stats["pages_crawled"] / elapsed if elapsed > 0 else 0.0,
+            "frontier_size": counts["queued"],
+            "in_progress": counts["in_progress"],
+            "seen_urls": self.frontier.seen.count,
+        })
+        return stats
+
+    def close(self):
+        self.frontier.close()
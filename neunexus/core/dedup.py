@@ -0,0 +1,116 @@
+import zlib
+import numpy as np
+from collections import defaultdict
+from typing import Dict, Hashable, List, Optional, Set
+
+from neunexus.core.bm25 import tokenize
+
+
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+class NearDuplicateFilter:
+    """基于MinHash + LSH分桶的近重复文本检测
+
+    文本按词（中日韩按字二元组）切分后取n元组作为shingle，
+    签名按band分桶，只有落入同一桶的候选才比较签名估计的Jaccard相似度。
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        bands: int = 16,
+        shingle_size: int = 3,
+        seed: int = 1
+    ):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm必须能被bands整除")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        self.signatures: Dict[Hashable, np.ndarray] = {}
+        self.buckets: List[Dict[bytes, Set[Hashable]]] = [defaultdict(set) for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def _shingles(self, text: str) -> Set[str]:
+        tokens = tokenize(text)
+        n = self.shingle_size
+        if len(tokens) <= n:
+            return {" ".join(tokens)} if tokens else set()
+        return {" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)}
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """计算文本的MinHash签名，空文本返回None"""
+        shingles = self._shingles(text)
+        if not shingles:
+            return None
+
+        hashes = np.array(
+            [zlib.crc32(s.encode("utf-8")) % _MERSENNE_PRIME for s in shingles],
+            dtype=np.uint64
+        )
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME
+        return permuted.min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def find(self, signature: Optional[np.ndarray], exclude: Optional[Hashable] = None) -> Optional[Hashable]:
+        """查找与签名近似重复的已有条目（不含exclude），返回其key，没有则返回None"""
+        if signature is None:
+            return None
+
+        candidates: Set[Hashable] = set()
+        for band, key in zip(self.buckets, self._band_keys(signature)):
+            candidates.update(band.get(key, ()))
+
+        best_key, best_similarity = None, self.threshold
+        candidates.discard(exclude)
+        for candidate in candidates:
+            similarity = float(np.mean(self.signatures[candidate] == signature))
+            if similarity >= best_similarity:
+                best_key, best_similarity = candidate, similarity
+
+        return best_key
+
+    def add(self, key: Hashable, signature: Optional[np.ndarray]):
+        """登记条目的签名"""
+        if signature is None or key in self.signatures:
+            return
+
+        self.signatures[key] = signature
+        for band, band_key in zip(self.buckets, self._band_keys(signature)):
+            band[band_key].add(key)
+
+    def remove(self, key: Hashable):
+        """移除条目"""
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+
+        for band, band_key in zip(self.buckets, self._band_keys(signature)):
+            members = band.get(band_key)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del band[band_key]
+
+    def remap(self, mapping: Dict[Hashable, Hashable]):
+        """按 旧key -> 新key 的映射重写条目，不在映射中的条目被丢弃"""
+        signatures = self.signatures
+        self.signatures = {}
+        self.buckets = [defaultdict(set) for _ in range(self.bands)]
+        for key, signature in signatures.items():
+            if key in mapping:
+                self.add(mapping[key], signature)
@@ -0,0 +1,371 @@
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from neunexus.core.crawler.extraction import ExtractionPool
+from neunexus.core.crawler.html_utils import decode_html
+from neunexus.core.crawler.page_crawer import PageCrawler
+from neunexus.core.retriever import Retriever
+
+
+HTML_SUFFIXES = (".html", ".htm", ".xhtml")
+TEXT_SUFFIXES = (".txt", ".md", ".markdown")
+
+# 队列结束标记
+_DONE = object()
+
+
+def iter_sources(inputs: Iterable[str]) -> Iterator[str]:
+    """逐个产出待入库的来源：URL原样产出，目录递归展开为其中的文本与HTML文件"""
+    for item in inputs:
+        item = item.strip()
+        if not item:
+            continue
+        if item.startswith(("http://", "https://")):
+            yield item
+        elif os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(HTML_SUFFIXES + TEXT_SUFFIXES):
+                        yield os.path.join(root, name)
+        elif os.path.isfile(item):
+            yield item
+        else:
+            print(f"跳过无法识别的来源: {item}")
+
+
+class Stage:
+    """流水线中的一个阶段：若干工作线程从输入队列取任务，处理结果写入输出队列
+
+    handler 接收一批任务（未设置 batch_weight 时每批一个），返回要传给下一阶段的结果列表。
+    输出队列有界，下游处理不过来时 put 阻塞，背压逐级传到读取阶段。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[list], list],
+        workers: int,
+        in_queue: queue.Queue,
+        out_queue: Optional[queue.Queue],
+        batch_weight: Optional[Callable[[object], int]] = None,
+        batch_size: int = 1
+    ):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.batch_weight = batch_weight
+        self.batch_size = batch_size
+        self.stats = {"processed": 0, "errors": 0, "busy_seconds": 0.0, "max_queue": 0}
+        self._lock = threading.Lock()
+        self._running = workers
+        self._threads = [
+            threading.Thread(target=self._work, name=f"ingest-{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _next_batch(self) -> Optional[list]:
+        item = self.in_queue.get()
+        if item is _DONE:
+            # 放回结束标记，让同阶段的其他线程也能看到
+            self.in_queue.put(_DONE)
+            return None
+
+        batch = [item]
+        if self.batch_weight is not None:
+            weight = self.batch_weight(item)
+            while weight < self.batch_size:
+                try:
+                    item = self.in_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    self.in_queue.put(_DONE)
+                    break
+                batch.append(item)
+                weight += self.batch_weight(item)
+        return batch
+
+    def _work(self):
+        try:
+            while True:
+                with self._lock:
+                    self.stats["max_queue"] = max(self.stats["max_queue"], self.in_queue.qsize())
+                batch = self._next_batch()
+                if batch is None:
+                    break
+
+                start = time.monotonic()
+                try:
+                    results = self.handler(batch)
+                    errors = 0
+                except Exception as e:
+                    print(f"[{self.name}] 处理出错: {e}")
+                    results = []
+                    errors = len(batch)
+
+                with self._lock:
+                    self.stats["busy_seconds"] += time.monotonic() - start
+                    self.stats["processed"] += len(batch) - errors
+                    self.stats["errors"] += errors
+
+                if self.out_queue is not None:
+                    for result in results:
+                        self.out_queue.put(result)
+        finally:
+            with self._lock:
+                self._running -= 1
+                last = self._running == 0
+            if last and self.out_queue is not None:
+                self.out_queue.put(_DONE)
+
+    def snapshot(self, elapsed: float) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self.stats)
+            finished = self._running == 0
+        # 阶段结束后队列中只剩结束标记
+        stats["queue"] = 0 if finished else self.in_queue.qsize()
+        stats["rate"] = stats["processed"] / elapsed if elapsed > 0 else 0.0
+        # 工作线程忙碌时间占比，接近1的阶段即为瓶颈
+        stats["utilization"] = stats["busy_seconds"] / (elapsed * self.workers) if elapsed > 0 else 0.0
+        return stats
+
+
+class BulkIngestor:
+    """批量入库流水线：读取 -> 提取 -> 切块 -> 去重 -> 批量嵌入 -> 写索引
+
+    各阶段由有界队列连接并发执行。HTML正文提取（trafilatura，持有GIL）提交到 ExtractionPool 的工作进程，
+    提取阶段的线程只负责等待结果与解码纯文本；未传入 extraction_pool 时每次 run 创建 extract_workers 个进程。文档ID即来源路径或URL，写入阶段定期将变化的文档追加到
+    index_path 的增量日志（日志超过快照大小时重写快照）；中断后重新运行时，已在快照或日志中的来源会被跳过，
+    其余来源按 upsert 语义重新入库。
+    """
+
+    def __init__(
+        self,
+        retriever: Retriever,
+        index_path: Optional[str] = None,
+        page_crawler: Optional[PageCrawler] = None,
+        read_workers: int = 4,
+        extract_workers: Optional[int] = None,
+        chunk_workers: int = 4,
+        embed_workers: int = 2,
+        embed_batch_size: int = 25,
+        queue_size: int = 64,
+        threshold: float = 0.5,
+        checkpoint_every: int = 100,
+        report_interval: float = 10.0,
+        extraction_pool: Optional[ExtractionPool] = None
+    ):
+        self.retriever = retriever
+        self.index_path = index_path
+        self.page_crawler = page_crawler
+        self.read_workers = read_workers
+        if extract_workers is None:
+            # 提取阶段的线程数与进程数一致，使每个工作进程都有任务
+            extract_workers = extraction_pool.max_workers if extraction_pool is not None else (os.cpu_count() or 1)
+        self.extract_workers = extract_workers
+        self.chunk_workers = chunk_workers
+        self.embed_workers = embed_workers
+        self.embed_batch_size = embed_batch_size
+        self.queue_size = queue_size
+        self.threshold = threshold
+        self.checkpoint_every = checkpoint_every
+        self.report_interval = report_interval
+        self.extraction_pool = extraction_pool
+        self.stages: List[Stage] = []
+        self.totals = {"sources": 0, "resumed": 0, "committed": 0, "checkpoints": 0}
+        self._scheduled = set()
+        self._scheduled_lock = threading.Lock()
+        self._since_checkpoint = 0
+        self._started = None
+
+        if index_path and os.path.exists(index_path):
+            retriever.load(index_path)
+            print(f"从 {index_path} 恢复索引: {retriever.index_stats()}")
+
+    def run(self, sources: Iterable[str]) -> Dict[str, object]:
+        """运行流水线直到所有来源处理完毕，返回统计信息"""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(6)]
+        self.stages = [
+            Stage("read", self._read, self.read_workers, queues[0], queues[1]),
+            Stage("extract", self._extract, self.extract_workers, queues[1], queues[2]),
+            Stage("chunk", self._chunk, self.chunk_workers, queues[2], queues[3]),
+            Stage("dedup", self._dedup, 1, queues[3], queues[4]),
+            Stage(
+                "embed", self._embed, self.embed_workers, queues[4], queues[5],
+                batch_weight=lambda doc: max(len(doc["pending"]), 1), batch_size=self.embed_batch_size
+            ),
+            # 单线程写入，保证索引修改与快照的顺序
+            Stage("write", self._write, 1, queues[5], None),
+        ]
+
+        owns_pool = self.extraction_pool is None
+        if owns_pool:
+            self.extraction_pool = ExtractionPool(max_workers=self.extract_workers)
+
+        self._started = time.monotonic()
+        for stage in self.stages:
+            stage.start()
+
+        stop_reporting = threading.Event()
+        reporter = threading.Thread(target=self._report_loop, args=(stop_reporting,), daemon=True)
+        reporter.start()
+
+        try:
+            for source in sources:
+                self.totals["sources"] += 1
+                if self.retriever.has_doc(source):
+                    self.totals["resumed"] += 1
+                    continue
+                queues[0].put(source)
+        finally:
+            queues[0].put(_DONE)
+            for stage in self.stages:
+                stage.join()
+            stop_reporting.set()
+            reporter.join()
+            if owns_pool:
+                self.extraction_pool.close()
+                self.extraction_pool = None
+            self._checkpoint()
+
+        summary = self.summary()
+        self._print_report(summary)
+        return summary
+
+    def _read(self, batch: list) -> list:
+        source = batch[0]
+        if source.startswith(("http://", "https://")):
+            crawler = self.page_crawler or self._default_crawler()
+            with crawler.throttle.acquire(source):
+                body, response, _ = crawler._download(source)
+            return [{"id": source, "body": body, "content_type": response.headers.get("Content-Type"), "html": True}]
+
+        with open(source, "rb") as f:
+            body = f.read()
+        return [{"id": source, "body": body, "content_type": None, "html": source.lower().endswith(HTML_SUFFIXES)}]
+
+    def _default_crawler(self) -> PageCrawler:
+        with self._scheduled_lock:
+            if self.page_crawler is None:
+                self.page_crawler = PageCrawler(max_workers=self.read_workers)
+            return self.page_crawler
+
+    def _extract(self, batch: list) -> list:
+        doc = batch[0]
+        body = doc.pop("body")
+        if doc["html"]:
+            extracted = self.extraction_pool.extract(body, doc["content_type"])
+            text = extracted["content"] if extracted else None
+        else:
+            text = decode_html(body, doc["content_type"])
+        if not text or not text.strip():
+            return []
+        return [{"id": doc["id"], "text": text}]
+
+    def _chunk(self, batch: list) -> list:
+        doc = batch[0]
+        retriever = self.retriever
+        doc["signature"] = retriever.doc_filter.signature(doc["text"]) if retriever.doc_filter else None
+        # 近重复文档直接复用已有文档的片段，不再切块
+        doc["duplicate_of"] = retriever.find_duplicate_doc(doc["id"], doc["signature"])
+        if doc["duplicate_of"] is None:
+            doc["chunks"] = ["\n".join(chunk) for chunk in retriever.chunk(doc.pop("text"), self.threshold)]
+        else:
+            doc["chunks"] = []
+            doc.pop("text")
+        return [doc]
+
+    def _dedup(self, batch: list) -> list:
+        """标记已入库或本次运行中已安排嵌入的片段，只有剩余片段进入嵌入阶段"""
+        doc = batch[0]
+        chunk_filter = self.retriever.chunk_filter
+        doc["items"] = []
+        doc["pending"] = []
+        for chunk_text in doc.pop("chunks"):
+            signature = chunk_filter.signature(chunk_text) if chunk_filter else None
+            index = len(doc["items"])
+            doc["items"].append([chunk_text, signature, None])
+            if self.retriever.find_chunk(chunk_text, signature) is not None:
+                continue
+            with self._scheduled_lock:
+                if chunk_text in self._scheduled:
+                    continue
+                self._scheduled.add(chunk_text)
+            doc["pending"].append(index)
+        return [doc]
+
+    def _embed(self, batch: list) -> list:
+        """将一批文档中待嵌入的片段合并为尽量少的嵌入请求"""
+        targets = [(doc, index) for doc in batch for index in doc["pending"]]
+        for start in range(0, len(targets), self.embed_batch_size):
+            group = targets[start:start + self.embed_batch_size]
+            embeddings = self.retriever.encode([doc["items"][index][0] for doc, index in group])
+            for (doc, index), embedding in zip(group, embeddings):
+                doc["items"][index][2] = embedding.flatten()
+        return batch
+
+    def _write(self, batch: list) -> list:
+        doc = batch[0]
+        self.retriever.commit_doc(
+            doc["id"],
+            [tuple(item) for item in doc["items"]],
+            doc["signature"],
+            doc["duplicate_of"]
+        )
+        # 已写入的片段可直接在索引中查到，不再需要记录
+        with self._scheduled_lock:
+            self._scheduled.difference_update(item[0] for item in doc["items"])
+        self.totals["committed"] += 1
+        self._since_checkpoint += 1
+        if self.checkpoint_every and self._since_checkpoint >= self.checkpoint_every:
+            self._checkpoint()
+        return []
+
+    def _checkpoint(self):
+        if not self.index_path or not self._since_checkpoint:
+            return
+        self.retriever.checkpoint(self.index_path)
+        self.totals["checkpoints"] += 1
+        self._since_checkpoint = 0
+
+    def summary(self) -> Dict[str, object]:
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        return {
+            "elapsed": elapsed,
+            **self.totals,
+            "docs_per_second": self.totals["committed"] / elapsed if elapsed > 0 else 0.0,
+            "stages": {stage.name: stage.snapshot(elapsed) for stage in self.stages},
+            "dedup": dict(self.retriever.dedup_stats),
+            "index": self.retriever.index_stats(),
+        }
+
+    def _report_loop(self, stop: threading.Event):
+        while not stop.wait(self.report_interval):
+            self._print_report(self.summary())
+
+    @staticmethod
+    def _print_report(summary: Dict[str, object]):
+        print(
+            f"[ingest] {summary['elapsed']:.1f}s 已写入 {summary['committed']} 篇 "
+            f"({summary['docs_per_second']:.2f} 篇/秒), 跳过已入库 {summary['resumed']} 篇"
+        )
+        print(f"  {'stage':<8} {'done':>7} {'err':>5} {'rate/s':>8} {'util':>6} {'queue':>6} {'max_q':>6}")
+        for name, stats in summary["stages"].items():
+            print(
+                f"  {name:<8} {stats['processed']:>7} {stats['errors']:>5} {stats['rate']:>8.2f} "
+                f"{stats['utilization']:>6.0%} {stats['queue']:>6} {stats['max_queue']:>6}"
+            )
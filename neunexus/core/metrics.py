@@ -0,0 +1,254 @@
+import bisect
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# 默认的耗时分桶（秒）
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_SHARDS = 16
+
+# 每个线程（或协程）第一次写入时按轮转分配分片编号并缓存；
+# 线程ID按页对齐，直接对其取模会让所有线程落到同一个分片
+_shard_local = threading.local()
+_next_shard = itertools.count()
+_next_shard_lock = threading.Lock()
+
+
+def _shard_index() -> int:
+    index = getattr(_shard_local, "index", None)
+    if index is None:
+        with _next_shard_lock:
+            index = _shard_local.index = next(_next_shard) % _SHARDS
+    return index
+
+
+class _Shard:
+    __slots__ = ("lock", "values")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+
+class _Metric:
+    """分片存储的指标：每个线程的写入落到轮转分配给它的分片上，各分片各自加锁，
+    并发写入的线程很少竞争同一把锁；导出时再把所有分片合并。"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards = [_Shard() for _ in range(_SHARDS)]
+
+    def _shard(self) -> _Shard:
+        return self._shards[_shard_index()]
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _merged(self) -> Dict[Tuple[str, ...], list]:
+        merged: Dict[Tuple[str, ...], list] = {}
+        for shard in self._shards:
+            with shard.lock:
+                items = [(key, list(values)) for key, values in shard.values.items()]
+            for key, values in items:
+                total = merged.get(key)
+                if total is None:
+                    merged[key] = values
+                else:
+                    for i, value in enumerate(values):
+                        total[i] += value
+        return merged
+
+    def _format_labels(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        escaped = (
+            f'{name}="{value.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34)).replace(chr(10), " ")}"'
+            for name, value in pairs
+        )
+        return "{" + ",".join(escaped) + "}"
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        shard = self._shard()
+        with shard.lock:
+            values = shard.values.get(key)
+            if values is None:
+                shard.values[key] = [amount]
+            else:
+                values[0] += amount
+
+    def value(self, **labels) -> float:
+        return self._merged().get(self._key(labels), [0])[0]
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, values in sorted(self._merged().items()):
+            lines.append(f"{self.name}{self._format_labels(key)} {values[0]}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        shard = self._shard()
+        with shard.lock:
+            values = shard.values.get(key)
+            if values is None:
+                # 各分桶的计数（最后一个为+Inf），随后是总和与总数
+                values = shard.values[key] = [0] * (len(self.buckets) + 3)
+            values[index] += 1
+            values[-2] += value
+            values[-1] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, values in sorted(self._merged().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {values[-2]}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {values[-1]}")
+        return lines
+
+
+class Gauge(_Metric):
+    """导出时通过回调读取当前值的指标"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, fn: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        try:
+            lines.append(f"{self.name} {float(self.fn())}")
+        except Exception as e:
+            print(f"读取指标 {self.name} 出错: {e}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, fn: Callable[[], float]) -> Gauge:
+        return self._register(Gauge(name, documentation, fn))
+
+    def render(self) -> str:
+        """Prometheus 文本格式"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# HTTP
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "neunexus_http_request_seconds", "HTTP请求处理耗时（流式响应为返回响应头前的耗时）", ["endpoint", "method", "status"]
+)
+HTTP_ERRORS = REGISTRY.counter("neunexus_http_errors_total", "控制器中未处理的异常数", ["endpoint", "type"])
+
+# SQLite
+DB_QUERY_SECONDS = REGISTRY.histogram("neunexus_db_query_seconds", "单条SQL语句的执行耗时", ["statement"])
+REPOSITORY_SECONDS = REGISTRY.histogram("neunexus_repository_seconds", "仓库方法的耗时", ["method"])
+
+# 后台清除
+PURGE_MESSAGES = REGISTRY.counter("neunexus_purge_messages_total", "后台清除处理的消息数", ["action"])
+PURGE_BATCH_SECONDS = REGISTRY.histogram("neunexus_purge_batch_seconds", "每批清除（含增量清理）的耗时")
+
+# 上游大模型
+LLM_TIME_TO_FIRST_TOKEN = REGISTRY.histogram("neunexus_llm_time_to_first_token_seconds", "从发出请求到收到第一个内容片段的耗时", ["mode"])
+LLM_TOKENS_PER_SECOND = REGISTRY.histogram(
+    "neunexus_llm_tokens_per_second", "流式回复的输出速度（首个片段之后）", ["mode"],
+    buckets=(1, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300)
+)
+LLM_REQUEST_SECONDS = REGISTRY.histogram("neunexus_llm_request_seconds", "大模型请求的总耗时", ["mode"])
+LLM_TOKENS = REGISTRY.counter("neunexus_llm_tokens_total", "输出的token数（无用量信息时按内容片段数计）", ["mode"])
+LLM_ERRORS = REGISTRY.counter("neunexus_llm_errors_total", "大模型请求错误数", ["mode", "type"])
+
+# 爬虫
+CRAWLER_FETCH_SECONDS = REGISTRY.histogram("neunexus_crawler_fetch_seconds", "网页下载耗时", ["kind"])
+CRAWLER_BYTES = REGISTRY.counter("neunexus_crawler_bytes_total", "下载的正文字节数", ["kind"])
+CRAWLER_ERRORS = REGISTRY.counter("neunexus_crawler_errors_total", "抓取错误数", ["kind", "type"])
+
+# 检索
+RETRIEVER_ENCODE_SECONDS = REGISTRY.histogram("neunexus_retriever_encode_seconds", "嵌入接口请求耗时")
+RETRIEVER_ENCODE_TEXTS = REGISTRY.counter("neunexus_retriever_encode_texts_total", "请求嵌入的文本数")
+RETRIEVER_SEARCH_SECONDS = REGISTRY.histogram("neunexus_retriever_search_seconds", "检索耗时（含查询向量化）", ["mode"])
+
+
+def timed_methods(histogram: Histogram, label: str = "method") -> Callable[[type], type]:
+    """类装饰器：为类的公开方法记录耗时，标签值为 类名.方法名"""
+    def decorate(cls: type) -> type:
+        for name, attr in list(vars(cls).items()):
+            if name.startswith("_") or not callable(attr):
+                continue
+            setattr(cls, name, _timed(attr, histogram, {label: f"{cls.__name__}.{name}"}))
+        return cls
+    return decorate
+
+
+def _timed(func: Callable, histogram: Histogram, labels: Dict[str, str]) -> Callable:
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - start, **labels)
+    return wrapper
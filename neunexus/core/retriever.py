@@ -1,19 +1,81 @@
+import os
+import pickle
 import re
+import threading
+import uuid
 import numpy as np
-from typing import Dict, List, Union
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set, Tuple, Union
 import requests
 
+from neunexus.core import tracing
+from neunexus.core.bm25 import BM25Index
+from neunexus.core.dedup import NearDuplicateFilter
+from neunexus.core.metrics import RETRIEVER_ENCODE_SECONDS, RETRIEVER_ENCODE_TEXTS, RETRIEVER_SEARCH_SECONDS
+
 
 class Retriever:
-    def __init__(self, api_key: str, model_name: str = "text-embedding-v1"):
-        """初始化检索器"""
+    def __init__(
+        self, 
+        api_key: str, 
+        model_name: str = "text-embedding-v1",
+        dedup_threshold: Optional[float] = 0.8,
+        compaction_threshold: float = 0.3
+    ):
+        """初始化检索器
+        
+        dedup_threshold: 入库去重的相似度阈值（MinHash估计的Jaccard），为None时关闭近重复去重
+        compaction_threshold: 墓碑行占比超过该值时自动压缩嵌入矩阵
+        """
         self.api_key = api_key
         self.model_name = model_name
         self.api_url = "https://dashscope.aliyuncs.com/api/v1/services/embeddings/text-embedding/embedding"
-        self.docs: Dict[str, np.ndarray] = {}
+        self.compaction_threshold = compaction_threshold
+        self.bm25 = BM25Index()
         
-    def encode(self, sentences: Union[str, List[str]]) -> np.ndarray:
-        """使用阿里云API将文本转换为嵌入向量"""
+        # 按行存储的片段：行号 -> 文本 / 归一化嵌入 / 存活标记 / 引用计数
+        self._texts: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._refs: List[int] = []
+        self._size = 0
+        self._tombstones = 0
+        self._row_of: Dict[str, int] = {}
+        self._doc_rows: Dict[str, List[int]] = {}
+        self._lock = threading.RLock()
+        # 正在入库的文档数：它们在锁外持有尚未写入 _doc_rows 的行号，期间不能压缩（压缩会重新编号）
+        self._in_flight = 0
+        # 上次保存以来新增、替换或删除的文档，checkpoint() 只追加这些文档
+        self._dirty: Set[str] = set()
+        self._checkpoint_lock = threading.RLock()
+        
+        self.doc_filter = NearDuplicateFilter(dedup_threshold) if dedup_threshold else None
+        self.chunk_filter = NearDuplicateFilter(dedup_threshold) if dedup_threshold else None
+        self.dedup_stats = {"docs_skipped": 0, "chunks_skipped": 0, "api_calls_saved": 0}
+    
+    @property
+    def docs(self) -> Dict[str, np.ndarray]:
+        """存活片段文本到嵌入向量的映射"""
+        with self._lock:
+            return {self._texts[row]: self._matrix[row] for row in self._live_rows()}
+    
+    @property
+    def tombstone_ratio(self) -> float:
+        """墓碑行占全部行的比例"""
+        return self._tombstones / self._size if self._size else 0.0
+    
+    def index_stats(self) -> Dict[str, int]:
+        """索引规模统计"""
+        with self._lock:
+            return {
+                "documents": len(self._doc_rows),
+                "rows": self._size,
+                "live_rows": self._size - self._tombstones,
+                "tombstones": self._tombstones,
+            }
+        
+    def encode(self, sentences: Union[str, List[str]], timeout: Optional[float] = None) -> np.ndarray:
+        """使用阿里云API将文本转换为嵌入向量，timeout 为请求超时秒数（None 表示不限制）"""
         
         if isinstance(sentences, str):
             sentences = [sentences]
@@ -31,7 +93,9 @@ class Retriever:
         }
         
         try:
-            response = requests.post(self.api_url, headers=headers, json=payload)
+            RETRIEVER_ENCODE_TEXTS.inc(len(sentences))
+            with RETRIEVER_ENCODE_SECONDS.time(), tracing.span("retriever.encode", texts=len(sentences)):
+                response = requests.post(self.api_url, headers=headers, json=payload, timeout=timeout)
             response.raise_for_status()
             result = response.json()
             
@@ -95,43 +159,460 @@ class Retriever:
         return chunks
 
 
-    def add_docs(self, content: Union[str, List[str]], threshold: float = 0.5):
-        """添加文档到检索库"""
+    def add_docs(
+        self, 
+        content: Union[str, List[str]], 
+        threshold: float = 0.5,
+        doc_ids: Optional[List[str]] = None
+    ) -> Dict[str, int]:
+        """添加文档到检索库，在请求嵌入之前剔除重复与近重复的文档和片段
+        
+        doc_ids 与 content 一一对应，未提供时自动生成；已存在的文档ID按 upsert_doc 处理。
+        返回本次调用的去重统计，api_calls_saved 为少发的嵌入请求数（整篇跳过的文档只计分块请求一次）
+        """
         
         if isinstance(content, str):
-            chunks = self.chunk(content, threshold)
-            for chunk in chunks:
-                chunk_text = "\n".join(chunk)
-                self.docs[chunk_text] = self.encode(chunk_text).flatten()
-        elif isinstance(content, list):
-            for text in content:
-                chunks = self.chunk(text, threshold)
-                for chunk in chunks:
+            content = [content]
+        if doc_ids is None:
+            doc_ids = [uuid.uuid4().hex for _ in content]
+        if len(doc_ids) != len(content):
+            raise ValueError("doc_ids 与 content 数量不一致")
+        
+        stats = {"docs_skipped": 0, "chunks_skipped": 0, "api_calls_saved": 0}
+            
+        for doc_id, text in zip(doc_ids, content):
+            self._ingest(doc_id, text, threshold, stats)
+        
+        self._merge_stats(stats)
+        return stats
+    
+    def upsert_doc(self, doc_id: str, text: str, threshold: float = 0.5) -> Dict[str, int]:
+        """新增或替换文档，新版本就绪前旧版本保持可检索，未变化的片段不会重新嵌入"""
+        return self.add_docs([text], threshold, doc_ids=[doc_id])
+    
+    def delete_doc(self, doc_id: str) -> bool:
+        """删除文档，其片段立即标记为墓碑并从查询中排除"""
+        with self._lock:
+            rows = self._doc_rows.pop(doc_id, None)
+            if rows is None:
+                return False
+            
+            if self.doc_filter is not None:
+                self.doc_filter.remove(doc_id)
+            self._dirty.add(doc_id)
+            self._release_rows(rows)
+            self._maybe_compact()
+            return True
+    
+    def _ingest(self, doc_id: str, text: str, threshold: float, stats: Dict[str, int]):
+        """切分、去重并嵌入单个文档，然后原子地替换该文档ID对应的行"""
+        doc_signature = None
+        if self.doc_filter is not None:
+            doc_signature = self.doc_filter.signature(text)
+            with self._lock:
+                # 旧版本的签名保留到新版本替换成功为止，查找时排除自身
+                duplicate = self.doc_filter.find(doc_signature, exclude=doc_id)
+                if duplicate is not None and duplicate in self._doc_rows:
+                    rows = self._doc_rows[duplicate]
+                    self._acquire_rows(rows)
+                    self._replace_doc(doc_id, list(rows), doc_signature)
+                    stats["docs_skipped"] += 1
+                    stats["api_calls_saved"] += 1
+                    return
+        
+        with self._holding_rows():
+            rows = []
+            try:
+                for chunk in self.chunk(text, threshold):
                     chunk_text = "\n".join(chunk)
-                    self.docs[chunk_text] = self.encode(chunk_text).flatten()
+                    signature = self.chunk_filter.signature(chunk_text) if self.chunk_filter else None
+                    row = self._acquire_existing(chunk_text, signature)
+                    if row is not None:
+                        rows.append(row)
+                        stats["chunks_skipped"] += 1
+                        stats["api_calls_saved"] += 1
+                        continue
                     
+                    embedding = self.encode(chunk_text).flatten()
+                    rows.append(self._insert_row(chunk_text, embedding, signature))
+            except Exception:
+                with self._lock:
+                    self._release_rows(rows)
+                raise
+            
+            with self._lock:
+                self._replace_doc(doc_id, rows, doc_signature)
     
-    def retrieve(self, query: str, top_k: int = 5) -> List[tuple]:
-        """检索最相关的文档片段并返回相似度分数"""
+    def find_duplicate_doc(self, doc_id: str, signature: Optional[np.ndarray]) -> Optional[str]:
+        """查找与文档近似重复的其他已入库文档，返回其ID"""
+        if self.doc_filter is None or signature is None:
+            return None
+        with self._lock:
+            duplicate = self.doc_filter.find(signature, exclude=doc_id)
+            if duplicate in self._doc_rows:
+                return duplicate
+            return None
+    
+    def find_chunk(self, chunk_text: str, signature: Optional[np.ndarray]) -> Optional[int]:
+        """查找与片段相同或近似重复的存活行，不改变引用计数"""
+        with self._lock:
+            row = self._row_of.get(chunk_text)
+            if row is None and self.chunk_filter is not None:
+                row = self.chunk_filter.find(signature)
+            return row
+    
+    def commit_doc(
+        self, 
+        doc_id: str, 
+        chunks: List[Tuple[str, Optional[np.ndarray], Optional[np.ndarray]]], 
+        doc_signature: Optional[np.ndarray] = None,
+        duplicate_of: Optional[str] = None
+    ) -> Dict[str, int]:
+        """写入已在外部完成切分与嵌入的文档，供批量入库流水线使用
         
-        if not self.docs:
-            return []
+        chunks 为 (片段文本, 片段签名, 嵌入向量) 列表，嵌入为None表示预期复用已有的行；
+        写入时会重新查找已有行，找不到时才补发嵌入请求。duplicate_of 指定时直接复用该文档的行。
+        """
+        stats = {"docs_skipped": 0, "chunks_skipped": 0, "api_calls_saved": 0}
+        
+        if duplicate_of is not None:
+            with self._lock:
+                rows = self._doc_rows.get(duplicate_of)
+                if rows is not None:
+                    self._acquire_rows(rows)
+                    self._replace_doc(doc_id, list(rows), doc_signature)
+                    stats["docs_skipped"] += 1
+                    stats["api_calls_saved"] += 1
+                    self._merge_stats(stats)
+                    return stats
+        
+        with self._holding_rows():
+            rows = []
+            try:
+                for chunk_text, signature, embedding in chunks:
+                    row = self._acquire_existing(chunk_text, signature)
+                    if row is not None:
+                        rows.append(row)
+                        if embedding is None:
+                            stats["chunks_skipped"] += 1
+                            stats["api_calls_saved"] += 1
+                        continue
+                    
+                    if embedding is None:
+                        embedding = self.encode(chunk_text).flatten()
+                    rows.append(self._insert_row(chunk_text, embedding, signature))
+            except Exception:
+                with self._lock:
+                    self._release_rows(rows)
+                raise
+            
+            with self._lock:
+                self._replace_doc(doc_id, rows, doc_signature)
+                self._merge_stats(stats)
+        return stats
+    
+    @contextmanager
+    def _holding_rows(self):
+        """标记一次进行中的入库；最后一个入库结束时补做期间推迟的压缩"""
+        with self._lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._maybe_compact()
+    
+    def _merge_stats(self, stats: Dict[str, int]):
+        with self._lock:
+            for key, value in stats.items():
+                self.dedup_stats[key] += value
+    
+    def has_doc(self, doc_id: str) -> bool:
+        with self._lock:
+            return doc_id in self._doc_rows
+    
+    # 不写入快照的运行时状态
+    _TRANSIENT = ("api_key", "_lock", "_in_flight", "_dirty", "_checkpoint_lock")
+    
+    def save(self, path: str):
+        """将索引快照原子地写入磁盘，并清空 checkpoint() 的增量日志"""
+        with self._checkpoint_lock:
+            with self._lock:
+                state = {
+                    key: value for key, value in self.__dict__.items() 
+                    if key not in self._TRANSIENT
+                }
+                data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+                self._dirty.clear()
+            
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            # 日志中的记录已包含在新快照中（即使在这里中断，重放旧日志也是幂等的）
+            if os.path.exists(f"{path}.log"):
+                os.remove(f"{path}.log")
+    
+    def checkpoint(self, path: str):
+        """增量保存：只把上次保存以来变化的文档追加到 path.log，不重写整个索引
+        
+        日志超过快照大小时改为完整保存，总开销与索引大小成正比；锁只在收集变化的文档时持有。
+        """
+        log_path = f"{path}.log"
+        with self._checkpoint_lock:
+            if not os.path.exists(path) or (
+                os.path.exists(log_path) and os.path.getsize(log_path) > os.path.getsize(path)
+            ):
+                self.save(path)
+                return
+            
+            with self._lock:
+                docs = {doc_id: self._doc_record(doc_id) for doc_id in self._dirty}
+                self._dirty.clear()
+                dedup_stats = dict(self.dedup_stats)
+            if not docs:
+                return
             
-        query_embedding = self.encode(query).flatten()
-        doc_contents = list(self.docs.keys())
-        doc_embeddings = np.array(list(self.docs.values()))
+            data = pickle.dumps({"docs": docs, "dedup_stats": dedup_stats}, protocol=pickle.HIGHEST_PROTOCOL)
+            with open(log_path, "ab") as f:
+                f.write(data)
+    
+    def _doc_record(self, doc_id: str) -> Optional[tuple]:
+        """文档的日志记录：(文档签名, [(片段文本, 片段签名, 嵌入向量)])，文档已删除时为None"""
+        rows = self._doc_rows.get(doc_id)
+        if rows is None:
+            return None
+        doc_signature = self.doc_filter.signatures.get(doc_id) if self.doc_filter is not None else None
+        chunks = [
+            (
+                self._texts[row],
+                self.chunk_filter.signatures.get(row) if self.chunk_filter is not None else None,
+                self._matrix[row].copy()
+            )
+            for row in rows
+        ]
+        return doc_signature, chunks
+    
+    def load(self, path: str):
+        """从save写入的快照与checkpoint追加的日志恢复索引，API密钥沿用当前实例"""
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        with self._lock:
+            self.__dict__.update(state)
+            self._replay(f"{path}.log")
+            self._dirty.clear()
+    
+    def _replay(self, log_path: str):
+        """按顺序重放日志中的文档变化，嵌入来自日志，不会发出嵌入请求"""
+        if not os.path.exists(log_path):
+            return
+        with open(log_path, "rb") as f:
+            while True:
+                try:
+                    frame = pickle.load(f)
+                except EOFError:
+                    break
+                except pickle.UnpicklingError:
+                    print(f"{log_path} 末尾的记录不完整，已忽略")
+                    break
+                
+                for doc_id, record in frame["docs"].items():
+                    if record is None:
+                        self.delete_doc(doc_id)
+                    else:
+                        doc_signature, chunks = record
+                        self.commit_doc(doc_id, chunks, doc_signature)
+                self.dedup_stats = frame["dedup_stats"]
+    
+    def _acquire_existing(self, chunk_text: str, signature: Optional[np.ndarray]) -> Optional[int]:
+        """查找与片段相同或近似重复的存活行，找到则增加其引用计数"""
+        with self._lock:
+            row = self.find_chunk(chunk_text, signature)
+            if row is not None:
+                self._refs[row] += 1
+            return row
+    
+    def _insert_row(self, chunk_text: str, embedding: np.ndarray, signature: Optional[np.ndarray]) -> int:
+        """追加新行（引用计数为1），嵌入矩阵按倍数扩容"""
+        norm = np.linalg.norm(embedding)
+        if norm > 0:
+            embedding = embedding / norm
         
-        similarities = []
-        for doc_embedding in doc_embeddings:
-            similarity = self.cosine_similarity(query_embedding, doc_embedding)
-            similarities.append(similarity)
+        with self._lock:
+            row = self._size
+            if self._matrix is None:
+                self._matrix = np.zeros((16, len(embedding)), dtype=np.float64)
+                self._alive = np.zeros(16, dtype=bool)
+            elif row == len(self._matrix):
+                self._matrix = np.concatenate([self._matrix, np.zeros_like(self._matrix)])
+                self._alive = np.concatenate([self._alive, np.zeros_like(self._alive)])
+            
+            self._matrix[row] = embedding
+            self._alive[row] = True
+            self._texts.append(chunk_text)
+            self._refs.append(1)
+            self._row_of[chunk_text] = row
+            self._size += 1
+            
+            self.bm25.add(row, chunk_text)
+            if self.chunk_filter is not None:
+                self.chunk_filter.add(row, signature)
+            return row
+    
+    def _replace_doc(self, doc_id: str, rows: List[int], signature: Optional[np.ndarray]):
+        """将文档ID指向新行，并释放旧版本持有的行"""
+        old_rows = self._doc_rows.get(doc_id)
+        self._doc_rows[doc_id] = rows
+        self._dirty.add(doc_id)
+        if self.doc_filter is not None:
+            self.doc_filter.remove(doc_id)
+            self.doc_filter.add(doc_id, signature)
+        if old_rows:
+            self._release_rows(old_rows)
+            self._maybe_compact()
+    
+    def _acquire_rows(self, rows: List[int]):
+        for row in rows:
+            self._refs[row] += 1
+    
+    def _release_rows(self, rows: List[int]):
+        """减少引用计数，计数归零的行变为墓碑"""
+        for row in rows:
+            self._refs[row] -= 1
+            if self._refs[row] > 0:
+                continue
+            
+            self._alive[row] = False
+            self._tombstones += 1
+            self._row_of.pop(self._texts[row], None)
+            self.bm25.remove(row)
+            if self.chunk_filter is not None:
+                self.chunk_filter.remove(row)
+    
+    def _maybe_compact(self):
+        if self._tombstones and self.tombstone_ratio > self.compaction_threshold:
+            self.compact()
+    
+    def compact(self) -> int:
+        """重写嵌入矩阵并丢弃墓碑行，返回回收的行数；有入库进行中时推迟到入库结束"""
+        with self._lock:
+            if not self._tombstones or self._in_flight:
+                return 0
+            
+            live = self._live_rows()
+            mapping = {int(old): new for new, old in enumerate(live)}
+            
+            capacity = max(16, len(live))
+            matrix = np.zeros((capacity, self._matrix.shape[1]), dtype=np.float64)
+            matrix[:len(live)] = self._matrix[live]
+            alive = np.zeros(capacity, dtype=bool)
+            alive[:len(live)] = True
+            
+            reclaimed = self._tombstones
+            self._matrix = matrix
+            self._alive = alive
+            self._texts = [self._texts[row] for row in live]
+            self._refs = [self._refs[row] for row in live]
+            self._size = len(live)
+            self._tombstones = 0
+            self._row_of = {text: row for row, text in enumerate(self._texts)}
+            self._doc_rows = {
+                doc_id: [mapping[row] for row in rows] 
+                for doc_id, rows in self._doc_rows.items()
+            }
+            self.bm25.remap(mapping)
+            if self.chunk_filter is not None:
+                self.chunk_filter.remap(mapping)
+            
+            return reclaimed
+    
+    def _live_rows(self) -> np.ndarray:
+        return np.flatnonzero(self._alive[:self._size])
+    
+    def _vector_scores(self, query_embedding: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """计算查询向量与指定行的余弦相似度"""
+        norm = np.linalg.norm(query_embedding)
+        if norm == 0:
+            return np.zeros(len(rows))
+        return self._matrix[rows] @ (query_embedding / norm)
+    
+    @staticmethod
+    def _rank_fusion(rankings: List[np.ndarray], k: int = 60) -> Dict[int, float]:
+        """倒数排名融合(RRF)：score = Σ 1 / (k + rank)"""
+        fused: Dict[int, float] = {}
+        for ranking in rankings:
+            for rank, row in enumerate(ranking):
+                fused[int(row)] = fused.get(int(row), 0.0) + 1.0 / (k + rank + 1)
+        return fused
+    
+    @staticmethod
+    def _min_max(scores: np.ndarray) -> np.ndarray:
+        """将分数线性归一化到[0, 1]"""
+        if len(scores) == 0:
+            return scores
+        low, high = scores.min(), scores.max()
+        if high == low:
+            return np.ones_like(scores)
+        return (scores - low) / (high - low)
+    
+    def retrieve(
+        self, 
+        query: str, 
+        top_k: int = 5,
+        mode: str = "vector",
+        fusion: str = "rrf",
+        alpha: float = 0.5,
+        prefilter_k: Optional[int] = None
+    ) -> List[tuple]:
+        """检索最相关的文档片段并返回相似度分数
+        
+        mode: "vector" 纯向量检索, "bm25" 纯关键词检索, "hybrid" 两者融合
+        fusion: 混合模式的融合方式, "rrf" 倒数排名融合或 "weighted" 加权融合(alpha为向量分数权重)
+        prefilter_k: 先用BM25选出前prefilter_k个候选，仅对候选计算向量相似度
+        """
+        if mode not in ("vector", "bm25", "hybrid"):
+            raise ValueError(f"不支持的检索模式: {mode}")
+        if fusion not in ("rrf", "weighted"):
+            raise ValueError(f"不支持的融合方式: {fusion}")
+        
+        with RETRIEVER_SEARCH_SECONDS.time(mode=mode), tracing.span("retriever.retrieve", mode=mode, top_k=top_k):
+            if self._size == self._tombstones:
+                return []
+        
+            if mode == "bm25":
+                with self._lock:
+                    return [(self._texts[row], score) for row, score in self.bm25.search(query, top_k)]
         
-        similarities = np.array(similarities)
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
-        filtered_top_k = min(top_k, len(doc_contents))
-        top_indices = top_indices[:filtered_top_k]
+            query_embedding = self.encode(query).flatten()
         
-        return [(doc_contents[i], similarities[i]) for i in top_indices]
+            with self._lock:
+                bm25_scores = self.bm25.scores(query) if (mode == "hybrid" or prefilter_k) else {}
+            
+                if prefilter_k and bm25_scores:
+                    candidates = sorted(bm25_scores, key=bm25_scores.get, reverse=True)[:prefilter_k]
+                    rows = np.array(candidates, dtype=np.int64)
+                else:
+                    rows = self._live_rows()
+            
+                vector_scores = self._vector_scores(query_embedding, rows)
+            
+                if mode == "vector":
+                    scores = vector_scores
+                else:
+                    lexical = np.array([bm25_scores.get(int(row), 0.0) for row in rows])
+                    if fusion == "rrf":
+                        vector_ranking = np.argsort(-vector_scores)
+                        lexical_ranking = [i for i in np.argsort(-lexical) if lexical[i] > 0]
+                        fused = self._rank_fusion([vector_ranking, lexical_ranking])
+                        scores = np.array([fused.get(i, 0.0) for i in range(len(rows))])
+                    else:
+                        scores = alpha * self._min_max(vector_scores) + (1 - alpha) * self._min_max(lexical)
+            
+                top_indices = np.argsort(-scores)[:min(top_k, len(rows))]
+            
+                return [(self._texts[rows[i]], scores[i]) for i in top_indices]
+
 
 
 if __name__ == "__main__":
@@ -142,7 +623,8 @@ if __name__ == "__main__":
         "这是第一个文档的内容。包含一些相关信息。",
         "这是第二个文档的内容。包含其他相关信息。"
     ]
-    retriever.add_docs(documents)
+    dedup_stats = retriever.add_docs(documents)
+    print("去重统计:", dedup_stats)
     
     # 检索
     query = "相关信息"
@@ -154,4 +636,13 @@ if __name__ == "__main__":
     results_with_scores = retriever.retrieve(query, top_k=3)
     print("\n带分数的检索结果:")
     for content, score in results_with_scores:
-        print(f"相似度: {score:.4f} - 内容: {content[:50]}...")
\ No newline at end of file
+        print(f"相似度: {score:.4f} - 内容: {content[:50]}...")
+    
+    # 混合检索（BM25 + 向量）
+    hybrid_results = retriever.retrieve(query, top_k=3, mode="hybrid", prefilter_k=50)
+    print("\n混合检索结果:", hybrid_results)
+    
+    # 文档生命周期：按ID更新与删除
+    retriever.upsert_doc("doc-1", "这是更新后的文档内容。包含最新的相关信息。")
+    retriever.delete_doc("doc-1")
+    print("\n索引统计:", retriever.index_stats())
\ No newline at end of file
@@ -0,0 +1,228 @@
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from functools import wraps
+from typing import Callable, Dict, List, Mapping, Optional
+
+
+class Trace:
+    """一次请求的跟踪记录，导出为 Chrome Trace Event 格式（chrome://tracing、Perfetto 可直接打开）"""
+
+    def __init__(self, name: str, profile: bool = False):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.start = time.perf_counter()
+        self.wall_start = time.time()
+        self.events: List[dict] = []
+        self._lock = threading.Lock()
+        self.profiler = None
+        if profile:
+            import cProfile
+            self.profiler = cProfile.Profile()
+
+    def _ts(self, when: float) -> float:
+        return round((when - self.start) * 1e6, 3)
+
+    def add(self, name: str, start: float, end: float, args: Optional[dict] = None):
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": self._ts(start),
+            "dur": round((end - start) * 1e6, 3),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+
+    def instant(self, name: str, args: Optional[dict] = None):
+        event = {
+            "name": name,
+            "ph": "i",
+            "s": "t",
+            "ts": self._ts(time.perf_counter()),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+
+    def to_json(self) -> dict:
+        with self._lock:
+            events = list(self.events)
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"trace_id": self.trace_id, "name": self.name, "started_at": self.wall_start},
+        }
+
+
+_current: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("neunexus_trace", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "name", "args", "start")
+
+    def __init__(self, trace: Trace, name: str, args: Dict[str, object]):
+        self.trace = trace
+        self.name = name
+        self.args = args
+        self.start = 0.0
+
+    def set(self, **args):
+        """补充跟踪参数（如结果数量、字节数）"""
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.trace.add(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class _NoopSpan:
+    """未开启跟踪时使用的空操作span，不做任何记录"""
+    __slots__ = ()
+
+    def set(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **args):
+    """在当前跟踪中记录一个阶段；未开启跟踪时只有一次 ContextVar 读取的开销"""
+    trace = _current.get()
+    if trace is None:
+        return _NOOP
+    return Span(trace, name, args)
+
+
+def instant(name: str, **args):
+    """记录一个瞬时事件（如收到首个token）"""
+    trace = _current.get()
+    if trace is not None:
+        trace.instant(name, args)
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+def attach(trace: Optional[Trace]):
+    """把跟踪绑定到当前上下文（传入None即解除绑定）"""
+    _current.set(trace)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """函数装饰器：在开启跟踪的请求中为每次调用记录一个span"""
+    def decorate(func: Callable) -> Callable:
+        label = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = _current.get()
+            if trace is None:
+                return func(*args, **kwargs)
+            with Span(trace, label, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def traced_methods(cls: type) -> type:
+    """类装饰器：为类的公开方法记录span，名称为 类名.方法名"""
+    for name, attr in list(vars(cls).items()):
+        if name.startswith("_") or not callable(attr):
+            continue
+        setattr(cls, name, traced(f"{cls.__name__}.{name}")(attr))
+    return cls
+
+
+def wrap(func: Callable) -> Callable:
+    """让提交到线程池的任务继承当前跟踪（线程池不会自动复制 contextvars）"""
+    trace = _current.get()
+    if trace is None:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        _current.set(trace)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.set(None)
+    return wrapper
+
+
+class Tracer:
+    """按请求开启跟踪：请求头 X-Trace 为 1 时跟踪，为 profile 时同时用 cProfile 采集；
+    其余请求按 sample_rate 随机采样。跟踪结束后写入 output_dir：
+    <时间>-<trace_id>.json 为跟踪事件，.prof 为 cProfile 统计（可用 snakeviz、pstats 查看）。
+
+    cProfile 只统计开启它的线程；在gevent或ASGI下同一线程上的其他请求也会被计入。
+    """
+
+    def __init__(self, output_dir: str = "./traces", sample_rate: float = 0.0, header: str = "X-Trace", allow_header: bool = True):
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.header = header
+        self.allow_header = allow_header
+
+    def start(self, name: str, headers: Mapping[str, str]) -> Optional[Trace]:
+        """根据请求头与采样率决定是否跟踪本次请求"""
+        flag = headers.get(self.header, "").strip().lower() if self.allow_header else ""
+        if flag in ("1", "true", "profile"):
+            trace = Trace(name, profile=flag == "profile")
+        elif self.sample_rate > 0 and random.random() < self.sample_rate:
+            trace = Trace(name)
+        else:
+            return None
+        if trace.profiler is not None:
+            try:
+                trace.profiler.enable()
+            except ValueError as e:
+                # 同一线程上已有其他profiler在运行
+                print(f"无法启动cProfile: {e}")
+                trace.profiler = None
+        return trace
+
+    def finish(self, trace: Trace, **args) -> Optional[str]:
+        """结束跟踪并写入文件，返回跟踪文件路径"""
+        end = time.perf_counter()
+        if trace.profiler is not None:
+            trace.profiler.disable()
+        trace.add(trace.name, trace.start, end, args)
+
+        prefix = os.path.join(
+            self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(trace.wall_start))}-{trace.trace_id}"
+        )
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(prefix + ".json", "w", encoding="utf-8") as f:
+                json.dump(trace.to_json(), f, ensure_ascii=False)
+            if trace.profiler is not None:
+                trace.profiler.dump_stats(prefix + ".prof")
+        except OSError as e:
+            print(f"写入跟踪文件失败: {e}")
+            return None
+        return prefix + ".json"
@@ -0,0 +1,176 @@
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from neunexus.core import tracing
+from neunexus.core.bm25 import BM25Index
+from neunexus.core.crawler import PageCrawler, SearchEngineCrawler
+from neunexus.core.crawler.url_utils import url_key
+from neunexus.core.retriever import Retriever
+
+
+class WebSearchPipeline:
+    """联网检索增强：搜索 -> 抓取/提取 -> 切块 -> 检索，整体受 budget 秒的延迟预算约束
+
+    各阶段重叠执行：每个引擎的结果页一返回即开始抓取其中的链接（无需等待其他引擎），每个页面提取完成后立即切块并写入本次请求的BM25索引，
+    预算耗尽时只使用已就绪的页面。配置了 Retriever 时，仅对BM25初筛出的候选段落做一次批量向量化重排，
+    向量化失败或预算不足时退回纯BM25排序。
+    """
+
+    def __init__(
+        self,
+        search_crawler: Optional[SearchEngineCrawler] = None,
+        page_crawler: Optional[PageCrawler] = None,
+        retriever: Optional[Retriever] = None,
+        engines=("bing", "baidu", "duckduckgo"),
+        budget: float = 4.0,
+        search_timeout: float = 1.5,
+        rerank_reserve: float = 0.8,
+        num_results: int = 6,
+        top_k: int = 5,
+        prefilter_k: int = 20,
+        chunk_size: int = 500
+    ):
+        self.search_crawler = search_crawler or SearchEngineCrawler()
+        self.page_crawler = page_crawler or PageCrawler(delay=0.2, timeout=3, download_deadline=3)
+        self.retriever = retriever
+        self.engines = engines
+        self.budget = budget
+        self.search_timeout = search_timeout
+        self.rerank_reserve = rerank_reserve
+        self.num_results = num_results
+        self.top_k = top_k
+        self.prefilter_k = prefilter_k
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def split_passages(text: str, chunk_size: int = 500) -> List[str]:
+        """按段落切分正文，并将相邻短段落合并到约chunk_size个字符"""
+        passages = []
+        current = ""
+        for paragraph in (p.strip() for p in text.split("\n")):
+            if not paragraph:
+                continue
+            if current and len(current) + len(paragraph) > chunk_size:
+                passages.append(current)
+                current = ""
+            current = f"{current}\n{paragraph}" if current else paragraph
+            while len(current) > chunk_size * 2:
+                passages.append(current[:chunk_size])
+                current = current[chunk_size:]
+        if current:
+            passages.append(current)
+        return passages
+
+    def run(self, query: str) -> Iterator[Tuple[str, Any]]:
+        """执行检索并逐步产出进度事件 (类型, 数据)
+
+        依次产出 ("searching", {...})、("sources", [...])、("context", [...])，
+        context 中的每个段落带有 source 序号（从1开始，对应 sources 中的位置）。
+        """
+        start = time.monotonic()
+        yield "searching", {"query": query}
+
+        titles: Dict[str, str] = {}
+
+        def search_urls() -> Iterator[str]:
+            # 由 fetch_many 的后台线程消费：每个结果页返回后立即交出其中的新链接
+            with tracing.span("web.search") as span:
+                seen = set()
+                result_pages = self.search_crawler.federated_pages(
+                    query,
+                    engines=self.engines,
+                    deadline=min(self.search_timeout, self.budget)
+                )
+                try:
+                    for _, _, page_results in result_pages:
+                        for result in page_results:
+                            key = url_key(result["link"])
+                            if key in seen:
+                                continue
+                            seen.add(key)
+                            titles[result["link"]] = result["title"]
+                            yield result["link"]
+                            if len(seen) >= self.num_results:
+                                return
+                finally:
+                    result_pages.close()
+                    span.set(results=len(seen))
+
+        index = BM25Index()
+        passages: List[Dict[str, Any]] = []
+        pages: List[Dict[str, str]] = []
+        fetch_deadline = max(self.budget - self.rerank_reserve - (time.monotonic() - start), 0)
+
+        with tracing.span("web.fetch") as span:
+            for url, page, _ in self.page_crawler.fetch_many(search_urls(), deadline=fetch_deadline):
+                if not page or not page.get("content"):
+                    continue
+                pages.append({"title": page.get("title") or titles[url], "url": url})
+                for text in self.split_passages(page["content"], self.chunk_size):
+                    index.add(len(passages), text)
+                    passages.append({"source": len(pages), "content": text})
+            span.set(urls=len(titles), pages=len(pages), passages=len(passages))
+
+        with tracing.span("web.rank"):
+            ranked = self._rank(query, index, passages, start)
+
+        # 只保留被选中段落所属的页面，并按出现顺序重新编号
+        renumber: Dict[int, int] = {}
+        sources = []
+        context = []
+        for passage_id in ranked:
+            passage = passages[passage_id]
+            if passage["source"] not in renumber:
+                renumber[passage["source"]] = len(sources) + 1
+                sources.append(pages[passage["source"] - 1])
+            context.append({"source": renumber[passage["source"]], "content": passage["content"]})
+
+        yield "sources", sources
+        yield "context", context
+
+    def _rank(self, query: str, index: BM25Index, passages: List[Dict[str, Any]], start: float) -> List[int]:
+        candidates = [doc_id for doc_id, _ in index.search(query, self.prefilter_k)]
+        if not candidates:
+            # 查询词未命中任何段落时按页面顺序取前top_k段
+            return list(range(min(len(passages), self.top_k)))
+
+        if self.retriever is None or len(candidates) <= 1 or time.monotonic() - start >= self.budget:
+            return candidates[:self.top_k]
+
+        # 向量化请求受剩余预算约束，超时即退回BM25排序
+        timeout = max(self.budget - (time.monotonic() - start), 0.2)
+        try:
+            embeddings = self.retriever.encode([query] + [passages[i]["content"] for i in candidates], timeout=timeout)
+        except Exception as e:
+            print(f"联网检索向量化失败，使用BM25排序: {e}")
+            return candidates[:self.top_k]
+
+        embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        similarities = embeddings[1:] @ embeddings[0]
+        # 倒数排名融合BM25与向量相似度
+        fused = {
+            doc_id: 1.0 / (60 + bm25_rank + 1)
+            for bm25_rank, doc_id in enumerate(candidates)
+        }
+        for vector_rank, position in enumerate(np.argsort(-similarities)):
+            fused[candidates[position]] += 1.0 / (60 + vector_rank + 1)
+        return sorted(fused, key=fused.get, reverse=True)[:self.top_k]
+
+    @staticmethod
+    def build_prompt(question: str, context: List[Dict[str, Any]], sources: List[Dict[str, str]]) -> str:
+        """将检索到的段落拼接到用户问题之前"""
+        if not context:
+            return question
+
+        lines = ["以下是联网搜索得到的参考资料，回答时可引用来源编号，如[1]：", ""]
+        for passage in context:
+            lines.append(f"[{passage['source']}] {passage['content']}")
+        lines.append("")
+        lines.append("来源：")
+        for i, source in enumerate(sources, 1):
+            lines.append(f"[{i}] {source['title']} {source['url']}")
+        lines.append("")
+        lines.append(f"问题：{question}")
+        return "\n".join(lines)
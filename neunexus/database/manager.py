@@ -1,50 +1,119 @@
+import re
 import sqlite3
 import threading
+import time
 from contextlib import contextmanager
 from typing import List
 
+from neunexus.core import tracing
+from neunexus.core.metrics import DB_QUERY_SECONDS
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+PREVIEW_LENGTH = 100
+
+# 由对话的 head 消息得到列表统计，触发器与迁移回填共用（conversations 指被更新的行）
+_CONVERSATION_STATS = f"""
+    message_count = COALESCE((SELECT depth FROM messages WHERE id = conversations.head_message_id), 0),
+    last_message_at = (SELECT timestamp FROM messages WHERE id = conversations.head_message_id),
+    preview = (SELECT substr(content, 1, {PREVIEW_LENGTH}) FROM messages WHERE id = conversations.head_message_id)
+"""
+_REFRESH_CONVERSATION_STATS = f"UPDATE conversations SET {_CONVERSATION_STATS} WHERE id = NEW.id;"
+
+
+def _statement_label(sql: str) -> str:
+    """把SQL语句规整为指标标签：合并空白并截断，参数均为占位符所以标签数量有限"""
+    return _WHITESPACE.sub(" ", sql).strip()[:80]
+
+
+class TimedCursor(sqlite3.Cursor):
+    """记录每条语句执行耗时的游标"""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._record(sql, start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._record(sql, start)
+
+    def executescript(self, sql_script):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self._record(sql_script, start)
+
+    @staticmethod
+    def _record(sql: str, start: float):
+        end = time.perf_counter()
+        statement = _statement_label(sql)
+        DB_QUERY_SECONDS.observe(end - start, statement=statement)
+        trace = tracing.current()
+        if trace is not None:
+            trace.add("sql", start, end, {"statement": statement})
+
 
 class SQLiteConnection:
     def __init__(self, db_file: str, timeout: int = 5):
         self.db_file = db_file
         self.timeout = timeout
-        self._connection = None
-        self._lock = threading.RLock()  # 使用可重入锁
+        self._local = threading.local()  # 每个线程（或协程）持有独立的连接
 
     
-    def _create_connection(self):
-        """创建新连接"""
-        if self._connection is None:
-            self._connection = sqlite3.connect(self.db_file, check_same_thread=False)
-            self._connection.row_factory = sqlite3.Row
-            self._connection.execute("PRAGMA foreign_keys = ON")
+    def _create_connection(self) -> sqlite3.Connection:
+        """创建新连接
+        
+        多个工作进程共享同一数据库文件时，写锁冲突会等待最多timeout秒而不是立即报 database is locked
+        """
+        connection = sqlite3.connect(self.db_file, timeout=self.timeout, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA foreign_keys = ON")
+        connection.execute(f"PRAGMA busy_timeout = {int(self.timeout * 1000)}")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        return connection
     
     def get_connection(self) -> sqlite3.Connection:
-        """获取数据库连接（单例模式）"""
-        with self._lock:
-            if self._connection is None:
-                self._create_connection()
-            return self._connection
+        """获取当前线程的数据库连接"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._create_connection()
+        return connection
     
     def close_connection(self):
-        """关闭连接"""
-        with self._lock:
-            if self._connection:
-                self._connection.close()
-                self._connection = None
+        """关闭当前线程的连接"""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
 
 
 class DatabaseManager:
-    """数据库连接管理器（单连接版本）"""
+    """数据库连接管理器（每线程一个连接）"""
     
-    def __init__(self, db_file: str):
+    def __init__(self, db_file: str, timeout: int = 30):
         self.db_file = db_file
-        self.pool = SQLiteConnection(db_file)
+        self.pool = SQLiteConnection(db_file, timeout)
+        self._tx = threading.local()  # 当前线程是否处于 transaction() 中
         self.init_db()
     
+    def in_transaction(self) -> bool:
+        return getattr(self._tx, "active", False)
+    
     @contextmanager
     def get_connection(self):
-        """获取数据库连接的上下文管理器"""
+        """获取数据库连接的上下文管理器（事务中复用事务的连接，由事务结束时关闭）"""
+        if self.in_transaction():
+            yield self.pool.get_connection()
+            return
+        
         conn = None
         try:
             conn = self.pool.get_connection()
@@ -55,22 +124,160 @@ class DatabaseManager:
     
     @contextmanager
     def get_cursor(self):
-        """上下文管理器用于获取游标，自动处理异常"""
+        """上下文管理器用于获取游标，自动处理异常
+        
+        在 transaction() 中不单独提交或回滚，由外层事务（及其保存点）统一处理
+        """
         with self.get_connection() as conn:
             cursor = None
             try:
-                cursor = conn.cursor()
+                cursor = conn.cursor(TimedCursor)
                 yield cursor
-                conn.commit()
+                if not self.in_transaction():
+                    conn.commit()
             except sqlite3.Error:
-                conn.rollback()
+                if not self.in_transaction():
+                    conn.rollback()
                 raise
             finally:
                 if cursor:
                     cursor.close()
     
+    @contextmanager
+    def transaction(self, write: bool = True):
+        """在当前线程上开启一个事务，期间经 get_cursor 执行的语句都在同一连接、同一事务中
+        
+        write为True时用 BEGIN IMMEDIATE 一开始就取得写锁，避免事务中途由读升级为写时与其他写者冲突；
+        只读时用 BEGIN，事务内的查询看到同一个快照。正常结束时提交，抛出异常时整体回滚。
+        """
+        if self.in_transaction():
+            raise RuntimeError("transaction() 不支持嵌套，请使用 savepoint()")
+        
+        conn = self.pool.get_connection()
+        self._tx.active = True
+        try:
+            conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            yield conn
+            conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._tx.active = False
+            self.pool.close_connection()
+    
+    @contextmanager
+    def savepoint(self, name: str = "sp"):
+        """事务中的保存点：块内抛出异常时只撤销块内的修改，外层事务继续"""
+        if not self.in_transaction():
+            raise RuntimeError("savepoint() 只能在 transaction() 中使用")
+        
+        conn = self.pool.get_connection()
+        conn.execute(f'SAVEPOINT "{name}"')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f'ROLLBACK TO "{name}"')
+            conn.execute(f'RELEASE "{name}"')
+            raise
+        conn.execute(f'RELEASE "{name}"')
+    
+    # 数据库结构迁移，第 i 项把 PRAGMA user_version 从 i 升级到 i + 1
+    MIGRATIONS: List[List[str]] = [
+        # 1: 消息按 parent_id 组成树，对话通过 head_message_id 指向所在分支的最后一条消息，
+        #    分叉出的对话与原对话共享公共前缀的消息行；messages.conversation_id 表示创建（拥有）该消息的对话
+        [
+            "ALTER TABLE messages ADD COLUMN parent_id INTEGER REFERENCES messages (id)",
+            "ALTER TABLE conversations ADD COLUMN head_message_id INTEGER REFERENCES messages (id) ON DELETE SET NULL",
+            "ALTER TABLE conversations ADD COLUMN forked_from_id INTEGER REFERENCES conversations (id) ON DELETE SET NULL",
+            "ALTER TABLE conversations ADD COLUMN fork_message_id INTEGER",
+            "CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages (conversation_id, id)",
+            "CREATE INDEX IF NOT EXISTS idx_messages_parent ON messages (parent_id)",
+            # 已有对话的消息按插入顺序串成一条链
+            """
+                UPDATE messages SET parent_id = (
+                    SELECT MAX(prev.id) FROM messages prev
+                    WHERE prev.conversation_id = messages.conversation_id AND prev.id < messages.id
+                )
+            """,
+            """
+                UPDATE conversations SET head_message_id = (
+                    SELECT MAX(id) FROM messages WHERE conversation_id = conversations.id
+                )
+            """,
+        ],
+        # 2: 对话列表所需的统计由触发器维护，列表无需联表或子查询
+        #    messages.depth 为消息在分支中的序号，对话的消息数即 head 消息的 depth；
+        #    last_message_at 与 preview 取自 head 消息，head 变化或其 depth 变化时刷新
+        [
+            "ALTER TABLE messages ADD COLUMN depth INTEGER NOT NULL DEFAULT 0",
+            "ALTER TABLE conversations ADD COLUMN last_message_at TIMESTAMP",
+            "ALTER TABLE conversations ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0",
+            "ALTER TABLE conversations ADD COLUMN preview TEXT",
+            # 父消息id总小于子消息，按id顺序逐层回填
+            "CREATE TEMP TABLE message_depth (id INTEGER PRIMARY KEY, depth INTEGER NOT NULL)",
+            """
+                INSERT INTO message_depth
+                WITH RECURSIVE tree(id, depth) AS (
+                    SELECT id, 1 FROM messages WHERE parent_id IS NULL
+                    UNION ALL
+                    SELECT m.id, tree.depth + 1 FROM messages m JOIN tree ON m.parent_id = tree.id
+                )
+                SELECT id, depth FROM tree
+            """,
+            "UPDATE messages SET depth = (SELECT depth FROM message_depth WHERE message_depth.id = messages.id)",
+            "DROP TABLE message_depth",
+            """
+                CREATE TRIGGER IF NOT EXISTS messages_depth AFTER INSERT ON messages
+                BEGIN
+                    UPDATE messages SET depth = COALESCE((SELECT depth FROM messages WHERE id = NEW.parent_id), 0) + 1
+                    WHERE id = NEW.id;
+                END
+            """,
+            f"""
+                CREATE TRIGGER IF NOT EXISTS conversations_stats_insert AFTER INSERT ON conversations
+                WHEN NEW.head_message_id IS NOT NULL
+                BEGIN
+                    {_REFRESH_CONVERSATION_STATS}
+                END
+            """,
+            f"""
+                CREATE TRIGGER IF NOT EXISTS conversations_stats_head AFTER UPDATE OF head_message_id ON conversations
+                BEGIN
+                    {_REFRESH_CONVERSATION_STATS}
+                END
+            """,
+            """
+                CREATE TRIGGER IF NOT EXISTS messages_depth_stats AFTER UPDATE OF depth ON messages
+                BEGIN
+                    UPDATE conversations SET message_count = NEW.depth WHERE head_message_id = NEW.id;
+                END
+            """,
+            f"UPDATE conversations SET {_CONVERSATION_STATS}",
+            "CREATE INDEX IF NOT EXISTS idx_conversations_head ON conversations (head_message_id)",
+            "CREATE INDEX IF NOT EXISTS idx_conversations_created ON conversations (created_at, id)",
+            "CREATE INDEX IF NOT EXISTS idx_conversations_activity ON conversations (COALESCE(last_message_at, created_at), id)",
+        ],
+        # 3: 软删除。删除对话只标记 deleted_at，清空对话只把 head_message_id 置空，
+        #    二者都记录 purge_through：该对话拥有的、id不大于它的消息由后台分批清除
+        [
+            "ALTER TABLE conversations ADD COLUMN deleted_at TIMESTAMP",
+            "ALTER TABLE conversations ADD COLUMN purge_through INTEGER",
+            # 列表只查询未删除的对话，索引只需包含这些行
+            "DROP INDEX IF EXISTS idx_conversations_created",
+            "DROP INDEX IF EXISTS idx_conversations_activity",
+            "CREATE INDEX idx_conversations_created ON conversations (created_at, id) WHERE deleted_at IS NULL",
+            """
+                CREATE INDEX idx_conversations_activity ON conversations (COALESCE(last_message_at, created_at), id)
+                WHERE deleted_at IS NULL
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_conversations_purge ON conversations (id) WHERE purge_through IS NOT NULL",
+        ],
+    ]
+    
     def init_db(self):
-        """初始化数据库表"""
+        """初始化数据库表并执行尚未执行的迁移"""
         tables = {
             'conversations': """
                 CREATE TABLE IF NOT EXISTS conversations (
@@ -93,10 +300,60 @@ class DatabaseManager:
         
         try:
             with self.get_cursor() as cursor:
+                # 新建的数据库启用增量自动清理，删除后释放的页可以分批归还文件系统；
+                # 已有数据库需要执行一次 enable_incremental_vacuum() 才会生效
+                cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                # WAL模式写入数据库文件本身，读写互不阻塞，多进程共享时只需设置一次
+                cursor.execute("PRAGMA journal_mode = WAL")
+                # 多个工作进程同时启动时，由写锁串行化建表与迁移
+                cursor.execute("BEGIN IMMEDIATE")
                 for _, create_sql in tables.items():
                     cursor.execute(create_sql)
+                
+                version = cursor.execute("PRAGMA user_version").fetchone()[0]
+                for target, statements in enumerate(self.MIGRATIONS[version:], start=version + 1):
+                    for statement in statements:
+                        cursor.execute(statement)
+                    cursor.execute(f"PRAGMA user_version = {target}")
+                    print(f"数据库已迁移到版本 {target}")
         except sqlite3.Error:
             raise
+        
+        if self.storage_stats()["auto_vacuum"] != "incremental":
+            print("数据库未启用增量自动清理，删除数据后文件不会缩小；可执行 python run.py --vacuum 启用（会重写整个数据库文件）")
+    
+    def storage_stats(self) -> dict:
+        """数据库文件的页统计，freelist_pages 为已释放、尚未归还文件系统的页数"""
+        with self.get_cursor() as cursor:
+            page_size = cursor.execute("PRAGMA page_size").fetchone()[0]
+            page_count = cursor.execute("PRAGMA page_count").fetchone()[0]
+            freelist = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+            mode = cursor.execute("PRAGMA auto_vacuum").fetchone()[0]
+        return {
+            "page_size": page_size,
+            "page_count": page_count,
+            "freelist_pages": freelist,
+            "file_bytes": page_size * page_count,
+            "auto_vacuum": {0: "none", 1: "full", 2: "incremental"}.get(mode, str(mode)),
+        }
+    
+    def incremental_vacuum(self, pages: int) -> int:
+        """把最多pages个空闲页归还文件系统，返回实际归还的页数；未启用增量自动清理时不做任何事"""
+        # executescript 会先提交当前连接上未结束的事务
+        if self.in_transaction():
+            raise RuntimeError("incremental_vacuum() cannot run inside transaction()")
+        with self.get_cursor() as cursor:
+            before = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+            # 每执行一步只释放一页，execute 只执行一步，executescript 会执行到结束
+            cursor.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+            after = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+        return before - after
+    
+    def enable_incremental_vacuum(self):
+        """为已有数据库启用增量自动清理：需要执行一次 VACUUM 重写整个文件，期间阻塞所有写入"""
+        with self.get_connection() as conn:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
     
     def execute_query(self, query: str, params: tuple = None) -> List[sqlite3.Row]:
         """执行查询并返回结果"""
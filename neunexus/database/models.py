@@ -1,10 +1,17 @@
 from dataclasses import dataclass
+from typing import Optional
 
 @dataclass
 class Conversation:
     id: int
     title: str
     created_at: str
+    head_message_id: Optional[int] = None
+    forked_from_id: Optional[int] = None
+    fork_message_id: Optional[int] = None
+    last_message_at: Optional[str] = None
+    message_count: int = 0
+    preview: Optional[str] = None
 
 
 @dataclass
@@ -14,3 +21,5 @@ class Message:
     role: str
     content: str
     timestamp: str
+    parent_id: Optional[int] = None
+    depth: int = 0
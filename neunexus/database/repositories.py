@@ -1,10 +1,78 @@
 from abc import ABC, abstractmethod
 import sqlite3
 from typing import List, Optional, Dict, Any
+from neunexus.core.metrics import REPOSITORY_SECONDS, timed_methods
+from neunexus.core.tracing import traced_methods
 from neunexus.database.manager import DatabaseManager
 from neunexus.database.models import Conversation, Message
 
 
+# 从对话的 head_message_id 沿 parent_id 向上取所在分支的消息，最多 :limit 条（为负数时不限制）
+_BRANCH_QUERY = """
+    WITH RECURSIVE branch(id, depth) AS (
+        SELECT head_message_id, 1 FROM conversations
+        WHERE id = :conversation_id AND head_message_id IS NOT NULL AND deleted_at IS NULL
+        UNION ALL
+        SELECT m.parent_id, branch.depth + 1 FROM messages m JOIN branch ON m.id = branch.id
+        WHERE m.parent_id IS NOT NULL AND (:limit < 0 OR branch.depth < :limit)
+    )
+    SELECT m.* FROM branch JOIN messages m ON m.id = branch.id ORDER BY m.id ASC
+"""
+
+
+def _purge_batch(cursor: sqlite3.Cursor, conversation_id: int, purge_through: int, batch_size: int) -> Dict[str, int]:
+    """清除对话拥有的、id不大于purge_through的消息中id最大的batch_size条
+    
+    仍被其他对话共享的消息（其他分支的祖先或其他对话的head）不删除，连同祖先一起转交给共享它的对话。
+    父消息的id总是小于子消息，从大到小处理时批内消息的子消息要么在本批，要么已在之前的批次中处理；
+    每个认领向上最多走batch_size步，走不完的部分在之后的批次中作为新的共享入口继续认领。
+    """
+    cursor.execute("""
+        SELECT MIN(id) AS low, MAX(id) AS high, COUNT(*) AS count FROM (
+            SELECT id FROM messages WHERE conversation_id = ? AND id <= ? ORDER BY id DESC LIMIT ?
+        )
+    """, (conversation_id, purge_through, batch_size))
+    batch = cursor.fetchone()
+    if not batch['count']:
+        return {'deleted': 0, 'reassigned': 0}
+    
+    cursor.execute("""
+        SELECT m.id, COALESCE(
+            (SELECT child.conversation_id FROM messages child
+             WHERE child.parent_id = m.id AND child.conversation_id != m.conversation_id LIMIT 1),
+            (SELECT c.id FROM conversations c WHERE c.head_message_id = m.id AND c.id != m.conversation_id LIMIT 1)
+        ) AS claimant
+        FROM messages m WHERE m.conversation_id = ? AND m.id BETWEEN ? AND ?
+        ORDER BY m.id DESC
+    """, (conversation_id, batch['low'], batch['high']))
+    reassigned = 0
+    for message_id, claimant in cursor.fetchall():
+        if claimant is None:
+            continue
+        cursor.execute("""
+            WITH RECURSIVE shared(id, steps) AS (
+                SELECT ?, 1
+                UNION ALL
+                SELECT m.parent_id, shared.steps + 1 FROM messages m JOIN shared ON m.id = shared.id
+                WHERE m.conversation_id = ? AND m.parent_id IS NOT NULL AND shared.steps < ?
+            )
+            UPDATE messages SET conversation_id = ? WHERE conversation_id = ? AND id IN (SELECT id FROM shared)
+        """, (message_id, conversation_id, batch_size, claimant, conversation_id))
+        # 以WITH开头的语句 rowcount 为-1
+        reassigned += cursor.execute("SELECT changes()").fetchone()[0]
+    
+    # 认领走到上限时，批内可能留下刚成为共享入口的消息，留给下一批认领
+    cursor.execute("""
+        DELETE FROM messages
+        WHERE conversation_id = ? AND id BETWEEN ? AND ?
+          AND NOT EXISTS (SELECT 1 FROM messages child
+                          WHERE child.parent_id = messages.id AND child.conversation_id != messages.conversation_id)
+          AND NOT EXISTS (SELECT 1 FROM conversations c
+                          WHERE c.head_message_id = messages.id AND c.id != messages.conversation_id)
+    """, (conversation_id, batch['low'], batch['high']))
+    return {'deleted': cursor.rowcount, 'reassigned': reassigned}
+
+
 class BaseRepository(ABC):
     """基础仓库抽象类"""
     @abstractmethod
@@ -21,6 +89,8 @@ class BaseRepository(ABC):
 
 
 
+@traced_methods
+@timed_methods(REPOSITORY_SECONDS)
 class ConversationRepository:
     """对话数据访问层"""
     
@@ -29,7 +99,7 @@ class ConversationRepository:
     
     def get_by_id(self, conversation_id: int) -> Optional[Conversation]:
         """根据ID获取对话"""
-        query = "SELECT * FROM conversations WHERE id = ?"
+        query = "SELECT * FROM conversations WHERE id = ? AND deleted_at IS NULL"
         rows = self.db.execute_query(query, (conversation_id,))
         return self._row_to_conversation(rows[0]) if rows else None
     
@@ -41,33 +111,128 @@ class ConversationRepository:
             row = cursor.fetchone()
         return self._row_to_conversation(row)
     
-    def get_all(self) -> List[Conversation]:
-        """获取所有对话"""
-        query = "SELECT * FROM conversations ORDER BY created_at DESC"
+    # 排序方式 -> ORDER BY，均有对应的部分索引（只含未删除的对话），列表无需联表或排序
+    SORT_ORDERS = {
+        "created": "created_at DESC, id DESC",
+        "activity": "COALESCE(last_message_at, created_at) DESC, id DESC",
+    }
+    
+    def get_all(self, sort: str = "created") -> List[Conversation]:
+        """获取所有对话，sort 为 created（按创建时间）或 activity（按最后一条消息的时间，无消息时按创建时间）"""
+        query = f"SELECT * FROM conversations WHERE deleted_at IS NULL ORDER BY {self.SORT_ORDERS[sort]}"
         rows = self.db.execute_query(query)
         return [self._row_to_conversation(row) for row in rows]
     
     def update(self, conversation_id: int, title: str) -> bool:
         """更新对话标题"""
-        query = "UPDATE conversations SET title = ? WHERE id = ?"
+        query = "UPDATE conversations SET title = ? WHERE id = ? AND deleted_at IS NULL"
         rowcount = self.db.execute_command(query, (title, conversation_id))
         return rowcount > 0
     
+    def fork(self, conversation_id: int, message_id: Optional[int], title: str) -> Optional[Conversation]:
+        """从对话分支上的某条消息（为None时从空历史）分叉出新对话，与原对话共享此前的消息，不复制任何消息行
+        
+        原对话不存在或已删除、message_id 不在原对话分支上时返回None
+        """
+        with self.db.get_cursor() as cursor:
+            if not self.db.in_transaction():
+                cursor.execute("BEGIN IMMEDIATE")
+            if message_id is None:
+                cursor.execute("SELECT 1 FROM conversations WHERE id = ? AND deleted_at IS NULL", (conversation_id,))
+                if cursor.fetchone() is None:
+                    return None
+            elif not self._on_branch(cursor, conversation_id, message_id):
+                return None
+            cursor.execute(
+                "INSERT INTO conversations (title, head_message_id, forked_from_id, fork_message_id) VALUES (?, ?, ?, ?)",
+                (title, message_id, conversation_id, message_id)
+            )
+            cursor.execute("SELECT * FROM conversations WHERE id = ?", (cursor.lastrowid,))
+            row = cursor.fetchone()
+        return self._row_to_conversation(row)
+    
+    @staticmethod
+    def _on_branch(cursor: sqlite3.Cursor, conversation_id: int, message_id: int) -> bool:
+        """消息是否在对话当前分支上；祖先的id总小于后代，向上走到id不大于message_id即可停止"""
+        cursor.execute("""
+            WITH RECURSIVE branch(id) AS (
+                SELECT head_message_id FROM conversations WHERE id = ? AND deleted_at IS NULL
+                UNION ALL
+                SELECT m.parent_id FROM messages m JOIN branch ON m.id = branch.id WHERE m.id > ?
+            )
+            SELECT 1 FROM branch WHERE id = ? LIMIT 1
+        """, (conversation_id, message_id, message_id))
+        return cursor.fetchone() is not None
+    
     def delete(self, conversation_id: int) -> bool:
-        """删除对话（级联删除消息）"""
-        query = "DELETE FROM conversations WHERE id = ?"
+        """删除对话：只做标记，对话立即从读取中消失，消息由 purge() 在后台分批清除"""
+        query = """
+            UPDATE conversations
+            SET deleted_at = datetime('now', 'localtime'),
+                purge_through = (SELECT COALESCE(MAX(id), 0) FROM messages)
+            WHERE id = ? AND deleted_at IS NULL
+        """
         rowcount = self.db.execute_command(query, (conversation_id,))
         return rowcount > 0
     
+    def pending_purges(self, limit: int = 100) -> List[int]:
+        """等待清除的对话id（已删除的对话与清空过消息的对话）"""
+        query = "SELECT id FROM conversations WHERE purge_through IS NOT NULL ORDER BY id LIMIT ?"
+        rows = self.db.execute_query(query, (limit,))
+        return [row['id'] for row in rows]
+    
+    def purge_backlog(self) -> Dict[str, int]:
+        """等待清除的对话数与消息数"""
+        query = """
+            SELECT COUNT(*) AS conversations, COALESCE(SUM(
+                (SELECT COUNT(*) FROM messages m WHERE m.conversation_id = c.id AND m.id <= c.purge_through)
+            ), 0) AS messages
+            FROM conversations c WHERE c.purge_through IS NOT NULL
+        """
+        row = self.db.execute_query(query)[0]
+        return {'conversations': row['conversations'], 'messages': row['messages']}
+    
+    def purge(self, conversation_id: int, batch_size: int = 500) -> Dict[str, Any]:
+        """在一个短事务中清除对话的一批消息，全部清除后删除已删除对话的行
+        
+        返回 deleted（删除的消息数）、reassigned（转交给分叉对话的消息数）、
+        done（该对话已无待清除的消息）、removed（对话行已删除）
+        """
+        with self.db.get_cursor() as cursor:
+            if not self.db.in_transaction():
+                cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT deleted_at, purge_through FROM conversations WHERE id = ?", (conversation_id,))
+            row = cursor.fetchone()
+            if row is None or row['purge_through'] is None:
+                return {'deleted': 0, 'reassigned': 0, 'done': True, 'removed': False}
+            
+            result = _purge_batch(cursor, conversation_id, row['purge_through'], batch_size)
+            if result['deleted'] or result['reassigned']:
+                return {**result, 'done': False, 'removed': False}
+            
+            if row['deleted_at'] is not None:
+                cursor.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+            else:
+                cursor.execute("UPDATE conversations SET purge_through = NULL WHERE id = ?", (conversation_id,))
+        return {**result, 'done': True, 'removed': row['deleted_at'] is not None}
+    
     def _row_to_conversation(self, row: sqlite3.Row) -> Conversation:
         """将数据库行转换为Conversation对象"""
         return Conversation(
             id=row['id'],
             title=row['title'],
-            created_at=row['created_at']
+            created_at=row['created_at'],
+            head_message_id=row['head_message_id'],
+            forked_from_id=row['forked_from_id'],
+            fork_message_id=row['fork_message_id'],
+            last_message_at=row['last_message_at'],
+            message_count=row['message_count'],
+            preview=row['preview']
         )
 
 
+@traced_methods
+@timed_methods(REPOSITORY_SECONDS)
 class MessageRepository:
     """消息数据访问层"""
     
@@ -80,42 +245,78 @@ class MessageRepository:
         rows = self.db.execute_query(query, (message_id,))
         return self._row_to_message(rows[0]) if rows else None
     
-    def create(self, conversation_id: int, role: str, content: str) -> Message:
-        """创建新消息"""
+    def create(self, conversation_id: int, role: str, content: str) -> Optional[Message]:
+        """在对话分支末尾追加新消息，对话不存在或已删除时返回None"""
         with self.db.get_cursor() as cursor:
-            cursor.execute("INSERT INTO messages (conversation_id, role, content) VALUES (?, ?, ?)", 
-                           (conversation_id, role, content))
-            cursor.execute("SELECT * FROM messages WHERE id = ?", (cursor.lastrowid,))
+            # 读取与更新 head_message_id 之间不能插入其他写入，否则同一对话的并发追加会产生分叉
+            if not self.db.in_transaction():
+                cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(
+                "SELECT head_message_id FROM conversations WHERE id = ? AND deleted_at IS NULL", (conversation_id,)
+            )
+            conversation = cursor.fetchone()
+            if conversation is None:
+                return None
+            cursor.execute("""
+                INSERT INTO messages (conversation_id, parent_id, role, content)
+                VALUES (?, ?, ?, ?)
+            """, (conversation_id, conversation['head_message_id'], role, content))
+            message_id = cursor.lastrowid
+            cursor.execute("UPDATE conversations SET head_message_id = ? WHERE id = ?", (message_id, conversation_id))
+            cursor.execute("SELECT * FROM messages WHERE id = ?", (message_id,))
             row = cursor.fetchone()
         
         return self._row_to_message(row)
     
     def get_by_conversation(self, conversation_id: int) -> List[Message]:
-        """获取对话的所有消息"""
-        query = "SELECT * FROM messages WHERE conversation_id = ? ORDER BY timestamp ASC"
-        rows = self.db.execute_query(query, (conversation_id,))
+        """获取对话分支上的所有消息（含与其他对话共享的前缀）"""
+        rows = self.db.execute_query(_BRANCH_QUERY, {'conversation_id': conversation_id, 'limit': -1})
         return [self._row_to_message(row) for row in rows]
     
     def get_recent_by_conversation(self, conversation_id: int, limit: int = 500) -> List[Message]:
-        """获取对话的最近消息"""
-        query = """
-            SELECT * FROM messages 
-            WHERE conversation_id = ? 
-            ORDER BY timestamp DESC
-            LIMIT ?
-        """
-        rows = self.db.execute_query(query, (conversation_id, limit))
-        return [self._row_to_message(row) for row in reversed(rows)]
+        """获取对话的最近消息，只访问分支末尾的limit条"""
+        if limit <= 0:
+            return []
+        rows = self.db.execute_query(_BRANCH_QUERY, {'conversation_id': conversation_id, 'limit': limit})
+        return [self._row_to_message(row) for row in rows]
     
     def delete(self, message_id: int) -> bool:
-        """删除消息"""
-        query = "DELETE FROM messages WHERE id = ?"
-        rowcount = self.db.execute_command(query, (message_id,))
+        """删除消息，子消息改为挂到被删除消息的父消息上
+        
+        消息可能被多个分叉对话共享，删除对共享它的所有对话生效
+        """
+        with self.db.get_cursor() as cursor:
+            if not self.db.in_transaction():
+                cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT parent_id FROM messages WHERE id = ?", (message_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return False
+            parent_id = row['parent_id']
+            # 后代的序号减一，触发器随之更新以它们为 head 的对话的消息数
+            cursor.execute("""
+                WITH RECURSIVE descendants(id) AS (
+                    SELECT id FROM messages WHERE parent_id = ?
+                    UNION ALL
+                    SELECT m.id FROM messages m JOIN descendants ON m.parent_id = descendants.id
+                )
+                UPDATE messages SET depth = depth - 1 WHERE id IN descendants
+            """, (message_id,))
+            cursor.execute("UPDATE messages SET parent_id = ? WHERE parent_id = ?", (parent_id, message_id))
+            cursor.execute("UPDATE conversations SET head_message_id = ? WHERE head_message_id = ?", (parent_id, message_id))
+            cursor.execute("UPDATE conversations SET fork_message_id = ? WHERE fork_message_id = ?", (parent_id, message_id))
+            cursor.execute("DELETE FROM messages WHERE id = ?", (message_id,))
+            rowcount = cursor.rowcount
         return rowcount > 0
     
     def delete_by_conversation(self, conversation_id: int) -> bool:
-        """删除对话的所有消息"""
-        query = "DELETE FROM messages WHERE conversation_id = ?"
+        """清空对话的所有消息：对话立即变为空历史，旧消息由 ConversationRepository.purge() 在后台清除，
+        与分叉对话共享的消息仍为分叉对话保留"""
+        query = """
+            UPDATE conversations
+            SET head_message_id = NULL, purge_through = (SELECT MAX(id) FROM messages)
+            WHERE id = ? AND deleted_at IS NULL AND head_message_id IS NOT NULL
+        """
         rowcount = self.db.execute_command(query, (conversation_id,))
         return rowcount > 0
     
@@ -126,5 +327,7 @@ class MessageRepository:
             conversation_id=row['conversation_id'],
             role=row['role'],
             content=row['content'],
-            timestamp=row['timestamp']
+            timestamp=row['timestamp'],
+            parent_id=row['parent_id'],
+            depth=row['depth']
         )
\ No newline at end of file
@@ -1,7 +1,11 @@
 from neunexus.service.conversation_service import ConversationService
 from neunexus.service.message_service import MessageService
+from neunexus.service.batch_service import BatchService
+from neunexus.service.purge_service import PurgeService
 
 __all__ = [
     "ConversationService",
-    "MessageService"
+    "MessageService",
+    "BatchService",
+    "PurgeService"
 ]
\ No newline at end of file
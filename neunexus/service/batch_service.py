@@ -0,0 +1,123 @@
+from typing import Any, Callable, Dict, List, NamedTuple
+from neunexus.database.manager import DatabaseManager
+from neunexus.service.conversation_service import ConversationService
+from neunexus.service.message_service import MessageService
+
+
+class _OperationFailed(Exception):
+    """服务方法返回False（如删除未影响任何行），撤销该子操作"""
+
+
+class BatchOperation(NamedTuple):
+    handler: Callable[..., Any]
+    required: tuple    # 必需的参数名，从 args 中取值并按关键字传入
+    write: bool
+    status: int        # 成功时的状态码，与对应的单独接口一致
+    optional: tuple = ()
+
+
+class BatchService:
+    """批量执行服务层：按顺序执行一组子操作并返回各自的结果
+
+    整个批次在同一个SQLite事务中执行，每个子操作有自己的保存点：
+    某个子操作失败只撤销它自己的修改并记录错误，其余子操作照常提交。
+    参数值可以写成 {"$ref": "<子操作id>.<字段>"}，引用此前成功的子操作返回的字段，
+    例如先创建对话再向其中写入消息。
+    """
+
+    MAX_OPERATIONS = 100
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        conversation_service: ConversationService,
+        message_service: MessageService
+    ):
+        self.db_manager = db_manager
+        self.operations: Dict[str, BatchOperation] = {
+            'conversations.list': BatchOperation(conversation_service.get_all_conversations, (), False, 200, ('sort',)),
+            'conversations.get': BatchOperation(conversation_service.get_conversation_by_id, ('conversation_id',), False, 200),
+            'conversations.create': BatchOperation(conversation_service.create_conversation, ('title',), True, 201),
+            'conversations.update': BatchOperation(conversation_service.update_conversation_by_id, ('conversation_id', 'title'), True, 200),
+            'conversations.fork': BatchOperation(conversation_service.fork_conversation, ('conversation_id',), True, 201, ('message_id', 'title')),
+            'conversations.delete': BatchOperation(conversation_service.delete_conversation, ('conversation_id',), True, 200),
+            'messages.list': BatchOperation(message_service.get_conversation_messages, ('conversation_id',), False, 200),
+            'messages.recent': BatchOperation(message_service.get_recent_messages, ('conversation_id',), False, 200, ('limit',)),
+            'messages.get': BatchOperation(message_service.get_message, ('message_id',), False, 200),
+            'messages.create': BatchOperation(message_service.create_message, ('conversation_id', 'role', 'content'), True, 201),
+            'messages.delete': BatchOperation(message_service.delete_message, ('message_id',), True, 200),
+            'messages.delete_all': BatchOperation(message_service.delete_conversation_messages, ('conversation_id',), True, 200),
+        }
+
+    def validate(self, ops: Any) -> List[dict]:
+        """检查请求格式，格式错误时抛出ValueError（整个批次返回400）"""
+        if not isinstance(ops, list) or not ops:
+            raise ValueError('ops must be a non-empty list')
+        if len(ops) > self.MAX_OPERATIONS:
+            raise ValueError(f'A batch may contain at most {self.MAX_OPERATIONS} operations')
+        for op in ops:
+            if not isinstance(op, dict) or not isinstance(op.get('op'), str):
+                raise ValueError('Each operation must be an object with an "op" field')
+            if not isinstance(op.get('args', {}), dict):
+                raise ValueError('"args" must be an object')
+        return ops
+
+    def execute(self, ops: List[dict]) -> List[dict]:
+        """按顺序执行子操作，返回与请求一一对应的结果 { id, op, status, data | error }"""
+        write = any(
+            self.operations[op['op']].write for op in ops if op['op'] in self.operations
+        )
+        results = []
+        completed: Dict[str, Any] = {}
+        with self.db_manager.transaction(write=write):
+            for index, op in enumerate(ops):
+                result = self._execute_one(index, op, completed)
+                if 'data' in result:
+                    completed[str(result['id'])] = result['data']
+                results.append(result)
+        return results
+
+    @staticmethod
+    def _resolve(value: Any, completed: Dict[str, Any]) -> Any:
+        """把 {"$ref": "id.字段"} 替换为对应子操作结果中的值"""
+        if not (isinstance(value, dict) and set(value) == {'$ref'}):
+            return value
+        ref = value['$ref']
+        op_id, _, field = str(ref).partition('.')
+        data = completed.get(op_id)
+        if not isinstance(data, dict) or field not in data:
+            raise ValueError(f'Unresolved reference: {ref}')
+        return data[field]
+
+    def _execute_one(self, index: int, op: dict, completed: Dict[str, Any]) -> dict:
+        result = {'id': op.get('id', index), 'op': op['op']}
+        operation = self.operations.get(op['op'])
+        if operation is None:
+            return {**result, 'status': 400, 'error': f"Unknown operation: {op['op']}"}
+
+        args = op.get('args', {})
+        missing = [name for name in operation.required if name not in args]
+        if missing:
+            return {**result, 'status': 400, 'error': f"Missing arguments: {', '.join(missing)}"}
+
+        try:
+            kwargs = {
+                name: self._resolve(args[name], completed)
+                for name in operation.required + operation.optional if name in args
+            }
+            with self.db_manager.savepoint(f'op_{index}'):
+                data = operation.handler(**kwargs)
+                if data is False:
+                    # 与单独接口一致：删除未影响任何行视为失败
+                    raise _OperationFailed()
+        except ValueError as e:
+            return {**result, 'status': 400, 'error': str(e)}
+        except _OperationFailed:
+            return {**result, 'status': 500, 'error': 'Operation failed'}
+        except Exception as e:
+            print(f"批量操作 {op['op']} 出错: {e}")
+            return {**result, 'status': 500, 'error': 'Internal server error'}
+
+        if data is True:
+            data = {'success': True}
+        return {**result, 'status': operation.status, 'data': data}
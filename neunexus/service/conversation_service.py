@@ -1,9 +1,13 @@
 
+from typing import Optional
 from neunexus.database.manager import DatabaseManager
+from neunexus.database.models import Conversation
 from neunexus.database.repositories import ConversationRepository
 
 
 class ConversationService:
+    SORT_OPTIONS = tuple(ConversationRepository.SORT_ORDERS)
+    
     def __init__(self, db_manager: DatabaseManager):
         self.db_manager = db_manager
         self.conversation_repo = ConversationRepository(db_manager)
@@ -15,31 +19,46 @@ class ConversationService:
         
         conversation = self.conversation_repo.create(title)
         
-        return {
-            'conversation_id': conversation.id,
-            'title': conversation.title,
-            'created_at': conversation.created_at
-        }
+        return self._to_dict(conversation)
+            
+    def fork_conversation(self, conversation_id: int, message_id: Optional[int] = None, title: Optional[str] = None) -> dict:
+        """从对话中的某条消息分叉出新对话（默认从最后一条消息），新对话共享此前的消息"""
+        conversation = self.conversation_repo.get_by_id(conversation_id)
+        if not conversation:
+            raise ValueError('Conversation not found')
+        
+        if message_id is None:
+            message_id = conversation.head_message_id
+        elif not isinstance(message_id, int):
+            raise ValueError('message_id must be an integer')
+        
+        if title is None:
+            title = conversation.title
+        elif not title or not isinstance(title, str):
+            raise ValueError('Title must be a non-empty string')
+        
+        forked = self.conversation_repo.fork(conversation_id, message_id, title)
+        if not forked:
+            raise ValueError('Message not found in conversation')
+        
+        return self._to_dict(forked)
             
     def delete_conversation(self, conversation_id: int) -> bool:
-        """删除对话"""
+        """删除对话，对话立即不可见，消息由 PurgeService 在后台清除"""
         conversation = self.conversation_repo.get_by_id(conversation_id)
         if not conversation:
             raise ValueError('Conversation not found')
             
         return self.conversation_repo.delete(conversation_id)
 
-    def get_all_conversations(self) -> list:
-        """获取所有对话"""
-        conversations = self.conversation_repo.get_all()
+    def get_all_conversations(self, sort: str = 'created') -> list:
+        """获取所有对话，sort 为 created（按创建时间）或 activity（按最近消息时间）"""
+        if sort not in self.SORT_OPTIONS:
+            raise ValueError(f'Unsupported sort: {sort}')
+        
+        conversations = self.conversation_repo.get_all(sort)
         
-        return [
-            {
-                'conversation_id': conv.id,
-                'title': conv.title,
-                'created_at': conv.created_at
-            } for conv in conversations
-        ]
+        return [self._to_dict(conv) for conv in conversations]
 
     def get_conversation_by_id(self, conversation_id: int) -> dict:
         """根据ID获取单个对话"""
@@ -47,11 +66,7 @@ class ConversationService:
         if not conversation:
             raise ValueError('Conversation not found')
         
-        return {
-            'conversation_id': conversation.id,
-            'title': conversation.title,
-            'created_at': conversation.created_at
-        }
+        return self._to_dict(conversation)
         
     def update_conversation_by_id(self, conversation_id: int, title: str) -> dict:
         """更新对话标题"""
@@ -67,8 +82,17 @@ class ConversationService:
             raise Exception('Failed to update conversation')
             
         updated_conversation = self.conversation_repo.get_by_id(conversation_id)
+        return self._to_dict(updated_conversation)
+
+    @staticmethod
+    def _to_dict(conversation: Conversation) -> dict:
         return {
-            'conversation_id': updated_conversation.id,
-            'title': updated_conversation.title,
-            'created_at': updated_conversation.created_at
-        }
\ No newline at end of file
+            'conversation_id': conversation.id,
+            'title': conversation.title,
+            'created_at': conversation.created_at,
+            'last_message_at': conversation.last_message_at,
+            'message_count': conversation.message_count,
+            'preview': conversation.preview,
+            'forked_from_id': conversation.forked_from_id,
+            'fork_message_id': conversation.fork_message_id
+        }
@@ -1,16 +1,29 @@
+import asyncio
 import json
-from typing import Any
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterator, Optional
+from neunexus.core import tracing
 from neunexus.core.client import DeepSeekClient
 from neunexus.database.manager import DatabaseManager
 from neunexus.database.repositories import MessageRepository
 
+if TYPE_CHECKING:
+    # 联网检索依赖爬虫与numpy，仅用于类型标注
+    from neunexus.core.web_search import WebSearchPipeline
+
 
 class MessageService:
     """消息服务层，处理消息相关的业务逻辑"""
     
-    def __init__(self, db_manager: DatabaseManager, client: DeepSeekClient):
+    def __init__(
+        self, 
+        db_manager: DatabaseManager, 
+        client: DeepSeekClient, 
+        web_pipeline: Optional['WebSearchPipeline'] = None
+    ):
         self.client = client
         self.db_manager = db_manager
+        self.web_pipeline = web_pipeline
         self.message_repo = MessageRepository(db_manager)
     
     def get_recent_messages(self, conversation_id: int, limit: int = 500) -> list:
@@ -20,7 +33,8 @@ class MessageService:
         return [
             {
                 'message_id': msg.id,
-                'conversation_id': msg.conversation_id,
+                'conversation_id': conversation_id,
+                'parent_id': msg.parent_id,
                 'role': msg.role,
                 'content': msg.content,
                 'timestamp': msg.timestamp
@@ -38,11 +52,12 @@ class MessageService:
         message = self.message_repo.create(conversation_id, role, content)
         
         if not message:
-            raise Exception('Failed to create message')
+            raise ValueError('Conversation not found')
         
         return {
             'message_id': message.id,
             'conversation_id': message.conversation_id,
+            'parent_id': message.parent_id,
             'role': message.role,
             'content': message.content,
             'timestamp': message.timestamp
@@ -57,30 +72,121 @@ class MessageService:
         return {
             'message_id': message.id,
             'conversation_id': message.conversation_id,
+            'parent_id': message.parent_id,
             'role': message.role,
             'content': message.content,
             'timestamp': message.timestamp
         }
     
-    def stream_message(self, conversation_id: int, content: str) -> Any:
-        """流式处理消息"""
+    def stream_message(self, conversation_id: int, content: str, web: bool = False) -> Any:
+        """流式处理消息，web为True且配置了联网检索时先检索网页作为参考资料，产出SSE格式的事件"""
+        encode_seconds = 0.0
+        for event in self.stream_events(conversation_id, content, web=web):
+            start = time.perf_counter()
+            data = self._sse(event)
+            encode_seconds += time.perf_counter() - start
+            yield data
+        tracing.instant('sse.encode', total_ms=round(encode_seconds * 1000, 3))
+    
+    def stream_events(self, conversation_id: int, content: str, web: bool = False) -> Iterator[dict]:
+        """流式处理消息，逐个产出事件字典（searching/sources/chunk/complete），由调用方决定传输格式"""
         if not content or not isinstance(content, str):
             raise ValueError('Content is required and must be a string')
 
-        histories = self.message_repo.get_recent_by_conversation(conversation_id)
-        history_messages = [{"role": msg.role, "content": msg.content} for msg in histories]
+        with tracing.span('history.load', conversation_id=conversation_id) as span:
+            histories = self.message_repo.get_recent_by_conversation(conversation_id)
+            span.set(messages=len(histories))
+        with tracing.span('history.build'):
+            history_messages = [{"role": msg.role, "content": msg.content} for msg in histories]
 
         full_response = []
         try:
-            for chunk, _ in self.client.stream_chat(content, histories=history_messages):
-                full_response.append(chunk)
-                yield f"data: {json.dumps({'type': 'chunk', 'content': chunk}, ensure_ascii=False)}\n\n"
+            prompt = content
+            if web and self.web_pipeline is not None:
+                with tracing.span('web.augment'):
+                    prompt = yield from self._web_augment(content)
+
+            with tracing.span('llm.stream') as span:
+                for chunk, _ in self.client.stream_chat(prompt, histories=history_messages):
+                    full_response.append(chunk)
+                    yield {'type': 'chunk', 'content': chunk}
+                span.set(chunks=len(full_response))
+
+            yield {'type': 'complete'}
+            with tracing.span('message.save'):
+                self.message_repo.create(conversation_id, 'system', "".join(full_response))
+
+        except Exception as e:
+            raise Exception(f"Stream processing failed: {str(e)}")
+    
+    @staticmethod
+    def _sse(event: dict) -> str:
+        return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+    
+    def _web_augment(self, content: str):
+        """执行联网检索并转发进度事件，返回拼接了参考资料的提示词；检索失败时退回原始问题"""
+        sources = []
+        try:
+            for event, data in self.web_pipeline.run(content):
+                if event == 'searching':
+                    yield {'type': 'searching', **data}
+                elif event == 'sources':
+                    sources = data
+                    yield {'type': 'sources', 'sources': sources}
+                elif event == 'context':
+                    return self.web_pipeline.build_prompt(content, data, sources)
+        except Exception as e:
+            print(f"联网检索失败: {e}")
+        return content
+    
+    async def astream_message(self, conversation_id: int, content: str, web: bool = False) -> AsyncIterator[str]:
+        """stream_message 的异步版本：数据库访问与联网检索在线程池中执行，模型回复由异步客户端流式获取"""
+        if not content or not isinstance(content, str):
+            raise ValueError('Content is required and must be a string')
+
+        with tracing.span('history.load', conversation_id=conversation_id) as span:
+            histories = await asyncio.to_thread(self.message_repo.get_recent_by_conversation, conversation_id)
+            span.set(messages=len(histories))
+        with tracing.span('history.build'):
+            history_messages = [{"role": msg.role, "content": msg.content} for msg in histories]
+
+        full_response = []
+        try:
+            prompt = content
+            if web and self.web_pipeline is not None:
+                with tracing.span('web.augment'):
+                    events = self._web_augment(content)
+                    while True:
+                        done, value = await asyncio.to_thread(self._advance, events)
+                        if done:
+                            prompt = value
+                            break
+                        yield self._sse(value)
+
+            encode_seconds = 0.0
+            with tracing.span('llm.stream') as span:
+                async for chunk, _ in self.client.astream_chat(prompt, histories=history_messages):
+                    full_response.append(chunk)
+                    start = time.perf_counter()
+                    event = f"data: {json.dumps({'type': 'chunk', 'content': chunk}, ensure_ascii=False)}\n\n"
+                    encode_seconds += time.perf_counter() - start
+                    yield event
+                span.set(chunks=len(full_response), encode_ms=round(encode_seconds * 1000, 3))
 
             yield f"data: {json.dumps({'type': 'complete'})}\n\n"
-            self.message_repo.create(conversation_id, 'system', "".join(full_response))
+            with tracing.span('message.save'):
+                await asyncio.to_thread(self.message_repo.create, conversation_id, 'system', "".join(full_response))
 
         except Exception as e:
             raise Exception(f"Stream processing failed: {str(e)}")
+    
+    @staticmethod
+    def _advance(generator):
+        """推进同步生成器一步，返回 (是否结束, 产出值或返回值)；StopIteration不能跨线程抛出"""
+        try:
+            return False, next(generator)
+        except StopIteration as stop:
+            return True, stop.value
         
     def delete_message(self, message_id: int) -> bool:
         """删除特定消息"""
@@ -101,7 +207,8 @@ class MessageService:
         return [
             {
                 'message_id': msg.id,
-                'conversation_id': msg.conversation_id,
+                'conversation_id': conversation_id,
+                'parent_id': msg.parent_id,
                 'role': msg.role,
                 'content': msg.content,
                 'timestamp': msg.timestamp
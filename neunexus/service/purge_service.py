@@ -0,0 +1,122 @@
+import threading
+import time
+from typing import Optional
+
+from neunexus.core.metrics import PURGE_BATCH_SECONDS, PURGE_MESSAGES
+from neunexus.database.manager import DatabaseManager
+from neunexus.database.repositories import ConversationRepository
+
+
+class PurgeService:
+    """后台清除已删除对话与已清空对话的旧消息
+    
+    删除请求只做标记，这里每次在一个短事务中清除 batch_size 条消息，批次之间暂停 pause 秒，
+    其他请求的写入可以穿插在批次之间而不必等待整个对话删除完成；每批之后通过增量自动清理
+    把最多 vacuum_pages 个空闲页归还文件系统。没有待清除的对话时每 interval 秒检查一次。
+    每个进程各自运行一个清除线程，批次在 BEGIN IMMEDIATE 事务中执行，多个进程同时清除也是安全的。
+    """
+    
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        batch_size: int = 500,
+        interval: float = 2.0,
+        pause: float = 0.05,
+        vacuum_pages: int = 256
+    ):
+        self.db_manager = db_manager
+        self.conversation_repo = ConversationRepository(db_manager)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+        
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.current: Optional[int] = None
+        self.stats = {
+            "batches": 0,
+            "messages_deleted": 0,
+            "messages_reassigned": 0,
+            "conversations_purged": 0,
+            "pages_reclaimed": 0,
+            "errors": 0,
+            "last_batch_ms": 0.0,
+        }
+    
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="purge", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def wake(self):
+        """有新的删除时立即开始清除，而不是等到下一次检查"""
+        self._wake.set()
+    
+    def run_once(self) -> bool:
+        """清除一批消息，没有待清除的对话时返回False"""
+        pending = self.conversation_repo.pending_purges(limit=1)
+        if not pending:
+            self.current = None
+            return False
+        
+        conversation_id = self.current = pending[0]
+        start = time.perf_counter()
+        result = self.conversation_repo.purge(conversation_id, self.batch_size)
+        reclaimed = self.db_manager.incremental_vacuum(self.vacuum_pages) if result['deleted'] or result['removed'] else 0
+        elapsed = time.perf_counter() - start
+        
+        PURGE_BATCH_SECONDS.observe(elapsed)
+        PURGE_MESSAGES.inc(result['deleted'], action="deleted")
+        PURGE_MESSAGES.inc(result['reassigned'], action="reassigned")
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["messages_deleted"] += result['deleted']
+            self.stats["messages_reassigned"] += result['reassigned']
+            self.stats["conversations_purged"] += int(result['removed'])
+            self.stats["pages_reclaimed"] += reclaimed
+            self.stats["last_batch_ms"] = elapsed * 1000
+        if result['done']:
+            self.current = None
+        return True
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                worked = self.run_once()
+            except Exception as e:
+                print(f"[purge] 清除出错: {e}")
+                with self._lock:
+                    self.stats["errors"] += 1
+                worked = False
+            
+            if worked:
+                self._stop.wait(self.pause)
+            else:
+                self._wake.wait(self.interval)
+                self._wake.clear()
+    
+    def snapshot(self) -> dict:
+        """清除进度：待清除的对话与消息数、本进程已完成的清除，以及数据库文件的页统计"""
+        with self._lock:
+            stats = dict(self.stats)
+        backlog = self.conversation_repo.purge_backlog()
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "current_conversation_id": self.current,
+            "pending_conversations": backlog['conversations'],
+            "pending_messages": backlog['messages'],
+            **stats,
+            "storage": self.db_manager.storage_stats(),
+        }
@@ -1,19 +1,75 @@
 from neunexus import NeuNexusApp
+from neunexus.api.server import ServerConfig, serve
 from neunexus.database import DatabaseManager
 from neunexus.core.client import DeepSeekClient
+from neunexus.core.retriever import Retriever
+from neunexus.core.tracing import Tracer
+from neunexus.core.web_search import WebSearchPipeline
+import argparse
 import json
- 
+
+
+DB_FILE = "./neunexus.db"
+
 
 def config_loader(config_path="./config.json"):
     with open(config_path, "r") as f:
         config = json.load(f)
-        return config["api_key"], config["init_prompt"]
+        return config["api_key"], config["init_prompt"], config.get("embedding_api_key")
 
-if __name__ == "__main__":
-    api_key, init_prompt = config_loader()
-    
-    db_manager = DatabaseManager("./neunexus.db")
+
+def create_app(config_path="./config.json", asgi=False, tracer=None):
+    api_key, init_prompt, embedding_api_key = config_loader(config_path)
+
+    db_manager = DatabaseManager(DB_FILE)
     client = DeepSeekClient(api_key=api_key, init_prompt=init_prompt)
-    app = NeuNexusApp(db_manager, client)
-    
-    app.run(port=5000)
\ No newline at end of file
+    # 未配置向量化密钥时，联网检索只使用BM25排序
+    retriever = Retriever(embedding_api_key) if embedding_api_key else None
+    web_pipeline = WebSearchPipeline(retriever=retriever)
+    if asgi:
+        # ASGI模式依赖starlette，仅在使用时导入
+        from neunexus.api.asgi import NeuNexusASGIApp
+        return NeuNexusASGIApp(db_manager, client, web_pipeline, tracer=tracer)
+    return NeuNexusApp(db_manager, client, web_pipeline, tracer=tracer)
+
+
+def parse_args():
+    defaults = ServerConfig()
+    parser = argparse.ArgumentParser(description="启动NeuNexus服务")
+    parser.add_argument("--production", action="store_true", help="使用gunicorn运行，而不是Flask开发服务器")
+    parser.add_argument("--asgi", action="store_true", help="使用异步的ASGI版本（uvicorn），单进程承载大量流式连接")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=defaults.workers)
+    parser.add_argument("--worker-class", default=defaults.worker_class, choices=["gevent", "gthread", "sync"])
+    parser.add_argument("--threads", type=int, default=defaults.threads)
+    parser.add_argument("--graceful-timeout", type=int, default=defaults.graceful_timeout)
+    parser.add_argument("--trace-dir", default="./traces", help="跟踪文件输出目录（请求头 X-Trace: 1 或 profile 开启跟踪）")
+    parser.add_argument("--trace-sample-rate", type=float, default=0.0, help="未带请求头时随机跟踪的请求比例")
+    parser.add_argument("--vacuum", action="store_true", help="为已有数据库启用增量自动清理（重写整个数据库文件）后退出")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.vacuum:
+        DatabaseManager(DB_FILE).enable_incremental_vacuum()
+        print("已启用增量自动清理")
+        raise SystemExit(0)
+    tracer = Tracer(output_dir=args.trace_dir, sample_rate=args.trace_sample_rate)
+
+    if args.asgi:
+        create_app(asgi=True, tracer=tracer).run(host=args.host or "0.0.0.0", port=args.port)
+    elif args.production:
+        config = ServerConfig(
+            host=args.host or "0.0.0.0",
+            port=args.port,
+            workers=args.workers,
+            worker_class=args.worker_class,
+            threads=args.threads,
+            graceful_timeout=args.graceful_timeout
+        )
+        # 建表在主进程中完成一次，各工作进程启动时表已存在
+        serve(lambda: create_app(tracer=tracer).app, config, on_starting=lambda: DatabaseManager(DB_FILE))
+    else:
+        create_app(tracer=tracer).run(host=args.host, port=args.port)
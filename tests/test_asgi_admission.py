@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip("httpx")
+
+from starlette.applications import Starlette
+from starlette.testclient import TestClient
+
+from neunexus.api.admission import StreamAdmission
+from neunexus.api.asgi import AsyncMessageController
+
+
+class FakeMessageService:
+    async def astream_message(self, conversation_id, content, web=False):
+        yield f"data: {content}\n\n"
+
+
+def make_client(admission):
+    controller = AsyncMessageController(FakeMessageService(), admission)
+    return TestClient(Starlette(routes=controller.routes()))
+
+
+def test_stream_rejected_with_retry_after_when_conversation_busy():
+    admission = StreamAdmission(max_concurrent=4, max_queue=0, per_key=1)
+    client = make_client(admission)
+    ticket = admission.acquire(1)
+
+    response = client.post("/conversations/1/stream", json={"content": "hi"})
+
+    assert response.status_code == 429
+    assert response.json() == {"message": "Too many concurrent streams", "reason": "conversation_busy"}
+    assert int(response.headers["Retry-After"]) >= 1
+
+    admission.release(ticket)
+    response = client.post("/conversations/1/stream", json={"content": "hi"})
+    assert response.status_code == 200
+    assert response.text == "data: hi\n\n"
+
+
+def test_stream_releases_ticket_and_reports_stats():
+    admission = StreamAdmission(max_concurrent=1, max_queue=0)
+    client = make_client(admission)
+
+    for conversation_id in (1, 2):
+        assert client.post(f"/conversations/{conversation_id}/stream", json={"content": "hi"}).status_code == 200
+
+    stats = client.get("/streams/stats").json()
+    assert stats["active"] == 0
+    assert stats["admitted"] == 2
+    assert stats["rejected_busy"] == 0
@@ -0,0 +1,21 @@
+import pytest
+
+from neunexus.core.metrics import DB_QUERY_SECONDS
+from neunexus.database import DatabaseManager
+
+
+def test_incremental_vacuum_refuses_to_run_inside_transaction(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    with pytest.raises(RuntimeError):
+        with db.transaction() as conn:
+            conn.execute("INSERT INTO conversations (title) VALUES ('kept only if committed')")
+            db.incremental_vacuum(16)
+    # 事务随异常回滚，而不是被 executescript 提前提交
+    assert db.execute_query("SELECT COUNT(*) FROM conversations")[0][0] == 0
+
+
+def test_incremental_vacuum_is_timed(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    db.incremental_vacuum(16)
+    statements = {key[0] for key in DB_QUERY_SECONDS._merged()}
+    assert "PRAGMA incremental_vacuum(16);" in statements
@@ -0,0 +1,24 @@
+import threading
+
+from neunexus.core.metrics import MetricsRegistry
+
+
+def test_concurrent_writers_spread_across_shards():
+    """并发写入的线程应分散到多个分片上，而不是共用同一把锁"""
+    counter = MetricsRegistry().counter("test_writes_total", "test")
+    barrier = threading.Barrier(32)
+
+    def write():
+        barrier.wait()  # 让所有线程同时存活，线程ID不会被复用
+        for _ in range(100):
+            counter.inc()
+
+    threads = [threading.Thread(target=write) for _ in range(32)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    used = [shard for shard in counter._shards if shard.values]
+    assert len(used) > 1
+    assert sum(shard.values[()][0] for shard in used) == 32 * 100
@@ -0,0 +1,153 @@
+import pytest
+
+from neunexus.database import ConversationRepository, DatabaseManager, MessageRepository
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(str(tmp_path / "test.db"))
+
+
+@pytest.fixture
+def conversations(db):
+    return ConversationRepository(db)
+
+
+@pytest.fixture
+def messages(db):
+    return MessageRepository(db)
+
+
+def append(messages, conversation_id, count, prefix="m"):
+    return [messages.create(conversation_id, "user", f"{prefix}{i}").id for i in range(count)]
+
+
+def branch(messages, conversation_id):
+    return [message.id for message in messages.get_by_conversation(conversation_id)]
+
+
+def purge_all(conversations, batch_size):
+    """像后台清除一样逐批清除，直到没有待清除的对话"""
+    batches = 0
+    while True:
+        pending = conversations.pending_purges(limit=1)
+        if not pending:
+            return batches
+        conversations.purge(pending[0], batch_size)
+        batches += 1
+
+
+def assert_consistent(db, conversations, messages):
+    """每个对话的消息数与分支一致，没有孤立的消息，外键完整"""
+    reachable = set()
+    for conversation in conversations.get_all():
+        ids = branch(messages, conversation.id)
+        assert conversation.message_count == len(ids)
+        reachable.update(ids)
+    assert {row["id"] for row in db.execute_query("SELECT id FROM messages")} == reachable
+    assert db.execute_query("PRAGMA foreign_key_check") == []
+
+
+def test_fork_keeps_shared_prefix_after_original_is_deleted(db, conversations, messages):
+    original = conversations.create("original")
+    ids = append(messages, original.id, 1000)
+    fork = conversations.fork(original.id, ids[699], "fork")
+    fork_tail = append(messages, fork.id, 1, "fork")
+
+    assert conversations.delete(original.id)
+    assert conversations.get_by_id(original.id) is None
+    assert messages.get_by_conversation(original.id) == []
+
+    # 每批200条，认领共享前缀需要跨越多个批次
+    assert purge_all(conversations, batch_size=200) > 1
+    assert branch(messages, fork.id) == ids[:700] + fork_tail
+    assert conversations.get_by_id(fork.id).message_count == 701
+    assert conversations.pending_purges() == []
+    assert db.execute_query("SELECT COUNT(*) FROM conversations WHERE id = ?", (original.id,))[0][0] == 0
+    assert_consistent(db, conversations, messages)
+
+
+def test_clear_then_append_then_purge(db, conversations, messages):
+    conversation = conversations.create("c")
+    old = append(messages, conversation.id, 50, "old")
+    fork = conversations.fork(conversation.id, old[9], "fork")
+
+    assert messages.delete_by_conversation(conversation.id)
+    assert branch(messages, conversation.id) == []
+    assert conversations.get_by_id(conversation.id).message_count == 0
+
+    new = append(messages, conversation.id, 3, "new")
+    assert messages.get_by_id(new[0]).parent_id is None
+
+    purge_all(conversations, batch_size=7)
+    assert branch(messages, conversation.id) == new
+    assert branch(messages, fork.id) == old[:10]
+    assert conversations.get_by_id(conversation.id).message_count == 3
+    assert conversations.get_by_id(conversation.id).preview == "new2"
+    assert_consistent(db, conversations, messages)
+
+
+def test_deleting_shared_prefix_message_updates_both_branches(db, conversations, messages):
+    original = conversations.create("original")
+    ids = append(messages, original.id, 10)
+    fork = conversations.fork(original.id, ids[5], "fork")
+    fork_tail = append(messages, fork.id, 2, "fork")
+
+    assert messages.delete(ids[2])
+
+    assert branch(messages, original.id) == ids[:2] + ids[3:]
+    assert branch(messages, fork.id) == ids[:2] + ids[3:6] + fork_tail
+    assert messages.get_by_id(ids[3]).parent_id == ids[1]
+    assert conversations.get_by_id(original.id).message_count == 9
+    assert conversations.get_by_id(fork.id).message_count == 7
+    assert [m.depth for m in messages.get_by_conversation(fork.id)] == list(range(1, 8))
+    assert_consistent(db, conversations, messages)
+
+
+def test_deleting_fork_point_moves_fork_to_its_parent(db, conversations, messages):
+    original = conversations.create("original")
+    ids = append(messages, original.id, 5)
+    fork = conversations.fork(original.id, ids[2], "fork")
+
+    assert messages.delete(ids[2])
+
+    assert branch(messages, fork.id) == ids[:2]
+    assert conversations.get_by_id(fork.id).fork_message_id == ids[1]
+    assert conversations.get_by_id(fork.id).message_count == 2
+    assert_consistent(db, conversations, messages)
+
+
+def test_nested_fork_survives_deletion_of_both_ancestors(db, conversations, messages):
+    original = conversations.create("original")
+    ids = append(messages, original.id, 30)
+    middle = conversations.fork(original.id, ids[19], "middle")
+    middle_tail = append(messages, middle.id, 10, "middle")
+    nested = conversations.fork(middle.id, middle_tail[4], "nested")
+    nested_tail = append(messages, nested.id, 3, "nested")
+    expected = ids[:20] + middle_tail[:5] + nested_tail
+
+    assert conversations.delete(middle.id)
+    assert conversations.delete(original.id)
+    purge_all(conversations, batch_size=4)
+
+    assert [c.id for c in conversations.get_all()] == [nested.id]
+    assert branch(messages, nested.id) == expected
+    assert conversations.get_by_id(nested.id).message_count == len(expected)
+    assert_consistent(db, conversations, messages)
+
+    assert conversations.delete(nested.id)
+    purge_all(conversations, batch_size=4)
+    assert db.execute_query("SELECT COUNT(*) FROM messages")[0][0] == 0
+    assert db.execute_query("SELECT COUNT(*) FROM conversations")[0][0] == 0
+
+
+def test_deleted_conversation_rejects_writes(conversations, messages):
+    conversation = conversations.create("c")
+    ids = append(messages, conversation.id, 2)
+    assert conversations.delete(conversation.id)
+
+    assert not conversations.delete(conversation.id)
+    assert not conversations.update(conversation.id, "renamed")
+    assert messages.create(conversation.id, "user", "late") is None
+    assert conversations.fork(conversation.id, None, "fork") is None
+    assert conversations.fork(conversation.id, ids[-1], "fork") is None
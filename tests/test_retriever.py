@@ -0,0 +1,75 @@
+import threading
+
+import numpy as np
+
+from benchmarks.datagen import StubRetriever
+
+
+class BlockingRetriever(StubRetriever):
+    """encode 在 release 之前阻塞，模拟入库时较慢的嵌入请求"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def encode(self, sentences, timeout=None):
+        self.entered.set()
+        self.release.wait(5)
+        return super().encode(sentences, timeout)
+
+
+def test_compaction_waits_for_in_flight_ingest():
+    """入库在锁外持有的行号不能被同时发生的压缩重新编号"""
+    retriever = BlockingRetriever(dim=8, dedup_threshold=None, compaction_threshold=0.1)
+    for i in range(10):
+        retriever.commit_doc(f"old-{i}", [(f"old chunk {i}", None, np.ones(8) * (i + 1))])
+
+    chunks = [("new chunk a", None, np.ones(8)), ("new chunk b", None, None)]
+    ingest = threading.Thread(target=retriever.commit_doc, args=("new", chunks))
+    ingest.start()
+    assert retriever.entered.wait(5)
+
+    # 删除足够多的文档，本会触发压缩并重新编号所有行
+    for i in range(8):
+        retriever.delete_doc(f"old-{i}")
+    assert retriever.index_stats()["tombstones"] == 8
+
+    retriever.release.set()
+    ingest.join(5)
+
+    # 入库结束后补做压缩，各文档仍指向自己的片段
+    assert retriever.index_stats()["tombstones"] == 0
+    texts = {doc_id: [retriever._texts[row] for row in rows] for doc_id, rows in retriever._doc_rows.items()}
+    assert texts == {"old-8": ["old chunk 8"], "old-9": ["old chunk 9"], "new": ["new chunk a", "new chunk b"]}
+    assert retriever._refs == [1] * len(retriever._texts)
+
+
+class FailingRetriever(StubRetriever):
+    """fail 为真时 encode 抛出异常，模拟嵌入接口出错"""
+
+    fail = False
+
+    def encode(self, sentences, timeout=None):
+        if self.fail:
+            raise RuntimeError("embedding service unavailable")
+        return super().encode(sentences, timeout)
+
+
+def test_failed_upsert_keeps_old_signature():
+    """替换文档时嵌入失败，旧版本仍参与文档级去重"""
+    retriever = FailingRetriever(dim=8)
+    text = "the quick brown fox jumps over the lazy dog near the quiet river bank"
+    retriever.upsert_doc("a", text)
+
+    retriever.fail = True
+    try:
+        retriever.upsert_doc("a", "an entirely different document about sqlite write ahead logging")
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("upsert_doc should propagate the embedding error")
+    retriever.fail = False
+
+    assert retriever.upsert_doc("b", text)["docs_skipped"] == 1
+    assert retriever._doc_rows["b"] == retriever._doc_rows["a"]
@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+
+from benchmarks.datagen import StubRetriever
+
+
+def embedding(seed):
+    return np.random.default_rng(seed).standard_normal(8)
+
+
+def state(retriever):
+    return {
+        doc_id: [(retriever._texts[row], retriever._refs[row]) for row in rows]
+        for doc_id, rows in retriever._doc_rows.items()
+    }
+
+
+def test_checkpoint_appends_only_changed_docs(tmp_path):
+    path = str(tmp_path / "index.pkl")
+    retriever = StubRetriever(dim=8)
+    for i in range(50):
+        retriever.commit_doc(f"doc-{i}", [(f"chunk {i}", None, embedding(i))])
+    retriever.checkpoint(path)  # 尚无快照，写入完整快照
+    snapshot_size = os.path.getsize(path)
+    assert not os.path.exists(f"{path}.log")
+
+    retriever.commit_doc("doc-50", [("chunk 50", None, embedding(50)), ("chunk 0", None, embedding(0))])
+    retriever.delete_doc("doc-3")
+    retriever.commit_doc("doc-4", [("chunk 4 v2", None, embedding(104))])
+    retriever.checkpoint(path)
+
+    # 只追加了三个文档的记录，快照本身未被重写
+    assert os.path.getsize(path) == snapshot_size
+    assert 0 < os.path.getsize(f"{path}.log") < snapshot_size / 4
+
+    restored = StubRetriever(dim=8)
+    restored.load(path)
+    assert state(restored) == state(retriever)
+    assert restored.dedup_stats == retriever.dedup_stats
+    np.testing.assert_allclose(
+        restored._matrix[restored._doc_rows["doc-4"][0]], retriever._matrix[retriever._doc_rows["doc-4"][0]]
+    )
+    assert restored.encode_calls == 0
+
+
+def test_checkpoint_rewrites_snapshot_when_log_outgrows_it(tmp_path):
+    path = str(tmp_path / "index.pkl")
+    retriever = StubRetriever(dim=8)
+    retriever.commit_doc("doc-0", [("chunk 0", None, embedding(0))])
+    retriever.save(path)
+
+    for i in range(1, 40):
+        retriever.commit_doc(f"doc-{i}", [(f"chunk {i}", None, embedding(i))])
+        retriever.checkpoint(path)
+        assert not os.path.exists(f"{path}.log") or os.path.getsize(f"{path}.log") <= 2 * os.path.getsize(path)
+
+    restored = StubRetriever(dim=8)
+    restored.load(path)
+    assert state(restored) == state(retriever)
+
+
+def test_truncated_log_tail_is_ignored(tmp_path):
+    path = str(tmp_path / "index.pkl")
+    retriever = StubRetriever(dim=8)
+    retriever.commit_doc("doc-0", [("chunk 0", None, embedding(0))])
+    retriever.save(path)
+    retriever.commit_doc("doc-1", [("chunk 1", None, embedding(1))])
+    retriever.checkpoint(path)
+    retriever.commit_doc("doc-2", [("chunk 2", None, embedding(2))])
+    retriever.checkpoint(path)
+
+    with open(f"{path}.log", "r+b") as f:
+        f.truncate(os.path.getsize(f"{path}.log") - 10)
+
+    restored = StubRetriever(dim=8)
+    restored.load(path)
+    assert set(restored._doc_rows) == {"doc-0", "doc-1"}
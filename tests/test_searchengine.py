@@ -0,0 +1,41 @@
+from neunexus.core.crawler.searchengine_crawer import SearchEngine, SearchEngineCrawler
+
+
+class PagedEngine(SearchEngine):
+    """按页返回预设结果的引擎，不访问网络"""
+
+    def __init__(self, pages):
+        super().__init__()
+        self.pages = pages
+
+    def _fetch_search_page(self, query, page, lang):
+        return [dict(result) for result in self.pages[page]]
+
+    def _parse_results(self, tree):
+        return []
+
+
+def result(n):
+    return {"title": f"r{n}", "link": f"https://example.com/{n}", "snippet": ""}
+
+
+def test_short_later_page_ranks_after_first_page():
+    """第二页只有3个结果时，其名次仍为10..12，而不是与第一页重叠的3..5"""
+    crawler = SearchEngineCrawler()
+    crawler._engines["bing"] = PagedEngine([[result(n) for n in range(10)], [result(n) for n in range(10, 13)]])
+
+    ranked = crawler.federated_search("q", engines=("bing",), num_results=20, pages=2)
+
+    assert [entry["title"] for entry in ranked] == [f"r{n}" for n in range(13)]
+
+
+def test_cached_results_are_not_shared_with_callers():
+    """修改返回的结果不应影响之后命中缓存的结果"""
+    crawler = SearchEngineCrawler()
+    crawler._engines["bing"] = PagedEngine([[result(0), result(1)]])
+
+    first = crawler.search("q", engine="bing", num_results=2)
+    first[0]["title"] = "changed"
+    first[0]["score"] = 1.0
+
+    assert crawler.search("q", engine="bing", num_results=2) == [result(0), result(1)]
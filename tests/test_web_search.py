@@ -0,0 +1,67 @@
+import threading
+import time
+
+from neunexus.core.bm25 import BM25Index
+from neunexus.core.crawler import PageCrawler
+from neunexus.core.web_search import WebSearchPipeline
+
+
+class TimeoutRetriever:
+    """记录超时参数并模拟向量化请求超时"""
+
+    def __init__(self):
+        self.timeouts = []
+
+    def encode(self, sentences, timeout=None):
+        self.timeouts.append(timeout)
+        raise TimeoutError("read timed out")
+
+
+class SlowSearch:
+    """先返回一页结果，然后等待第一个页面抓取完成（最多2秒）再结束"""
+
+    def __init__(self, fetched):
+        self.fetched = fetched
+        self.fetched_during_search = None
+
+    def federated_pages(self, query, engines=(), lang="zh", pages=1, deadline=5.0):
+        yield "bing", 0, [{"title": "a", "link": "https://example.com/a", "snippet": ""}]
+        self.fetched_during_search = self.fetched.wait(2)
+        yield "baidu", 0, [{"title": "b", "link": "https://example.com/b", "snippet": ""}]
+
+
+class FakePageCrawler(PageCrawler):
+    def __init__(self, fetched):
+        super().__init__(delay=0)
+        self.fetched = fetched
+
+    def _timed_fetch(self, url):
+        self.fetched.set()
+        return url, {"title": url, "content": f"page {url}"}, {}
+
+
+def test_rank_passes_remaining_budget_and_falls_back_to_bm25():
+    retriever = TimeoutRetriever()
+    pipeline = WebSearchPipeline(search_crawler=object(), page_crawler=object(), retriever=retriever, budget=4.0)
+    index = BM25Index()
+    passages = []
+    for text in ["apple banana", "apple apple apple", "cherry"]:
+        index.add(len(passages), text)
+        passages.append({"source": 1, "content": text})
+
+    ranked = pipeline._rank("apple", index, passages, time.monotonic() - 1.0)
+
+    assert ranked == [doc_id for doc_id, _ in index.search("apple", pipeline.prefilter_k)][:pipeline.top_k]
+    assert len(retriever.timeouts) == 1
+    assert 0.2 <= retriever.timeouts[0] <= 3.0
+
+
+def test_fetch_starts_before_search_finishes():
+    fetched = threading.Event()
+    search = SlowSearch(fetched)
+    pipeline = WebSearchPipeline(search_crawler=search, page_crawler=FakePageCrawler(fetched), budget=5.0)
+
+    events = dict(pipeline.run("page"))
+
+    assert search.fetched_during_search is True
+    assert sorted(source["url"] for source in events["sources"]) == ["https://example.com/a", "https://example.com/b"]
@@ -0,0 +1,18 @@
+import axios from 'axios'
+
+/**
+ * 一次 POST /batch 执行多个子操作，减少请求往返
+ * ops: [{ id, op, args }]，args 中可以用 { $ref: 'id.字段' } 引用前面子操作的返回值
+ * 返回以子操作 id 为键的结果；任一子操作失败时抛出错误
+ */
+export async function batch(apiBaseUrl, ops) {
+  const { data } = await axios.post(`${apiBaseUrl}/batch`, { ops })
+  const results = {}
+  for (const result of data.results) {
+    if (result.error) {
+      throw new Error(`${result.op} 失败: ${result.error}`)
+    }
+    results[result.id] = result.data
+  }
+  return results
+}
@@ -1,7 +1,11 @@
+import streamSocket from '@/services/StreamSocket'
+
 class StreamReceiverService {
   constructor() {
-    this.activeStreams = new Map() // key: conversationId, value: { messages[], controller, isDone }
+    this.activeStreams = new Map() // key: conversationId, value: { messages[], cancel, isDone }
     this.connectionTimeout = 30000 // 30秒连接超时
+    this.useSocket = true // 优先使用WebSocket，连接失败时退回SSE
+    this.nextStreamId = 1
   }
 
   startStream(conversationId, inputText, apiBaseUrl) {
@@ -10,19 +14,48 @@ class StreamReceiverService {
       return
     }
 
-    const controller = new AbortController()
-    const timeoutId = setTimeout(() => {
-      controller.abort()
-      console.error('Stream connection timeout')
-    }, this.connectionTimeout)
-
     const streamData = {
       messages: [],
-      controller,
+      cancel: () => {},
       isDone: false
     }
     this.activeStreams.set(conversationId, streamData)
 
+    if (!this.useSocket) {
+      this.startSseStream(conversationId, inputText, apiBaseUrl, streamData)
+      return
+    }
+    streamSocket.open(apiBaseUrl).then(ok => {
+      if (ok) {
+        this.startSocketStream(conversationId, inputText, streamData)
+      } else {
+        this.useSocket = false
+        this.startSseStream(conversationId, inputText, apiBaseUrl, streamData)
+      }
+    })
+  }
+
+  // 通过共享的WebSocket连接接收，多个对话的流复用同一连接
+  startSocketStream(conversationId, inputText, streamData) {
+    const streamId = `${conversationId}-${Date.now()}-${this.nextStreamId++}`
+    streamData.cancel = () => streamSocket.cancel(streamId)
+    streamSocket.start(streamId, conversationId, inputText, frame => {
+      streamData.messages.push(frame)
+      if (['complete', 'error', 'cancelled'].includes(frame.type)) {
+        streamData.isDone = true
+        this.cleanupStream(conversationId)
+      }
+    })
+  }
+
+  startSseStream(conversationId, inputText, apiBaseUrl, streamData) {
+    const controller = new AbortController()
+    const timeoutId = setTimeout(() => {
+      controller.abort()
+      console.error('Stream connection timeout')
+    }, this.connectionTimeout)
+    streamData.cancel = () => controller.abort()
+
     fetch(`${apiBaseUrl}/conversations/${conversationId}/stream`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
@@ -89,7 +122,8 @@ class StreamReceiverService {
   cancelStream(conversationId) {
     const data = this.activeStreams.get(conversationId)
     if (data) {
-      data.controller.abort()
+      data.cancel()
+      data.isDone = true
       this.cleanupStream(conversationId)
     }
   }
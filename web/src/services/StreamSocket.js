@@ -0,0 +1,124 @@
+// WebSocket多路复用流式传输：一个连接上同时接收多个对话的流式回复
+// 协议见 docs/interface.md 的 WebSocket 流式接口；连接不可用时由 StreamReceiverService 退回SSE接口
+
+const TERMINAL_TYPES = new Set(['complete', 'error', 'cancelled'])
+
+class StreamSocket {
+  constructor() {
+    this.ws = null
+    this.apiBaseUrl = null
+    this.opening = null
+    this.streams = new Map() // key: streamId, value: { lastSeq, acked, onFrame }
+    this.ackInterval = 16 // 每收到多少帧确认一次，需小于服务端发送窗口
+    this.reconnectDelay = 1000
+    this.maxReconnects = 3
+    this.reconnects = 0
+  }
+
+  static toSocketUrl(apiBaseUrl) {
+    return apiBaseUrl.replace(/^http/, 'ws') + '/ws'
+  }
+
+  // 建立（或复用）连接，成功返回true；不支持或连接失败返回false
+  open(apiBaseUrl) {
+    if (typeof WebSocket === 'undefined') return Promise.resolve(false)
+    if (this.ws && this.ws.readyState === WebSocket.OPEN) return Promise.resolve(true)
+    if (this.opening) return this.opening
+
+    this.apiBaseUrl = apiBaseUrl
+    this.opening = new Promise(resolve => {
+      const ws = new WebSocket(StreamSocket.toSocketUrl(apiBaseUrl))
+      ws.onopen = () => {
+        this.ws = ws
+        this.opening = null
+        this.reconnects = 0
+        ws.onmessage = event => this.handleMessage(event)
+        ws.onclose = () => this.handleClose()
+        resolve(true)
+      }
+      ws.onerror = () => {
+        this.opening = null
+        resolve(false)
+      }
+    })
+    return this.opening
+  }
+
+  send(message) {
+    if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+      this.ws.send(JSON.stringify(message))
+    }
+  }
+
+  start(streamId, conversationId, content, onFrame, web = false) {
+    this.streams.set(streamId, { lastSeq: 0, acked: 0, onFrame })
+    this.send({ type: 'start', stream_id: streamId, conversation_id: conversationId, content, web })
+  }
+
+  cancel(streamId) {
+    this.send({ type: 'cancel', stream_id: streamId })
+  }
+
+  handleMessage(event) {
+    let frame
+    try {
+      frame = JSON.parse(event.data)
+    } catch (e) {
+      console.warn('parse error', e, 'for frame:', event.data)
+      return
+    }
+
+    const stream = this.streams.get(frame.stream_id)
+    if (!stream) return
+
+    if (frame.seq !== undefined) {
+      // 重连后的重放可能与已收到的帧重叠
+      if (frame.seq <= stream.lastSeq) return
+      stream.lastSeq = frame.seq
+      if (stream.lastSeq - stream.acked >= this.ackInterval) {
+        stream.acked = stream.lastSeq
+        this.send({ type: 'ack', stream_id: frame.stream_id, seq: stream.lastSeq })
+      }
+    }
+
+    stream.onFrame(frame)
+    if (TERMINAL_TYPES.has(frame.type)) {
+      // 确认全部帧，服务端可以立即释放该流
+      if (frame.seq !== undefined) {
+        this.send({ type: 'ack', stream_id: frame.stream_id, seq: frame.seq })
+      }
+      this.streams.delete(frame.stream_id)
+    }
+  }
+
+  // 连接断开后重连，并从每个流最后收到的帧之后继续
+  handleClose() {
+    this.ws = null
+    if (this.streams.size === 0) return
+
+    if (this.reconnects >= this.maxReconnects) {
+      for (const [streamId, stream] of this.streams) {
+        stream.onFrame({ type: 'error', stream_id: streamId, message: 'Connection lost' })
+      }
+      this.streams.clear()
+      return
+    }
+
+    this.reconnects += 1
+    setTimeout(() => {
+      this.open(this.apiBaseUrl).then(ok => {
+        if (!ok) {
+          this.handleClose()
+          return
+        }
+        for (const [streamId, stream] of this.streams) {
+          this.send({ type: 'resume', stream_id: streamId, after: stream.lastSeq })
+        }
+      })
+    }, this.reconnectDelay * this.reconnects)
+  }
+}
+
+const streamSocket = new StreamSocket()
+
+export default streamSocket